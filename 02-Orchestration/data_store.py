@@ -0,0 +1,207 @@
+# data_store.py
+
+import glob
+import json
+import os
+import shutil
+import time
+import uuid
+
+import joblib
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from crash_preprocessing import (
+    FEATURE_SPEC, init_counts, load_data_chunks, normalize_columns, parse_dates, prepare_features,
+    preprocessor_from_counts, to_frame, update_counts,
+)
+from crash_preprocessing.tracing import span
+
+STORE_DIR = "data/store"
+STATE_FILE = "_state.json"
+STATS_FILE = "_stats.joblib"
+# Préprocesseur figé au dernier ajustement : toutes les lignes préparées
+# sont encodées avec les mêmes statistiques
+FITTED_FILE = "_preprocessor.joblib"
+# Ré-ajustement (et retransformation complète) quand le store a grossi de 10 %
+REFIT_GROWTH = 0.10
+
+# Colonnes brutes conservées (celles dont prepare_features a besoin + la clé)
+RAW_SCHEMA = pa.schema([
+    ("crash_record_id", pa.string()),
+    *[(col, pa.timestamp("us")) for col in FEATURE_SPEC.dates],
+    *[(col, pa.float64()) for col in FEATURE_SPEC.raw_numeric],
+    *[(col, pa.string()) for col in FEATURE_SPEC.categorical + (FEATURE_SPEC.target,)],
+])
+CATEGORICAL_COLS = list(FEATURE_SPEC.categorical)
+
+# 1. État du store : filigrane, fichiers déjà pris en compte, schéma
+def load_state(store_dir=STORE_DIR):
+    path = os.path.join(store_dir, STATE_FILE)
+    if not os.path.exists(path):
+        return {"watermark": None, "files": [], "schema": None, "fitted_rows": None}
+    with open(path) as f:
+        return {"fitted_rows": None, **json.load(f)}
+
+def save_state(state, store_dir=STORE_DIR):
+    # Écriture atomique : un run interrompu laisse l'ancien état intact
+    path = os.path.join(store_dir, STATE_FILE)
+    with open(path + ".tmp", "w") as f:
+        json.dump(state, f, indent=2)
+    os.replace(path + ".tmp", path)
+
+def _crash_month(dates):
+    return dates.dt.strftime("%Y-%m").fillna("unknown")
+
+def partition_files(store_dir, month="*"):
+    """Fichiers Parquet des partitions du store (toutes, ou celles d'un mois), triés"""
+    return sorted(glob.glob(os.path.join(store_dir, f"crash_month={month}", "*.parquet")))
+
+def _partition_ids(store_dir, month):
+    # Un accident garde son mois : le doublon éventuel est dans la même partition
+    files = partition_files(store_dir, month)
+    if not files:
+        return set()
+    return set(pq.read_table(files, columns=["crash_record_id"]).column(0).to_pylist())
+
+def normalize_chunk(chunk):
+    """Colonnes dans la casse de FEATURE_SPEC, types fixés par RAW_SCHEMA"""
+    df = normalize_columns(chunk).reindex(columns=RAW_SCHEMA.names)
+    for col in FEATURE_SPEC.dates:
+        df[col] = parse_dates(df[col])
+    for col in FEATURE_SPEC.raw_numeric:
+        df[col] = pd.to_numeric(df[col], errors="coerce")
+    return df
+
+def read_partition(path):
+    df = pq.read_table(path).to_pandas()
+    # Catégories manquantes : NaN comme dans un CSV (imputées par SimpleImputer)
+    df[CATEGORICAL_COLS] = df[CATEGORICAL_COLS].astype(object).where(df[CATEGORICAL_COLS].notna(), np.nan)
+    return df
+
+# 2. Ingestion : nouvelles lignes seulement, partitionnées par mois d'accident
+def ingest(chunks, store_dir=STORE_DIR, run_id=None):
+    """Ajoute au store les lignes dont le crash_record_id est inconnu et
+    avance le filigrane ; renvoie le nombre de lignes ajoutées."""
+    os.makedirs(store_dir, exist_ok=True)
+    state = load_state(store_dir)
+    # Horodatage + suffixe aléatoire : noms uniques même pour des appels rapprochés
+    run_id = run_id or f"{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+    known, n_new = {}, 0
+
+    with span("ingest") as ingest_span:
+        for seq, chunk in enumerate(chunks):
+            df = normalize_chunk(chunk).dropna(subset=["crash_record_id"])
+            df = df.drop_duplicates("crash_record_id")
+            for month, part in df.groupby(_crash_month(df["crash_date"])):
+                if month not in known:
+                    known[month] = _partition_ids(store_dir, month)
+                part = part[~part["crash_record_id"].isin(known[month])]
+                if part.empty:
+                    continue
+                known[month].update(part["crash_record_id"])
+                os.makedirs(os.path.join(store_dir, f"crash_month={month}"), exist_ok=True)
+                pq.write_table(
+                    pa.Table.from_pandas(part, schema=RAW_SCHEMA, preserve_index=False),
+                    os.path.join(store_dir, f"crash_month={month}", f"part-{run_id}-{seq:05d}.parquet"),
+                )
+                n_new += len(part)
+                latest = part["crash_date"].max()
+                if pd.notna(latest) and (state["watermark"] is None or latest.isoformat() > state["watermark"]):
+                    state["watermark"] = latest.isoformat()
+            # Filigrane enregistré bloc par bloc : un run interrompu reprend juste
+            save_state(state, store_dir)
+        ingest_span.rows = n_new
+
+    save_state(state, store_dir)
+    print(f"📥 {n_new} nouvelles lignes ingérées (filigrane : {state['watermark']})")
+    return n_new
+
+def ingest_csv(paths, store_dir=STORE_DIR, chunksize=100_000):
+    # Seules les colonnes de RAW_SCHEMA sont lues, avec des types imposés
+    return ingest(load_data_chunks(paths, chunksize, extra=("crash_record_id",)), store_dir)
+
+# 3. Statistiques et données préparées mises à jour de façon incrémentale
+def preprocessor_schema(preprocessor):
+    """Disposition des colonnes de sortie (change si une catégorie one-hot apparaît)"""
+    ohe = preprocessor.named_transformers_["cat_ohe"].named_steps["ohe"]
+    return [[str(c) for c in categories] for categories in ohe.categories_]
+
+def _write_prepared(path, preprocessor, X_dir, y_dir, dtype):
+    X, y = prepare_features(read_partition(path))
+    X[CATEGORICAL_COLS] = X[CATEGORICAL_COLS].astype(object)
+    # Même nom de fichier pour X et y : lus dans le même ordre (tri par nom)
+    name = f"{os.path.basename(os.path.dirname(path)).split('=')[1]}-{os.path.basename(path)}"
+    to_frame(preprocessor.transform(X), dtype).to_parquet(os.path.join(X_dir, name), index=False)
+    y.to_frame().to_parquet(os.path.join(y_dir, name), index=False)
+
+def update_prepared(store_dir=STORE_DIR, output_dir="processed_data", full_refresh=False, dtype="float32",
+                    refit_growth=REFIT_GROWTH):
+    """Met à jour les comptages avec les partitions pas encore prises en
+    compte. Le préprocesseur reste figé entre deux ajustements : seules ces
+    nouvelles lignes sont transformées, avec les mêmes statistiques que les
+    anciennes. Il est ré-ajusté sur les comptages, et tout le store
+    retransformé, avec full_refresh, quand le schéma de sortie change
+    (nouvelle catégorie one-hot) ou quand le store a grossi de `refit_growth`
+    depuis le dernier ajustement."""
+    state = load_state(store_dir)
+    stats_path = os.path.join(store_dir, STATS_FILE)
+    stats = joblib.load(stats_path) if os.path.exists(stats_path) else init_counts()
+    done = set(state["files"])
+    pending = [p for p in partition_files(store_dir) if os.path.relpath(p, store_dir) not in done]
+
+    with span("update_counts", partitions=len(pending)) as counts_span:
+        n_before = stats["n_rows"]
+        for path in pending:
+            X, _ = prepare_features(read_partition(path))
+            update_counts(stats, X)
+        counts_span.rows = stats["n_rows"] - n_before
+    if stats["n_rows"] == 0:
+        raise ValueError(f"Aucune donnée dans {store_dir}")
+    refit = preprocessor_from_counts(stats)
+    schema = preprocessor_schema(refit)
+
+    X_dir, y_dir = f"{output_dir}/X_prepared.parquet", f"{output_dir}/y_prepared.parquet"
+    fitted_path = os.path.join(store_dir, FITTED_FILE)
+    rebuild = (
+        full_refresh or schema != state["schema"] or not os.path.isdir(X_dir) or not os.path.exists(fitted_path)
+        or state["fitted_rows"] is None or stats["n_rows"] >= state["fitted_rows"] * (1 + refit_growth)
+    )
+    if rebuild:
+        preprocessor = refit
+        state["fitted_rows"] = stats["n_rows"]
+        # Reconstruction complète dans des dossiers temporaires, puis bascule
+        to_transform = partition_files(store_dir)
+        targets = (X_dir + ".tmp", y_dir + ".tmp")
+        for target in targets:
+            shutil.rmtree(target, ignore_errors=True)
+            os.makedirs(target)
+    else:
+        preprocessor = joblib.load(fitted_path)
+        to_transform, targets = pending, (X_dir, y_dir)
+
+    with span("transform_partitions", partitions=len(to_transform)):
+        for path in to_transform:
+            _write_prepared(path, preprocessor, *targets, dtype)
+
+    if rebuild:
+        for final, target in zip((X_dir, y_dir), targets):
+            if os.path.isdir(final):
+                shutil.rmtree(final)
+            elif os.path.exists(final):
+                os.remove(final)  # ancien fichier Parquet unique
+            os.replace(target, final)
+
+    joblib.dump(preprocessor, f"{output_dir}/preprocessor.joblib")
+    joblib.dump(preprocessor, fitted_path)
+    joblib.dump(stats, stats_path)
+    state["files"] = sorted(done | {os.path.relpath(p, store_dir) for p in pending})
+    state["schema"] = schema
+    save_state(state, store_dir)
+
+    mode = "ré-ajustement et reconstruction complète" if rebuild else "ajout, préprocesseur figé"
+    print(f"✅ {len(to_transform)} partition(s) transformée(s) ({mode}), {stats['n_rows']} lignes au total")
+    print("💾 Données et préprocesseur sauvegardés.")
+    return stats["n_rows"]
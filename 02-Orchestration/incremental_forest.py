@@ -0,0 +1,162 @@
+# incremental_forest.py
+
+import os
+import time
+
+import joblib
+import mlflow
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.metrics import accuracy_score, f1_score, roc_auc_score
+from sklearn.model_selection import train_test_split
+
+from crash_preprocessing.tracing import log_spans, recording, span
+from crash_preprocessing.training import BEST_PARAMS, EXPERIMENT, TRACKING_URI, evaluate_and_log, predict_proba_in_batches
+
+FOREST_STATE = "models/forest_state.joblib"
+# Arbres ajoutés à chaque run (entraînés sur les nouvelles partitions seulement)
+TREES_PER_BATCH = 20
+# Fenêtre glissante : lots d'arbres conservés (un lot par run mensuel)
+MAX_BATCHES = 12
+# Forêt de référence réentraînée sur tout l'historique : au 1er run warm_start
+# après une forêt complète, puis tous les 3 (trimestriel avec le flow mensuel)
+COMPARE_EVERY = 3
+
+# 1. Fichiers préparés (un par partition du store, mêmes noms pour X et y)
+def prepared_files(data_dir="processed_data"):
+    X_dir = f"{data_dir}/X_prepared.parquet"
+    if not os.path.isdir(X_dir):
+        raise ValueError(f"{X_dir} n'est pas un dossier : le mode incrémental nécessite le store partitionné")
+    return sorted(name for name in os.listdir(X_dir) if name.endswith(".parquet"))
+
+def read_prepared(data_dir, names):
+    if not names:
+        return pd.DataFrame(), np.empty(0, dtype=int)
+    X = pq.read_table([f"{data_dir}/X_prepared.parquet/{name}" for name in names]).to_pandas()
+    y = pq.read_table([f"{data_dir}/y_prepared.parquet/{name}" for name in names]).column(0).to_numpy()
+    return X, y
+
+def _predictions(model, X):
+    proba = predict_proba_in_batches(model, X, np.arange(len(X)))
+    return model.classes_[proba.argmax(axis=1)], proba[:, 1]
+
+def _scores(model, X, y):
+    y_pred, y_proba = _predictions(model, X)
+    return {"accuracy": accuracy_score(y, y_pred), "f1_score": f1_score(y, y_pred),
+            "roc_auc": roc_auc_score(y, y_proba)}
+
+def fit_full(data_dir, history, X_new, y_new, params):
+    """Forêt complète : partitions déjà vues + nouvelles lignes d'apprentissage"""
+    X_old, y_old = read_prepared(data_dir, history)
+    X_fit, y_fit = pd.concat([X_old, X_new], ignore_index=True), np.concatenate([y_old, y_new])
+    return RandomForestClassifier(**params).fit(X_fit, y_fit), len(y_fit)
+
+# 2. Croissance incrémentale de la forêt
+def load_forest_state(state_path=FOREST_STATE):
+    if not os.path.exists(state_path):
+        return {"model": None, "batches": [], "files": [], "warm_runs": 0}
+    return {"warm_runs": 0, **joblib.load(state_path)}
+
+def retire_oldest(model, batches, max_batches):
+    """Fenêtre glissante : retire les arbres des lots les plus anciens"""
+    while max_batches and len(batches) > max_batches:
+        retired = batches.pop(0)
+        model.estimators_ = model.estimators_[retired["n_trees"]:]
+        model.n_estimators = len(model.estimators_)
+        print(f"🍂 {retired['n_trees']} arbres retirés (lot du {retired['trained_at']})")
+
+def train_incremental(data_dir="processed_data", state_path=FOREST_STATE, params=None,
+                      trees_per_batch=TREES_PER_BATCH, max_batches=MAX_BATCHES, compare_every=COMPARE_EVERY,
+                      tracking_uri=TRACKING_URI, experiment=EXPERIMENT, log_model=True):
+    """Ajoute `trees_per_batch` arbres (warm_start) entraînés sur les seules
+    partitions préparées depuis le dernier run : le coût suit le volume des
+    nouvelles données, pas celui de l'historique.
+
+    Premier run, ou nombre de features modifié (nouvelle catégorie one-hot) :
+    forêt complète sur tout l'historique. 20 % des nouvelles lignes sont
+    gardées pour la validation. Tous les `compare_every` runs warm_start (le
+    1er compris, 0 : jamais), une forêt réentraînée sur tout l'historique est
+    évaluée sur les mêmes lignes. Renvoie (modèle, métriques)."""
+    params = params or BEST_PARAMS
+    state = load_forest_state(state_path)
+    files = prepared_files(data_dir)
+    new = [name for name in files if name not in set(state["files"])]
+    if not new:
+        print("⏭️ Aucune nouvelle partition préparée : forêt inchangée")
+        return state["model"], {}
+
+    X_new, y_new = read_prepared(data_dir, new)
+    fit_idx, test_idx = train_test_split(
+        np.arange(len(y_new)), test_size=0.2, stratify=y_new, random_state=42
+    )
+    X_test, y_test = X_new.iloc[test_idx], y_new[test_idx]
+    history = [name for name in files if name not in new]
+    model, batches, warm_runs = state["model"], state["batches"], state["warm_runs"]
+    batch = {"files": new, "trained_at": time.strftime("%Y-%m-%d")}
+
+    with recording() as spans:
+        with span("fit") as fit_span:
+            if model is None or model.n_features_in_ != X_new.shape[1]:
+                mode = "full"
+                model, n_fit = fit_full(data_dir, history, X_new.iloc[fit_idx], y_new[fit_idx], params)
+                batches = [{**batch, "files": files, "n_trees": model.n_estimators}]
+                warm_runs = 0
+            else:
+                # warm_start : seuls les nouveaux arbres sont ajustés, sur les nouvelles lignes
+                mode, n_fit = "warm_start", len(fit_idx)
+                model.set_params(warm_start=True, n_estimators=len(model.estimators_) + trees_per_batch)
+                model.fit(X_new.iloc[fit_idx], y_new[fit_idx])
+                batches = batches + [{**batch, "n_trees": trees_per_batch}]
+                retire_oldest(model, batches, max_batches)
+                warm_runs += 1
+            fit_span.rows = n_fit
+            fit_span.attributes["mode"] = mode
+        fit_seconds = fit_span.wall_s
+        print(f"🌲 Forêt {mode} : {len(model.estimators_)} arbres, {n_fit} lignes en {fit_seconds:.1f} s")
+
+        comparison = {}
+        if mode == "warm_start" and compare_every and (warm_runs - 1) % compare_every == 0:
+            # Référence : réentraînement complet sur les mêmes lignes d'apprentissage
+            with span("full_refit") as refit_span:
+                reference, refit_span.rows = fit_full(data_dir, history, X_new.iloc[fit_idx], y_new[fit_idx], params)
+            comparison = {f"full_{k}": v for k, v in _scores(reference, X_test, y_test).items()}
+            comparison["full_fit_seconds"] = refit_span.wall_s
+
+    mlflow.set_tracking_uri(tracking_uri)
+    mlflow.set_experiment(experiment)
+    with mlflow.start_run(run_name=f"rf-{mode}"):
+        mlflow.log_params({**params, "mode": mode, "trees_per_batch": trees_per_batch,
+                           "max_batches": max_batches, "compare_every": compare_every, "n_new_files": len(new)})
+        metrics = evaluate_and_log(model, y_test, *_predictions(model, X_test))
+        metrics.update(fit_seconds=fit_seconds, n_trees=len(model.estimators_),
+                       n_batches=len(batches), n_fit_rows=n_fit, **comparison)
+        if comparison:
+            metrics["roc_auc_delta"] = metrics["roc_auc"] - comparison["full_roc_auc"]
+            print(f"⚖️ Réentraînement complet : ROC AUC {comparison['full_roc_auc']:.4f} "
+                  f"en {comparison['full_fit_seconds']:.1f} s (écart {metrics['roc_auc_delta']:+.4f})")
+        mlflow.log_metrics(metrics)
+        log_spans(spans)
+        if log_model:
+            mlflow.sklearn.log_model(model, artifact_path="model")
+            print("✅ Modèle sauvegardé dans MLflow.")
+
+    # Écriture atomique : un run interrompu garde la forêt précédente
+    os.makedirs(os.path.dirname(state_path) or ".", exist_ok=True)
+    joblib.dump({"model": model, "batches": batches, "files": files, "warm_runs": warm_runs}, state_path + ".tmp")
+    os.replace(state_path + ".tmp", state_path)
+    return model, metrics
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--trees-per-batch", type=int, default=TREES_PER_BATCH)
+    parser.add_argument("--max-batches", type=int, default=MAX_BATCHES,
+                        help="Lots d'arbres conservés (0 : aucun retrait)")
+    parser.add_argument("--compare-every", type=int, default=COMPARE_EVERY,
+                        help="Réentraînement complet de référence tous les N runs warm_start (1 : chaque run, 0 : jamais)")
+    args = parser.parse_args()
+    train_incremental(trees_per_batch=args.trees_per_batch, max_batches=args.max_batches,
+                      compare_every=args.compare_every)
@@ -0,0 +1,119 @@
+# portal_download.py
+
+import io
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import pandas as pd
+import requests
+
+from data_store import ingest
+
+PORTAL_URL = "https://data.cityofchicago.org/resource/85ca-t3if.csv"
+PAGE_SIZE = 50_000
+CHECKPOINT_PATH = "data/download_checkpoint.json"
+# Codes HTTP transitoires (limitation de débit, surcharge du portail)
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+# 1. Requêtes SoQL avec réessais
+def fetch(session, url, params, retries=5, backoff=1.0, timeout=120):
+    """GET avec réessais et attente exponentielle sur les erreurs transitoires"""
+    for attempt in range(retries):
+        try:
+            response = session.get(url, params=params, timeout=timeout)
+            if response.status_code not in RETRY_STATUS:
+                response.raise_for_status()
+                return response.text
+            error = requests.HTTPError(f"HTTP {response.status_code}", response=response)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            error = e
+        if attempt == retries - 1:
+            raise error
+        print(f"🔁 Nouvel essai dans {backoff * 2 ** attempt:.0f} s ({error})")
+        time.sleep(backoff * 2 ** attempt)
+
+def count_rows(session, url, where):
+    text = fetch(session, url, {"$select": "count(*) AS n", "$where": where})
+    return int(pd.read_csv(io.StringIO(text))["n"].iloc[0])
+
+def fetch_page(session, url, where, offset, page_size):
+    # Ordre stable (:id) : chaque offset désigne toujours les mêmes lignes
+    params = {"$where": where, "$order": ":id", "$limit": page_size, "$offset": offset}
+    return offset, pd.read_csv(io.StringIO(fetch(session, url, params)), low_memory=False)
+
+# 2. Point de reprise
+def load_checkpoint(path, where, page_size):
+    """Pages déjà traitées pour cette requête, None s'il n'y a rien à reprendre"""
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        checkpoint = json.load(f)
+    if (checkpoint["where"], checkpoint["page_size"]) != (where, page_size):
+        return None
+    return checkpoint
+
+def save_checkpoint(checkpoint, path):
+    with open(path + ".tmp", "w") as f:
+        json.dump(checkpoint, f)
+    os.replace(path + ".tmp", path)
+
+# 3. Téléchargement paginé et parallèle
+def download(where, sink, url=PORTAL_URL, page_size=PAGE_SIZE, workers=4,
+             checkpoint_path=CHECKPOINT_PATH):
+    """Télécharge toutes les lignes de `where` par pages de `page_size`
+    ($limit/$offset), au plus `workers` requêtes en parallèle, et passe
+    chaque page à `sink` dès son arrivée. Une page n'est marquée faite
+    dans le point de reprise qu'après `sink` : un run interrompu reprend
+    aux pages manquantes. Renvoie le nombre de lignes téléchargées."""
+    session = requests.Session()
+    session.mount("https://", requests.adapters.HTTPAdapter(pool_maxsize=workers))
+    session.mount("http://", requests.adapters.HTTPAdapter(pool_maxsize=workers))
+
+    checkpoint = load_checkpoint(checkpoint_path, where, page_size)
+    if checkpoint is None:
+        total = count_rows(session, url, where)
+        checkpoint = {"where": where, "page_size": page_size, "total": total, "done": []}
+    else:
+        print(f"⏯️ Reprise : {len(checkpoint['done'])} page(s) déjà téléchargée(s)")
+    os.makedirs(os.path.dirname(checkpoint_path) or ".", exist_ok=True)
+    save_checkpoint(checkpoint, checkpoint_path)
+
+    done = set(checkpoint["done"])
+    offsets = iter([o for o in range(0, checkpoint["total"], page_size) if o not in done])
+    n_rows = 0
+    with ThreadPoolExecutor(workers) as pool:
+        # Fenêtre bornée : au plus 2 * workers pages en mémoire
+        pending = set()
+        for offset in offsets:
+            pending.add(pool.submit(fetch_page, session, url, where, offset, page_size))
+            if len(pending) >= 2 * workers:
+                break
+        while pending:
+            finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                offset, page = future.result()
+                if not page.empty:
+                    sink(page)
+                n_rows += len(page)
+                checkpoint["done"].append(offset)
+                save_checkpoint(checkpoint, checkpoint_path)
+                next_offset = next(offsets, None)
+                if next_offset is not None:
+                    pending.add(pool.submit(fetch_page, session, url, where, next_offset, page_size))
+
+    os.remove(checkpoint_path)
+    print(f"✅ {n_rows} lignes téléchargées ({checkpoint['total']} attendues).")
+    return n_rows
+
+# 4. Destinations des pages
+def store_sink(store_dir):
+    """Pages écrites directement dans le store partitionné (dédupliquées)"""
+    return lambda page: ingest([page], store_dir)
+
+def csv_sink(path):
+    """Pages ajoutées à un CSV (mode non incrémental)"""
+    def write(page):
+        page.to_csv(path, mode="a", header=not os.path.exists(path), index=False)
+    return write
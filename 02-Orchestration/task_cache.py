@@ -0,0 +1,90 @@
+# task_cache.py
+
+import glob
+import hashlib
+import json
+import os
+from datetime import date
+
+import crash_preprocessing
+from data_store import STORE_DIR, partition_files
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+PROCESSED_DIR = "processed_data"
+HISTORY_CSV = "data/Traffic_Crashes.csv"
+NEW_DATA_CSV = "data/new_data.csv"
+# Sources du paquet partagé (hors dossier de l'orchestration) : prétraitement
+# d'un côté, entraînement (training.py) de l'autre
+PACKAGE_DIR = os.path.dirname(crash_preprocessing.__file__)
+TRAINING_SOURCE = os.path.join(PACKAGE_DIR, "training.py")
+PREPROCESSING_SOURCES = sorted(set(glob.glob(os.path.join(PACKAGE_DIR, "*.py"))) - {TRAINING_SOURCE})
+
+# 1. Empreintes
+def file_digest(paths):
+    """SHA-256 du contenu de fichiers (ou de tous les fichiers des dossiers),
+    dans un ordre stable ; un chemin absent compte comme vide"""
+    digest = hashlib.sha256()
+    for path in paths:
+        files = [path]
+        if os.path.isdir(path):
+            files = sorted(
+                os.path.join(root, name) for root, _, names in os.walk(path) for name in names
+            )
+        for file in files:
+            # Chemin relatif au chemin demandé : indépendant du dossier courant
+            digest.update(os.path.relpath(file, os.path.dirname(path)).encode())
+            if os.path.isfile(file):
+                with open(file, "rb") as f:
+                    for block in iter(lambda: f.read(1 << 20), b""):
+                        digest.update(block)
+    return digest.hexdigest()
+
+def store_digest(store_dir=STORE_DIR):
+    """Empreinte du store incrémental : ses partitions sont immuables et
+    nommées de façon unique, la liste (nom, taille) suffit"""
+    files = [(os.path.relpath(p, store_dir), os.path.getsize(p)) for p in partition_files(store_dir)]
+    return cache_key(files=files)
+
+def code_version(*modules):
+    """Version du code : empreinte des fichiers source du pipeline"""
+    return file_digest([os.path.join(HERE, module) for module in modules])
+
+def cache_key(**parts):
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()
+
+def _outputs_missing(*paths):
+    # Artefacts supprimés : clé unique, le cache ne peut pas être réutilisé
+    missing = [p for p in paths if not os.path.exists(p)]
+    return {"missing": missing, "nonce": os.urandom(8).hex()} if missing else None
+
+# 2. Fonctions cache_key_fn des tâches Prefect (context, parameters)
+def download_cache_key(context, parameters):
+    """Même période demandée le même jour : pas de nouveau téléchargement"""
+    return cache_key(
+        task="download", day=date.today().isoformat(), params=parameters,
+        code=code_version("portal_download.py", "data_store.py"),
+    )
+
+def prepare_cache_key(context, parameters):
+    """Données d'entrée + version du prétraitement + paramètres"""
+    if parameters.get("incremental", True):
+        data = store_digest()
+    else:
+        data = file_digest([HISTORY_CSV, NEW_DATA_CSV])
+    return cache_key(
+        task="prepare", data=data, params=parameters,
+        code=code_version(*PREPROCESSING_SOURCES, "data_store.py"),
+        outputs=_outputs_missing(f"{PROCESSED_DIR}/preprocessor.joblib"),
+    )
+
+def train_cache_key(context, parameters):
+    """Données préparées + version du script d'entraînement + paramètres"""
+    data_dir = parameters.get("data_dir", PROCESSED_DIR)
+    artifacts = sorted(
+        os.path.join(data_dir, name) for name in os.listdir(data_dir)
+        if name.startswith(("X_prepared", "y_prepared"))
+    ) if os.path.isdir(data_dir) else []
+    return cache_key(
+        task="train", data=file_digest(artifacts), params=parameters,
+        code=code_version(TRAINING_SOURCE, "train_rf_optuna.py", "incremental_forest.py"),
+    )
@@ -0,0 +1,10 @@
+# tests/conftest.py
+
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def isolated_cwd(tmp_path, monkeypatch):
+    """Chaque test s'exécute dans tmp_path : les artefacts MLflow (./mlruns
+    par défaut avec un tracking URI SQLite) ne sont pas écrits dans le dépôt"""
+    monkeypatch.chdir(tmp_path)
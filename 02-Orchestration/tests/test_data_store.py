@@ -0,0 +1,66 @@
+# tests/test_data_store.py
+
+import os
+
+import joblib
+import numpy as np
+import pandas as pd
+from data_store import ingest, load_state, update_prepared
+
+
+def crash_rows(start, n, seed):
+    rng = np.random.default_rng(seed)
+    dates = pd.Timestamp("2025-05-01") + pd.to_timedelta(
+        rng.integers(0, 60 * 24 * 3600, n), unit="s"
+    )
+    return pd.DataFrame({
+        "crash_record_id": [f"id{i}" for i in range(start, start + n)],
+        "crash_date": dates.strftime("%Y-%m-%dT%H:%M:%S.000"),
+        "posted_speed_limit": rng.choice([20, 30, 45], n),
+        "weather_condition": rng.choice(["CLEAR", "RAIN"], n),
+        "lighting_condition": rng.choice(["DAYLIGHT", "DARKNESS"], n),
+        "first_crash_type": rng.choice(["REAR END", "ANGLE"], n),
+        "trafficway_type": rng.choice(["ONE-WAY", "NOT DIVIDED"], n),
+        "roadway_surface_cond": rng.choice(["DRY", "WET"], n),
+        "prim_contributory_cause": rng.choice(["UNABLE TO DETERMINE"], n),
+        "crash_hour": dates.hour,
+        "date_police_notified": (dates + pd.Timedelta(minutes=30 + seed)).strftime("%Y-%m-%dT%H:%M:%S.000"),
+        "crash_type": rng.choice(["NO INJURY / DRIVE AWAY", "INJURY AND / OR TOW DUE TO CRASH"], n),
+    })
+
+
+def scaler_mean(preprocessor):
+    return preprocessor.named_transformers_["num"].named_steps["scaler"].mean_
+
+
+def test_update_prepared_freezes_statistics(tmp_path):
+    """Test que les lignes ajoutées sont encodées avec les statistiques du
+    dernier ajustement, ré-ajusté quand le store a assez grossi"""
+    store, output = tmp_path / "store", tmp_path / "processed"
+    os.makedirs(output)
+    X_path = output / "X_prepared.parquet"
+
+    ingest([crash_rows(0, 200, seed=0)], store)
+    update_prepared(store, output)
+    fitted = joblib.load(output / "preprocessor.joblib")
+    first_files = {f: os.path.getmtime(X_path / f) for f in os.listdir(X_path)}
+    assert load_state(store)["fitted_rows"] == 200
+
+    # +5 % : ajout seul, statistiques figées pour les anciennes et nouvelles lignes
+    ingest([crash_rows(200, 10, seed=1)], store)
+    update_prepared(store, output)
+    frozen = joblib.load(output / "preprocessor.joblib")
+    assert np.array_equal(scaler_mean(frozen), scaler_mean(fitted))
+    assert load_state(store)["fitted_rows"] == 200
+    assert len(os.listdir(X_path)) > len(first_files)
+    assert all(os.path.getmtime(X_path / f) == t for f, t in first_files.items())
+    assert len(pd.read_parquet(X_path)) == 210
+
+    # +10 % depuis l'ajustement : ré-ajustement et retransformation complète
+    ingest([crash_rows(210, 15, seed=2)], store)
+    update_prepared(store, output)
+    refit = joblib.load(output / "preprocessor.joblib")
+    assert load_state(store)["fitted_rows"] == 225
+    assert not np.array_equal(scaler_mean(refit), scaler_mean(fitted))
+    assert np.array_equal(scaler_mean(joblib.load(store / "_preprocessor.joblib")), scaler_mean(refit))
+    assert len(pd.read_parquet(output / "y_prepared.parquet")) == 225
@@ -0,0 +1,46 @@
+# tests/test_incremental_forest.py
+
+import numpy as np
+import pandas as pd
+
+from incremental_forest import train_incremental
+
+
+def _write_month(data_dir, month, n=600, seed=0):
+    rng = np.random.default_rng(seed)
+    X = pd.DataFrame(rng.normal(size=(n, 4)).astype("float32"), columns=list("0123"))
+    y = (X["0"] + 0.3 * rng.normal(size=n) > 0).astype(int)
+    for name, frame in (("X", X), ("y", y.to_frame("crash_type"))):
+        (data_dir / f"{name}_prepared.parquet").mkdir(exist_ok=True)
+        frame.to_parquet(data_dir / f"{name}_prepared.parquet" / f"{month}-part.parquet", index=False)
+
+
+def test_warm_start_adds_and_retires_trees(tmp_path):
+    """Test que chaque run ajoute un lot d'arbres et que la fenêtre retire les plus anciens"""
+    kwargs = dict(
+        data_dir=str(tmp_path), state_path=str(tmp_path / "forest.joblib"),
+        params={"n_estimators": 10, "random_state": 0}, trees_per_batch=4, max_batches=2,
+        tracking_uri=f"sqlite:///{tmp_path}/mlflow.db", log_model=False,
+    )
+    _write_month(tmp_path, "2024-01")
+    model, metrics = train_incremental(**kwargs)
+    assert len(model.estimators_) == 10 and metrics["n_batches"] == 1
+
+    _write_month(tmp_path, "2024-02", seed=1)
+    model, metrics = train_incremental(**kwargs)
+    assert len(model.estimators_) == 14
+    assert metrics["n_fit_rows"] == 480  # nouvelles lignes d'apprentissage seulement
+    assert {"full_roc_auc", "roc_auc_delta"} <= set(metrics)
+
+    _write_month(tmp_path, "2024-03", seed=2)
+    model, metrics = train_incremental(**kwargs)
+    assert len(model.estimators_) == 8  # forêt initiale retirée
+    assert "full_roc_auc" not in metrics  # référence tous les 3 runs warm_start
+    assert model.predict_proba(pd.DataFrame(np.zeros((1, 4)), columns=list("0123"))).shape == (1, 2)
+
+    _, metrics = train_incremental(**kwargs)
+    assert metrics == {}
+
+    _write_month(tmp_path, "2024-04", seed=3)
+    _, metrics = train_incremental(**{**kwargs, "compare_every": 1})
+    assert "full_roc_auc" in metrics
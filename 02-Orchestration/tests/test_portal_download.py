@@ -0,0 +1,116 @@
+# tests/test_portal_download.py
+
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import pandas as pd
+import pytest
+from data_store import partition_files, load_state
+from portal_download import download, store_sink
+
+N_ROWS = 230
+
+
+def canned_rows():
+    rng = np.random.default_rng(0)
+    dates = pd.Timestamp("2025-05-01") + pd.to_timedelta(
+        rng.integers(0, 90 * 24 * 3600, N_ROWS), unit="s"
+    )
+    return pd.DataFrame({
+        "crash_record_id": [f"id{i}" for i in range(N_ROWS)],
+        "crash_date": dates.strftime("%Y-%m-%dT%H:%M:%S.000"),
+        "posted_speed_limit": rng.choice([20, 30, 45], N_ROWS),
+        "weather_condition": rng.choice(["CLEAR", "RAIN"], N_ROWS),
+        "lighting_condition": rng.choice(["DAYLIGHT", "DARKNESS"], N_ROWS),
+        "first_crash_type": rng.choice(["REAR END", "ANGLE"], N_ROWS),
+        "trafficway_type": rng.choice(["ONE-WAY", "NOT DIVIDED"], N_ROWS),
+        "roadway_surface_cond": rng.choice(["DRY", "WET"], N_ROWS),
+        "prim_contributory_cause": rng.choice(["UNABLE TO DETERMINE"], N_ROWS),
+        "crash_hour": dates.hour,
+        "date_police_notified": (dates + pd.Timedelta(minutes=30)).strftime("%Y-%m-%dT%H:%M:%S.000"),
+        "crash_type": rng.choice(["NO INJURY / DRIVE AWAY", "INJURY AND / OR TOW DUE TO CRASH"], N_ROWS),
+    })
+
+
+@pytest.fixture
+def portal():
+    """Faux portail SoQL : count(*), pages $limit/$offset et une erreur 503"""
+    rows = canned_rows()
+    state = {"requests": [], "fail_once": {100}}
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            params = {k: v[0] for k, v in parse_qs(urlparse(self.path).query).items()}
+            state["requests"].append(params)
+            if params.get("$select") == "count(*) AS n":
+                body = f"n\n{len(rows)}\n"
+            else:
+                offset = int(params["$offset"])
+                if offset in state["fail_once"]:
+                    state["fail_once"].discard(offset)
+                    self.send_response(503)
+                    self.end_headers()
+                    return
+                page = rows.iloc[offset:offset + int(params["$limit"])]
+                body = page.to_csv(index=False)
+            self.send_response(200)
+            self.send_header("Content-Type", "text/csv")
+            self.end_headers()
+            self.wfile.write(body.encode())
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}/resource.csv", rows, state
+    server.shutdown()
+
+
+def test_download_pages_to_store(portal, tmp_path, monkeypatch):
+    """Test que toutes les pages arrivent dans le store malgré une erreur 503"""
+    url, rows, state = portal
+    monkeypatch.setattr("time.sleep", lambda s: None)
+    store = tmp_path / "store"
+
+    n = download("crash_date>='2025-05-01'", store_sink(store), url=url, page_size=50,
+                 workers=3, checkpoint_path=str(tmp_path / "checkpoint.json"))
+
+    assert n == N_ROWS
+    stored = pd.concat([pd.read_parquet(p) for p in partition_files(store)])
+    assert sorted(stored["crash_record_id"]) == sorted(rows["crash_record_id"])
+    assert load_state(store)["watermark"] == pd.to_datetime(rows["crash_date"]).max().isoformat()
+    assert not (tmp_path / "checkpoint.json").exists()
+    assert all(r.get("$order") == ":id" for r in state["requests"][1:])
+
+
+def test_download_resumes_from_checkpoint(portal, tmp_path, monkeypatch):
+    """Test qu'un run interrompu reprend aux pages manquantes"""
+    url, rows, state = portal
+    monkeypatch.setattr("time.sleep", lambda s: None)
+    store, checkpoint = tmp_path / "store", str(tmp_path / "checkpoint.json")
+    sink = store_sink(store)
+    calls = []
+
+    def crashing_sink(page):
+        if len(calls) == 2:
+            raise RuntimeError("interruption")
+        calls.append(len(page))
+        sink(page)
+
+    with pytest.raises(RuntimeError):
+        download("crash_date>='2025-05-01'", crashing_sink, url=url, page_size=50,
+                 workers=1, checkpoint_path=checkpoint)
+    n_requests = len(state["requests"])
+
+    download("crash_date>='2025-05-01'", sink, url=url, page_size=50,
+             workers=1, checkpoint_path=checkpoint)
+
+    # Pas de nouveau count(*) ni de pages déjà traitées
+    offsets = [int(r["$offset"]) for r in state["requests"][n_requests:]]
+    assert sorted(set(offsets)) == [100, 150, 200]
+    stored = pd.concat([pd.read_parquet(p) for p in partition_files(store)])
+    assert stored["crash_record_id"].is_unique
+    assert len(stored) == N_ROWS
@@ -0,0 +1,28 @@
+# tests/test_task_cache.py
+
+import task_cache
+
+
+def test_prepare_cache_key_tracks_data_and_params(tmp_path, monkeypatch):
+    """Test que la clé change avec les données ou les paramètres, pas sinon"""
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "data").mkdir()
+    (tmp_path / "processed_data").mkdir()
+    (tmp_path / "processed_data" / "preprocessor.joblib").write_bytes(b"p")
+    (tmp_path / "data" / "new_data.csv").write_text("a\n1\n")
+    params = {"incremental": False, "fmt": "parquet"}
+
+    key = task_cache.prepare_cache_key(None, params)
+    assert task_cache.prepare_cache_key(None, dict(params)) == key
+    assert task_cache.prepare_cache_key(None, {**params, "fmt": "npy"}) != key
+
+    (tmp_path / "data" / "new_data.csv").write_text("a\n2\n")
+    assert task_cache.prepare_cache_key(None, params) != key
+
+
+def test_prepare_cache_key_misses_without_outputs(tmp_path, monkeypatch):
+    """Test qu'un artefact supprimé empêche de réutiliser le cache"""
+    monkeypatch.chdir(tmp_path)
+    params = {"incremental": True}
+
+    assert task_cache.prepare_cache_key(None, params) != task_cache.prepare_cache_key(None, params)
@@ -0,0 +1,99 @@
+# tests/test_train_model.py
+
+import numpy as np
+import pandas as pd
+
+from crash_preprocessing import prepare_features
+from crash_preprocessing.training import compare_backends, make_model, train_model, tune
+
+
+def test_train_model_in_memory_and_from_artifacts(tmp_path):
+    """Test que l'entraînement accepte des tableaux en mémoire ou un dossier d'artefacts"""
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(400, 5)).astype("float32")
+    y = (X[:, 0] + 0.1 * rng.normal(size=400) > 0).astype(int)
+    params = {"n_estimators": 5, "random_state": 0}
+    tracking_uri = f"sqlite:///{tmp_path}/mlflow.db"
+
+    model, metrics = train_model((X, y), params, tracking_uri=tracking_uri, log_model=False)
+    assert model.n_features_in_ == 5
+    assert set(metrics) == {"accuracy", "f1_score", "roc_auc"}
+    assert metrics["roc_auc"] > 0.9
+
+    pd.DataFrame(X).to_parquet(tmp_path / "X_prepared.parquet", index=False)
+    pd.DataFrame({"y": y}).to_parquet(tmp_path / "y_prepared.parquet", index=False)
+    _, from_disk = train_model(str(tmp_path), params, tracking_uri=tracking_uri, log_model=False)
+    assert from_disk == metrics
+
+
+def test_tune_parallel_with_pruning(tmp_path):
+    """Test que la recherche parallèle arrête des essais tôt et renvoie des paramètres utilisables"""
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(1500, 5)).astype("float32")
+    y = (X[:, 0] + X[:, 1] * X[:, 2] > 0).astype(int)
+    tracking_uri = f"sqlite:///{tmp_path}/mlflow.db"
+
+    params, report = tune((X, y), n_trials=8, n_jobs=2, tracking_uri=tracking_uri)
+    assert (tmp_path / "optuna.db").exists()
+    assert report["tuning_n_complete"] + report["tuning_n_pruned"] == 8
+    assert report["tuning_n_pruned"] > 0
+    assert report["tuning_seconds_per_core"] > 0
+
+    model, _ = train_model((X, y), params, tracking_uri=tracking_uri, log_model=False)
+    assert model.n_estimators == params["n_estimators"]
+
+
+def _raw_frame(n=600, seed=0):
+    rng = np.random.default_rng(seed)
+    crash_date = pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 10**7, n), unit="s")
+    first_crash_type = rng.choice(["REAR END", "ANGLE", "PEDESTRIAN"], n).astype(object)
+    first_crash_type[::50] = np.nan
+    return pd.DataFrame({
+        "crash_date": crash_date,
+        "date_police_notified": crash_date + pd.to_timedelta(rng.integers(0, 300, n), unit="min"),
+        "posted_speed_limit": rng.choice([20, 30, 45], n),
+        "weather_condition": rng.choice(["CLEAR", "RAIN"], n),
+        "lighting_condition": rng.choice(["DAYLIGHT", "DARKNESS"], n),
+        "first_crash_type": first_crash_type,
+        "trafficway_type": rng.choice(["ONE-WAY", "NOT DIVIDED"], n),
+        "roadway_surface_cond": rng.choice(["DRY", "WET"], n),
+        "prim_contributory_cause": rng.choice(["UNABLE TO DETERMINE", "FOLLOWING TOO CLOSELY"], n),
+        "crash_hour": crash_date.hour,
+        "crash_type": np.where(first_crash_type == "PEDESTRIAN", "INJURY AND / OR TOW DUE TO CRASH",
+                               "NO INJURY / DRIVE AWAY"),
+    })
+
+
+def test_native_categorical_model_handles_unknown_categories():
+    """Test que le pipeline à catégories natives accepte une catégorie jamais vue"""
+    X, y = prepare_features(_raw_frame())
+    model = make_model("hgb", {"max_iter": 20}, native_categorical=True).fit(X, y)
+    unseen = X.iloc[[0]].assign(first_crash_type="SIDESWIPE")
+    assert model.predict_proba(unseen).shape == (1, 2)
+
+
+def test_compare_backends_reports_each_variant(tmp_path):
+    """Test que la comparaison mesure chaque backend sur les mêmes lignes"""
+    table = compare_backends(prepare_features(_raw_frame()), tracking_uri=f"sqlite:///{tmp_path}/mlflow.db")
+    assert list(table["backend"]) == ["rf", "hgb", "hgb_native"]
+    assert {"fit_seconds", "model_mb", "latency_ms", "roc_auc"} <= set(table.columns)
+    assert (table["roc_auc"] > 0.9).all()
+
+
+def test_train_model_logs_stage_spans(tmp_path):
+    """Test que le run d'entraînement contient la durée, le CPU, le pic RSS et les lignes de chaque étape"""
+    import mlflow
+
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(300, 4)).astype("float32")
+    y = (X[:, 0] > 0).astype(int)
+    tracking_uri = f"sqlite:///{tmp_path}/mlflow.db"
+    train_model((X, y), {"n_estimators": 3, "random_state": 0}, tracking_uri=tracking_uri, log_model=False)
+
+    run = mlflow.last_active_run()
+    metrics = run.data.metrics
+    assert metrics["stage/load_training_data/rows"] == 300
+    assert metrics["stage/fit/rows"] == 240
+    assert {"stage/fit/wall_s", "stage/fit/cpu_s", "stage/fit/peak_rss_mb"} <= set(metrics)
+    spans = mlflow.artifacts.load_dict(f"{run.info.artifact_uri}/trace/spans.json")["spans"]
+    assert [s["name"] for s in spans] == ["load_training_data", "fit", "predict_test"]
@@ -3,12 +3,24 @@ from prefect.deployments import Deployment
 from prefect.server.schemas.schedules import IntervalSchedule
 from datetime import datetime, timedelta
 import pandas as pd
-import subprocess
 import joblib
 import os
 import numpy as np
 import argparse
-from prepare_data import preprocess_data, load_data
+import mlflow
+from crash_preprocessing import preprocess_data, load_data, save_data, preprocess_data_streaming
+from crash_preprocessing.tracing import log_spans, recording, set_profile_stage, span, traced
+from data_store import STORE_DIR, ingest_csv, load_state, update_prepared
+from portal_download import CHECKPOINT_PATH, PAGE_SIZE, csv_sink, download, load_checkpoint, store_sink
+from crash_preprocessing.training import EXPERIMENT, TRACKING_URI, train_model, tune
+from incremental_forest import COMPARE_EVERY, train_incremental
+from task_cache import download_cache_key, prepare_cache_key, train_cache_key
+
+# Durée de validité des résultats en cache (jours)
+CACHE_DAYS = 30
+# Reprise au filigrane : accidents signalés en retard (date_police_notified
+# postérieure de plusieurs jours à crash_date) relus sur cette marge (jours)
+LATE_DAYS = 14
 
 def get_default_period():
     """Détecte automatiquement le mois/année précédent"""
@@ -17,56 +29,130 @@ def get_default_period():
         return 12, now.year - 1
     return now.month - 1, now.year
 
-@task
-def download_new_data_task(month: int, year: int):
+HISTORY_CSV = "data/Traffic_Crashes.csv"
+NEW_DATA_CSV = "data/new_data.csv"
+# Artefacts lus par crash_preprocessing.training et incremental_forest.py
+PREPARED_NAMES = ("X_prepared", "y_prepared")
+
+@task(cache_key_fn=download_cache_key, cache_expiration=timedelta(days=1), persist_result=True)
+@traced()
+def download_new_data_task(month: int, year: int, incremental: bool = True,
+                           use_watermark: bool = False, workers: int = 4, late_days: int = LATE_DAYS):
     date_str = f"{year:04d}-{month:02d}-01"
+    if incremental:
+        if load_state(STORE_DIR)["watermark"] is None and os.path.exists(HISTORY_CSV):
+            ingest_csv([HISTORY_CSV], STORE_DIR)  # 1er run : amorçage avec l'historique
+        # Reprise au filigrane du store (dernière crash_date ingérée) moins
+        # late_days : les lignes déjà présentes sont écartées par ingest
+        # (crash_record_id connu)
+        watermark = load_state(STORE_DIR)["watermark"]
+        if use_watermark and watermark:
+            date_str = (pd.Timestamp(watermark) - timedelta(days=late_days)).isoformat()
     print(f"📥 Téléchargement des données depuis {date_str}...")
-    
-    url = f"https://data.cityofchicago.org/resource/85ca-t3if.csv?$where=crash_date>'{date_str}'"
-    df = pd.read_csv(url)
+
+    # Pages $limit/$offset téléchargées en parallèle, avec reprise
+    where = f"crash_date>='{date_str}'"
+    if incremental:
+        return download(where, store_sink(STORE_DIR), workers=workers)
     os.makedirs("data", exist_ok=True)
-    df.to_csv("data/new_data.csv", index=False)
-    
-    print(f"✅ {df.shape[0]} lignes téléchargées.")
-    return "data/new_data.csv"
+    if load_checkpoint(CHECKPOINT_PATH, where, PAGE_SIZE) is None and os.path.exists(NEW_DATA_CSV):
+        os.remove(NEW_DATA_CSV)  # nouveau téléchargement (pas de reprise)
+    download(where, csv_sink(NEW_DATA_CSV), workers=workers)
+    return NEW_DATA_CSV
+
+@task(cache_key_fn=prepare_cache_key, cache_expiration=timedelta(days=CACHE_DAYS), persist_result=True)
+@traced()
+def prepare_and_extend_data_task(chunksize: int = None, fmt: str = "parquet",
+                                 incremental: bool = True, full_refresh: bool = False):
+    if incremental:
+        # Store partitionné par mois (alimenté par le téléchargement) : seules
+        # les nouvelles partitions sont prises en compte et transformées
+        return update_prepared(STORE_DIR, "processed_data", full_refresh=full_refresh)
+
+    if chunksize:
+        # Mode flux : mémoire bornée par la taille des blocs
+        paths = [p for p in (HISTORY_CSV, NEW_DATA_CSV) if os.path.exists(p)]
+        n_rows, _ = preprocess_data_streaming(paths, "processed_data", chunksize, fmt=fmt, names=PREPARED_NAMES)
+        return n_rows
 
-@task
-def prepare_and_extend_data_task():
     # Chargement des données
     try:
-        df_old = pd.read_csv('data/Traffic_Crashes.csv')
-        df_old.columns = df_old.columns.str.lower()
+        df_old = load_data(HISTORY_CSV)
     except FileNotFoundError:
         df_old = pd.DataFrame()
 
-    df_new = load_data("data/new_data.csv")
+    df_new = load_data(NEW_DATA_CSV)
     df_full = pd.concat([df_old, df_new], ignore_index=True)
 
     # Prétraitement
     X, y, preprocessor = preprocess_data(df_full)
     
     # Sauvegarde
-    os.makedirs("processed_data", exist_ok=True)
-    pd.DataFrame(X).to_csv("processed_data/X_prepared.csv", index=False)
-    pd.DataFrame(y).to_csv("processed_data/y_prepared.csv", index=False)
-    joblib.dump(preprocessor, "processed_data/preprocessor.joblib")
+    save_data(X, y, preprocessor, "processed_data", fmt=fmt, names=PREPARED_NAMES)
     
     print(f"✅ Données mises à jour : {X.shape[0]} échantillons")
     return X.shape[0]
 
-@task
-def train_model_task():
-    subprocess.run(["python", "train_rf_optuna.py"], check=True)
-    return "✅ Modèle entraîné et logué."
+@task(cache_key_fn=train_cache_key, cache_expiration=timedelta(days=CACHE_DAYS), persist_result=True)
+@traced()
+def train_model_task(data_dir: str = "processed_data", tuning: bool = False,
+                     n_trials: int = 40, n_jobs: int = None, warm_start: bool = False,
+                     compare_every: int = COMPARE_EVERY):
+    # Entraînement dans le processus du flow : pas de nouvel interpréteur ni
+    # de ré-import de pandas/sklearn/mlflow ; le modèle reste en mémoire
+    params = None
+    if tuning:
+        # Nouvelle recherche Optuna sur les données à jour (dérive)
+        params, _ = tune(data_dir, n_trials=n_trials, n_jobs=n_jobs)
+    if warm_start:
+        # Arbres ajoutés sur les nouvelles partitions seulement ; la forêt de
+        # référence sur tout l'historique (coût croissant) tous les
+        # `compare_every` runs
+        _, metrics = train_incremental(data_dir, params=params, compare_every=compare_every)
+    else:
+        _, metrics = train_model(data_dir, params)
+    return metrics
+
+def log_pipeline_trace(spans):
+    """Spans du run dans un run MLflow « pipeline-trace » (métriques
+    stage/<étape>/<mesure>, trace/spans.json, profils) et dans la console"""
+    for s in spans:
+        print(s.summary())
+    mlflow.set_tracking_uri(TRACKING_URI)
+    mlflow.set_experiment(EXPERIMENT)
+    with mlflow.start_run(run_name="pipeline-trace"):
+        log_spans(spans)
 
-@flow(name="Chicago Traffic - ML Pipeline", persist_result=False)
-def main_pipeline(month: int = None, year: int = None):
+@flow(name="Chicago Traffic - ML Pipeline", persist_result=True)
+def main_pipeline(month: int = None, year: int = None, chunksize: int = None,
+                  fmt: str = "parquet", incremental: bool = True, full_refresh: bool = False,
+                  workers: int = 4, cache_days: int = CACHE_DAYS, refresh_cache: bool = False,
+                  tuning: bool = False, n_trials: int = 40, warm_start: bool = False,
+                  compare_every: int = COMPARE_EVERY, late_days: int = LATE_DAYS):
+    # Le store incrémental produit du Parquet ; --chunksize/--format gardent l'ancien mode
+    incremental = incremental and fmt == "parquet" and not chunksize
+    # Sans mois explicite, le store incrémental reprend à son filigrane
+    use_watermark = not (month and year)
     # Détection automatique si non spécifié
     month, year = (month, year) if (month and year) else get_default_period()
-    
-    download_new_data_task(month, year)
-    prepare_and_extend_data_task()
-    train_model_task()
+
+    # Cache : une étape dont les entrées, le code et les paramètres n'ont pas
+    # changé renvoie son résultat persisté ; refresh_cache force le recalcul
+    options = {"refresh_cache": refresh_cache}
+    prepare = prepare_and_extend_data_task.with_options(cache_expiration=timedelta(days=cache_days), **options)
+    train = train_model_task.with_options(cache_expiration=timedelta(days=cache_days), **options)
+
+    # ⏱️ Durée, CPU, pic RSS et lignes de chaque étape, même si le run échoue
+    with recording() as spans:
+        try:
+            with span("main_pipeline"):
+                download_new_data_task.with_options(**options)(month, year, incremental, use_watermark, workers, late_days)
+                prepare(chunksize, fmt, incremental, full_refresh)
+                # La croissance incrémentale de la forêt suit les partitions du store
+                train("processed_data", tuning, n_trials, warm_start=warm_start and incremental,
+                      compare_every=compare_every)
+        finally:
+            log_pipeline_trace(spans)
 
 def deploy():
     """Crée un déploiement programmé"""
@@ -81,12 +167,44 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("--month", type=int, default=None)
     parser.add_argument("--year", type=int, default=None)
+    parser.add_argument("--chunksize", type=int, default=None,
+                        help="Prétraitement en flux par blocs de N lignes")
+    parser.add_argument("--format", dest="fmt", choices=["parquet", "npy", "csv"], default="parquet",
+                        help="Format des artefacts X/y (npy : mmap, csv : export de débogage)")
+    parser.add_argument("--no-incremental", dest="incremental", action="store_false",
+                        help="Reconcaténer et retraiter tout l'historique (ancien mode)")
+    parser.add_argument("--full-refresh", action="store_true",
+                        help="Ré-ajuster le préprocesseur et retransformer tout le store incrémental")
+    parser.add_argument("--workers", type=int, default=4,
+                        help="Pages téléchargées en parallèle depuis le portail")
+    parser.add_argument("--late-days", type=int, default=LATE_DAYS,
+                        help="Jours relus avant le filigrane (accidents signalés en retard)")
+    parser.add_argument("--cache-days", type=int, default=CACHE_DAYS,
+                        help="Validité des résultats en cache (prétraitement, entraînement)")
+    parser.add_argument("--refresh-cache", action="store_true",
+                        help="Ignorer le cache et tout recalculer")
+    parser.add_argument("--tune", dest="tuning", action="store_true",
+                        help="Relancer la recherche Optuna avant l'entraînement")
+    parser.add_argument("--n-trials", type=int, default=40, help="Essais Optuna")
+    parser.add_argument("--warm-start", action="store_true",
+                        help="Ajouter des arbres entraînés sur les nouvelles partitions (warm_start)")
+    parser.add_argument("--compare-every", type=int, default=COMPARE_EVERY,
+                        help="Avec --warm-start, forêt réentraînée sur tout l'historique tous les N runs (1 : chaque run, 0 : jamais)")
+    parser.add_argument("--profile", metavar="ETAPE",
+                        help="Profil cProfile d'une étape (ex. preprocess_data), journalisé dans MLflow")
     parser.add_argument("--deploy", action="store_true", help="Créer un déploiement programmé")
 
     args = parser.parse_args()
+    if args.profile:
+        set_profile_stage(args.profile)
 
     if args.deploy:
         deploy()
         print("✅ Déploiement créé. Le pipeline s'exécutera automatiquement chaque mois.")
     else:
-        main_pipeline(month=args.month, year=args.year)
\ No newline at end of file
+        main_pipeline(month=args.month, year=args.year, chunksize=args.chunksize, fmt=args.fmt,
+                      incremental=args.incremental, full_refresh=args.full_refresh,
+                      workers=args.workers, late_days=args.late_days, cache_days=args.cache_days,
+                      refresh_cache=args.refresh_cache, tuning=args.tuning,
+                      n_trials=args.n_trials, warm_start=args.warm_start,
+                      compare_every=args.compare_every)
\ No newline at end of file
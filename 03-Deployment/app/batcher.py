@@ -0,0 +1,82 @@
+import asyncio
+from fastapi.concurrency import run_in_threadpool
+from prometheus_client import Gauge, Histogram
+
+QUEUE_DEPTH = Gauge(
+    "predict_queue_depth", "Requêtes /predict en attente de micro-lot",
+    multiprocess_mode="livesum",
+)
+BATCH_SIZE = Histogram(
+    "predict_batch_size", "Nombre de lignes par micro-lot",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 512),
+)
+
+
+class MicroBatcher:
+    """Regroupe les requêtes unitaires concurrentes en micro-lots.
+
+    Chaque requête est mise en file ; une tâche de fond attend au plus
+    `max_wait_ms` millisecondes (ou `max_batch_size` lignes) puis exécute
+    `predict_fn` sur le lot fusionné dans un thread, et renvoie à chaque
+    appelant son propre résultat.
+    """
+
+    def __init__(self, predict_fn, max_batch_size=64, max_wait_ms=5.0):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.queue = None
+        self._task = None
+
+    async def start(self):
+        self.queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def submit(self, row):
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((row, future))
+        QUEUE_DEPTH.set(self.queue.qsize())
+        return await future
+
+    async def _collect(self):
+        batch = [await self.queue.get()]
+        deadline = asyncio.get_running_loop().time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            if not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+                continue
+            timeout = deadline - asyncio.get_running_loop().time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        QUEUE_DEPTH.set(self.queue.qsize())
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._collect()
+            rows = [row for row, _ in batch]
+            futures = [future for _, future in batch]
+            BATCH_SIZE.observe(len(rows))
+            try:
+                results = await run_in_threadpool(self.predict_fn, rows)
+            except Exception as e:
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for future, result in zip(futures, results):
+                # L'appelant a pu abandonner (déconnexion client)
+                if not future.done():
+                    future.set_result(result)
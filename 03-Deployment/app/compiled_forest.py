@@ -0,0 +1,155 @@
+import argparse
+import hashlib
+import os
+import pickle
+
+import joblib
+import numpy as np
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def is_current(compiled, source_path):
+    # Artefact compilé valide s'il a été exporté depuis le fichier source actuel
+    return not os.path.exists(source_path) or compiled.source_sha256 == file_sha256(source_path)
+
+
+def leaf_index(is_leaf):
+    # Position de chaque feuille dans le tableau compact `value`, -1 sinon
+    return np.where(is_leaf, np.cumsum(is_leaf) - 1, -1).astype(np.int32)
+
+
+class CompiledForest:
+    """Forêt aléatoire aplatie en tableaux contigus pour l'inférence.
+
+    Tous les nœuds de tous les arbres sont concaténés : `feature`,
+    `threshold`, `left`, `right` (int32/float64) et `leaf`, l'indice de la
+    feuille dans `value` (-1 pour un nœud interne). `value` ne contient que
+    les feuilles : nombre d'échantillons de chaque classe (int32 quand les
+    poids sont entiers, sinon les fractions float64 de sklearn). Les feuilles
+    bouclent sur elles-mêmes, ce qui permet de parcourir tous les arbres pour
+    tout le lot avec `max_depth` opérations NumPy. Les probabilités sont calculées
+    dans le même ordre que sklearn : prédictions identiques à
+    RandomForestClassifier.
+    """
+
+    ARRAYS = ("feature", "threshold", "left", "right", "leaf", "value", "roots", "classes_")
+
+    def __init__(self, feature, threshold, left, right, leaf, value, roots, classes_,
+                 max_depth, n_features_in_, source_sha256=None):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.leaf = leaf
+        self.value = value
+        self.roots = roots
+        self.classes_ = classes_
+        self.max_depth = int(max_depth)
+        self.n_features_in_ = int(n_features_in_)
+        self.source_sha256 = source_sha256
+
+    @classmethod
+    def from_sklearn(cls, forest, source_sha256=None):
+        features, thresholds, lefts, rights, leaves, values, weights, roots = [], [], [], [], [], [], [], []
+        offset, max_depth = 0, 0
+        for estimator in forest.estimators_:
+            tree = estimator.tree_
+            nodes = np.arange(tree.node_count)
+            is_leaf = tree.children_left == -1
+            # Feuilles : boucle sur elles-mêmes (seuil +inf, toujours à gauche)
+            features.append(np.where(is_leaf, 0, tree.feature))
+            thresholds.append(np.where(is_leaf, np.inf, tree.threshold))
+            lefts.append(np.where(is_leaf, nodes, tree.children_left) + offset)
+            rights.append(np.where(is_leaf, nodes, tree.children_right) + offset)
+            values.append(tree.value[is_leaf, 0, :])
+            weights.append(tree.weighted_n_node_samples[is_leaf])
+            leaves.append(is_leaf)
+            roots.append(offset)
+            offset += tree.node_count
+            max_depth = max(max_depth, tree.max_depth)
+
+        # Fractions sklearn -> effectifs entiers par classe (bootstrap sans
+        # class_weight), gardés seulement s'ils redonnent exactement les fractions
+        value = np.concatenate(values)
+        counts = np.rint(value * np.concatenate(weights)[:, None])
+        if (counts.max() < np.iinfo(np.int32).max
+                and np.array_equal(counts / counts.sum(axis=1, keepdims=True), value)):
+            value = counts.astype(np.int32)
+
+        return cls(
+            feature=np.concatenate(features).astype(np.int32),
+            threshold=np.concatenate(thresholds).astype(np.float64),
+            left=np.concatenate(lefts).astype(np.int32),
+            right=np.concatenate(rights).astype(np.int32),
+            leaf=leaf_index(np.concatenate(leaves)),
+            value=value,
+            roots=np.asarray(roots, dtype=np.int32),
+            classes_=forest.classes_,
+            max_depth=max_depth,
+            n_features_in_=forest.n_features_in_,
+            source_sha256=source_sha256,
+        )
+
+    def apply(self, X):
+        """Indice global de la feuille atteinte, pour chaque ligne et chaque arbre"""
+        # Même conversion que sklearn : comparaison float32 <= seuil float64
+        X = np.asarray(X, dtype=np.float32)
+        rows = np.arange(X.shape[0])[:, None]
+        nodes = np.broadcast_to(self.roots, (X.shape[0], len(self.roots)))
+        for _ in range(self.max_depth):
+            go_left = X[rows, self.feature[nodes]] <= self.threshold[nodes]
+            next_nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+            if np.array_equal(next_nodes, nodes):  # toutes les feuilles atteintes
+                break
+            nodes = next_nodes
+        return nodes
+
+    def predict_proba(self, X):
+        leaves = self.apply(X)
+        value = self.value[self.leaf[leaves]]  # (lignes, arbres, classes)
+        if value.dtype.kind == "i":
+            # Fractions recalculées exactement comme dans l'arbre sklearn
+            value = value / value.sum(axis=2, keepdims=True)
+        # cumsum : somme arbre par arbre, dans le même ordre que sklearn
+        proba = np.cumsum(value, axis=1)[:, -1]
+        proba /= leaves.shape[1]
+        return proba
+
+    def predict(self, X):
+        return self.classes_.take(np.argmax(self.predict_proba(X), axis=1), axis=0)
+
+    def save(self, path):
+        # Tableaux bruts non compressés : rechargeables avec mmap_mode="r"
+        state = {name: getattr(self, name) for name in self.ARRAYS}
+        state.update(max_depth=self.max_depth, n_features_in_=self.n_features_in_,
+                     source_sha256=self.source_sha256)
+        joblib.dump(state, path)
+
+    @classmethod
+    def load(cls, path, mmap_mode=None):
+        state = joblib.load(path, mmap_mode=mmap_mode)
+        if "leaf" not in state:
+            # Ancien export (`value` pour tous les nœuds) : feuilles extraites
+            is_leaf = state["left"] == np.arange(len(state["left"]))
+            state.update(leaf=leaf_index(is_leaf), value=np.asarray(state["value"])[is_leaf])
+        return cls(**state)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Exporte model.pkl en forêt compilée")
+    parser.add_argument("--model", default="app/model/model.pkl")
+    parser.add_argument("--output", default="app/model/model_compiled.joblib")
+    args = parser.parse_args()
+
+    with open(args.model, "rb") as f:
+        forest = pickle.load(f)
+    compiled = CompiledForest.from_sklearn(forest, source_sha256=file_sha256(args.model))
+    compiled.save(args.output)
+    print(f"✅ Forêt compilée : {len(compiled.roots)} arbres, {len(compiled.feature)} nœuds, {len(compiled.value)} feuilles -> {args.output}")
@@ -0,0 +1,189 @@
+import bisect
+import glob
+import hashlib
+import json
+import math
+import os
+import threading
+import uuid
+
+import numpy as np
+from crash_preprocessing import FEATURE_SPEC
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+# Profil de référence (04-Monitoring/drift_monitor.py), à côté de preprocessor.joblib
+PROFILE_FILE = "reference_profile.json"
+MISSING = "<NA>"
+OTHER = "<AUTRE>"
+NUMERIC_FEATURES = list(FEATURE_SPEC.numeric)
+# Bornes utilisées sans profil de référence
+DEFAULT_EDGES = {
+    "posted_speed_limit": [10, 15, 20, 25, 30, 35, 40, 45, 55],
+    "crash_hour": list(range(24)),
+    "delay_police_minutes": [0, 5, 15, 30, 60, 120, 360, 1440, 10080],
+}
+PROBA_EDGES = [i / 10 for i in range(1, 10)]
+
+
+def _is_missing(value):
+    return value is None or value != value
+
+
+class StatsLayout:
+    """Position de chaque compartiment dans un vecteur de comptages unique.
+
+    Numérique : intervalles ]edges[i-1], edges[i]], au-delà, manquant.
+    Catégoriel : catégories connues puis « autre ». Avec un profil de
+    référence, les bornes et catégories sont les siennes et chaque valeur
+    est d'abord ramenée au représentant de son compartiment de sketch :
+    les comptages sont directement comparables à l'histogramme de référence.
+    """
+
+    def __init__(self, numeric, categorical, reference=None, gamma=None):
+        self.numeric = []      # (colonne, bornes, position)
+        self.categorical = []  # (colonne, {catégorie: position}, position de « autre »)
+        self.reference = reference or {}
+        self.gamma = gamma
+        self.labels = []       # (feature, compartiment) par position
+        for col, edges in numeric.items():
+            self.numeric.append((col, list(edges), len(self.labels)))
+            self.labels += [(col, f"le_{edge:g}") for edge in edges]
+            self.labels += [(col, "gt_last"), (col, "missing")]
+        for col, categories in categorical.items():
+            index = {cat: len(self.labels) + i for i, cat in enumerate(categories)}
+            self.labels += [(col, cat) for cat in categories]
+            self.categorical.append((col, index, len(self.labels)))
+            self.labels.append((col, OTHER))
+        self.proba_offset = len(self.labels)
+        self.labels += [("probability", f"le_{edge:g}") for edge in PROBA_EDGES] + [("probability", "le_1")]
+        self.prediction_offset = len(self.labels)
+        self.labels += [("prediction", "0"), ("prediction", "1")]
+        self.size = len(self.labels)
+        # Clé du format : les fichiers d'un autre format ne sont jamais additionnés
+        self.key = hashlib.sha256(json.dumps(self.labels).encode()).hexdigest()[:12]
+
+    @classmethod
+    def from_profile(cls, profile, categorical):
+        """Bornes et catégories du profil ; `categorical` complète les
+        colonnes catégorielles absentes du profil (catégories du préprocesseur)"""
+        numeric = {col: DEFAULT_EDGES[col] for col in NUMERIC_FEATURES}
+        numeric.update({col: ref["edges"] for col, ref in profile["numeric"].items()})
+        reference = {col: ref["hist"] for col, ref in profile["numeric"].items()}
+        categorical = dict(categorical)
+        for col, ref in profile["categorical"].items():
+            # Catégories regroupées du profil : compartiment « autre » du format
+            categorical[col] = [cat for cat in ref["counts"] if cat != OTHER]
+            reference[col] = [ref["counts"][cat] for cat in categorical[col]] + [ref["counts"].get(OTHER, 0)]
+        alpha = next(iter(profile["numeric"].values()))["sketch"]["alpha"]
+        return cls(numeric, categorical, reference, gamma=(1 + alpha) / (1 - alpha))
+
+    def sketch_value(self, value):
+        # Représentant du compartiment ]γ^(k-1), γ^k] (même calcul que le profil)
+        if self.gamma is None or value == 0:
+            return value
+        key = math.ceil(math.log(abs(value)) / math.log(self.gamma))
+        return math.copysign(2 * self.gamma ** key / (self.gamma + 1), value)
+
+    def indices(self, rows, predictions, probabilities):
+        """Positions incrémentées par un lot (Python pur : quelques µs par ligne)"""
+        out = []
+        for row in rows:
+            for col, edges, offset in self.numeric:
+                value = row.get(col)
+                if _is_missing(value):
+                    out.append(offset + len(edges) + 1)
+                else:
+                    out.append(offset + bisect.bisect_left(edges, self.sketch_value(value)))
+            for col, index, other in self.categorical:
+                value = row.get(col)
+                out.append(index.get(MISSING if _is_missing(value) else value, other))
+        out += [self.proba_offset + bisect.bisect_left(PROBA_EDGES, p) for p in probabilities]
+        out += [self.prediction_offset + int(p) for p in predictions]
+        return out
+
+
+class LiveStats:
+    """Agrégateur en ligne des entrées et des prédictions servies.
+
+    Chaque thread incrémente son propre vecteur de comptages (aucun verrou) ;
+    avec `directory`, ces vecteurs sont des fichiers .npy projetés en mémoire,
+    un par thread et par worker, additionnés à la lecture de /metrics.
+    """
+
+    def __init__(self, layout, directory=None):
+        self.layout = layout
+        self.directory = directory
+        self._local = threading.local()
+        self._arrays = []
+
+    def _counts(self):
+        counts = getattr(self._local, "counts", None)
+        if counts is None:
+            if self.directory:
+                name = f"live-{self.layout.key}-{os.getpid()}-{uuid.uuid4().hex[:8]}.npy"
+                counts = np.lib.format.open_memmap(
+                    os.path.join(self.directory, name), mode="w+", dtype=np.int64, shape=(self.layout.size,)
+                )
+            else:
+                counts = np.zeros(self.layout.size, dtype=np.int64)
+            self._local.counts = counts
+            self._arrays.append(counts)
+        return counts
+
+    def observe(self, rows, predictions, probabilities):
+        indices = self.layout.indices(rows, predictions, probabilities)
+        counts = self._counts()
+        counts += np.bincount(indices, minlength=self.layout.size)
+
+    def snapshot(self):
+        """Comptages de tous les threads (et de tous les workers)"""
+        if not self.directory:
+            return sum(self._arrays, np.zeros(self.layout.size, dtype=np.int64))
+        total = np.zeros(self.layout.size, dtype=np.int64)
+        for path in glob.glob(os.path.join(self.directory, f"live-{self.layout.key}-*.npy")):
+            total += np.load(path, mmap_mode="r")
+        return total
+
+    def collect(self):
+        """Collecteur Prometheus : comptages, part de référence et PSI"""
+        counts = self.snapshot()
+        live = CounterMetricFamily("live_feature_bin", "Lignes servies par compartiment", labels=["feature", "bin"])
+        for (feature, label), count in zip(self.layout.labels, counts.tolist()):
+            live.add_metric([feature, label], count)
+        yield live
+
+        reference = GaugeMetricFamily(
+            "reference_feature_bin_ratio", "Part de chaque compartiment dans les données de référence",
+            labels=["feature", "bin"],
+        )
+        drift = GaugeMetricFamily("live_feature_psi", "PSI des entrées servies contre la référence", labels=["feature"])
+        for feature, expected in self.layout.reference.items():
+            positions = [i for i, (name, _) in enumerate(self.layout.labels) if name == feature]
+            total = max(sum(expected), 1)
+            for i, count in zip(positions, expected):
+                reference.add_metric([feature, self.layout.labels[i][1]], count / total)
+            actual = counts[positions]
+            if actual.sum():
+                drift.add_metric([feature], psi(expected, actual))
+        yield reference
+        yield drift
+
+
+def psi(expected, actual, eps=1e-4):
+    """Population Stability Index (même définition que drift_monitor.py)"""
+    p = np.maximum(np.asarray(expected, float) / max(sum(expected), 1), eps)
+    q = np.maximum(np.asarray(actual, float) / max(sum(actual), 1), eps)
+    return float(np.sum((q - p) * np.log(q / p)))
+
+
+def load_live_stats(model_dir, preprocessor, directory=None):
+    """Agrégateur construit sur le profil de référence s'il existe"""
+    categorical = {col: list(index) for col, _, index in preprocessor.onehot}
+    categorical.update({col: list(freq_map) for col, _, freq_map, _ in preprocessor.frequency})
+    path = os.path.join(model_dir, PROFILE_FILE)
+    if os.path.exists(path):
+        with open(path) as f:
+            layout = StatsLayout.from_profile(json.load(f), categorical)
+    else:
+        layout = StatsLayout({col: DEFAULT_EDGES[col] for col in NUMERIC_FEATURES}, categorical)
+    return LiveStats(layout, directory)
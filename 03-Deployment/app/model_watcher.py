@@ -0,0 +1,323 @@
+import asyncio
+import fcntl
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import tempfile
+import time
+
+import joblib
+import numpy as np
+from fastapi.concurrency import run_in_threadpool
+from prometheus_client import Counter
+
+from compiled_forest import CompiledForest, file_sha256
+from crash_preprocessing.tracing import span
+from fast_features import CompiledPreprocessor
+
+RELOADS = Counter(
+    "model_reloads_total", "Rechargements du modèle depuis S3", ["result"]
+)
+
+# Dossier partagé des rechargements : une version compilée par sous-dossier,
+# la version publiée (current.json) et le verrou du leader
+STATE_FILE = "current.json"
+LOCK_FILE = "leader.lock"
+MODEL_FILE = "model_compiled.joblib"
+PREPROCESSOR_FILE = "preprocessor_compiled.joblib"
+
+
+class ModelBundle:
+    """Forêt + préprocesseur compilés et leur version.
+
+    Le bundle actif est remplacé d'un seul bloc (affectation d'une
+    référence) : une requête en cours garde celui avec lequel elle a
+    commencé.
+    """
+
+    def __init__(self, model, preprocessor, model_sha256, preprocessor_sha256, source):
+        self.model = model
+        self.preprocessor = preprocessor
+        self.model_sha256 = model_sha256
+        self.preprocessor_sha256 = preprocessor_sha256
+        self.source = source
+        self.version = (model_sha256 or "inconnue")[:12]
+        self.loaded_at = time.time()
+
+    def predict(self, rows):
+        """(prédictions, probabilités de la classe 1) pour une liste de lignes"""
+        with span("features", memory=False):
+            X = self.preprocessor.transform_rows(rows)
+        with span("model", memory=False):
+            proba = self.model.predict_proba(X)
+        return self.model.classes_[proba.argmax(axis=1)], proba[:, 1]
+
+    def warm_up(self):
+        """Vérifie la cohérence modèle/préprocesseur avec une première inférence"""
+        if self.preprocessor.n_features_out != self.model.n_features_in_:
+            raise ValueError(
+                f"Préprocesseur ({self.preprocessor.n_features_out} features) "
+                f"incompatible avec le modèle ({self.model.n_features_in_})"
+            )
+        with span("warm_up", memory=False):
+            _, proba = self.predict([self.preprocessor.default_row()])
+        if not np.all((proba >= 0) & (proba <= 1)):
+            raise ValueError("Probabilités invalides au warm-up")
+
+    def info(self):
+        return {
+            "version": self.version,
+            "source": self.source,
+            "model_sha256": self.model_sha256,
+            "preprocessor_sha256": self.preprocessor_sha256,
+            "loaded_at": self.loaded_at,
+        }
+
+
+def publish_bundle(model_path, preprocessor_path, shared_dir, source):
+    """Compile model.pkl et preprocessor.joblib une seule fois dans un
+    sous-dossier versionné de `shared_dir`, puis les rouvre comme un worker
+    (attach_bundle) ; renvoie (nom de la version, bundle)"""
+    model_sha256 = file_sha256(model_path)
+    preprocessor_sha256 = file_sha256(preprocessor_path)
+    version = f"{model_sha256[:12]}-{preprocessor_sha256[:12]}"
+    version_dir = os.path.join(shared_dir, version)
+    # Compilation dans un dossier temporaire puis renommage : un worker ne
+    # voit jamais une version à moitié écrite
+    os.makedirs(shared_dir, exist_ok=True)
+    staging = tempfile.mkdtemp(prefix=f".{version}-", dir=shared_dir)
+    with open(model_path, "rb") as f:
+        model = CompiledForest.from_sklearn(pickle.load(f), source_sha256=model_sha256)
+    model.save(os.path.join(staging, MODEL_FILE))
+    preprocessor = CompiledPreprocessor(joblib.load(preprocessor_path), source_sha256=preprocessor_sha256)
+    preprocessor.save(os.path.join(staging, PREPROCESSOR_FILE))
+    shutil.rmtree(version_dir, ignore_errors=True)
+    os.replace(staging, version_dir)
+    return version, attach_bundle(version_dir, source)
+
+
+def attach_bundle(version_dir, source):
+    """Ouvre une version publiée : tableaux de la forêt en mmap, partagés
+    entre les workers via le cache de pages"""
+    model = CompiledForest.load(os.path.join(version_dir, MODEL_FILE), mmap_mode="r")
+    preprocessor = CompiledPreprocessor.load(os.path.join(version_dir, PREPROCESSOR_FILE))
+    return ModelBundle(model, preprocessor, model.source_sha256, preprocessor.source_sha256, source)
+
+
+def read_state(shared_dir):
+    """Version publiée par le leader (None si aucune)"""
+    try:
+        with open(os.path.join(shared_dir, STATE_FILE)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def write_state(shared_dir, state):
+    # Écriture atomique : les workers lisent l'ancien ou le nouvel état
+    path = os.path.join(shared_dir, STATE_FILE)
+    with open(f"{path}.{os.getpid()}.tmp", "w") as f:
+        json.dump(state, f)
+    os.replace(f"{path}.{os.getpid()}.tmp", path)
+
+
+def _prune_versions(shared_dir, keep):
+    # Un worker qui a encore une ancienne version en mmap la garde lisible
+    # (fichier supprimé mais pas libéré tant qu'il est projeté)
+    for name in os.listdir(shared_dir):
+        path = os.path.join(shared_dir, name)
+        if os.path.isdir(path) and not name.startswith(".") and name not in keep:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+class S3ModelWatcher:
+    """Recharge le modèle à chaud quand un nouveau manifeste est publié dans S3.
+
+    Un seul processus, le leader (verrou `leader.lock` dans `shared_dir`,
+    repris par un autre worker si le sien s'arrête), relit `manifest.json`
+    (écrit en dernier par upload_to_s3.py) toutes les `interval` secondes
+    avec un GET conditionnel (`IfNoneMatch` = dernier ETag, 304 si
+    inchangé). Si les empreintes qu'il liste diffèrent de la version
+    publiée, les artefacts sont téléchargés depuis leurs clés adressées par
+    le contenu, vérifiés (SHA-256 et taille du manifeste), compilés une fois
+    dans un sous-dossier versionné de `shared_dir`, testés par un warm-up,
+    puis publiés dans `current.json`.
+
+    Chaque worker relit `current.json` toutes les `sync_interval` secondes
+    et, si la version publiée change, rouvre ses artefacts en mmap (mémoire
+    partagée entre workers) et bascule avec `on_update(bundle)` : tous les
+    workers servent la même version à `sync_interval` près. En cas
+    d'erreur, le modèle courant reste en service.
+    """
+
+    MANIFEST_KEY = "manifest.json"
+
+    def __init__(self, s3, bucket, on_update, current, shared_dir, interval=30.0, sync_interval=1.0):
+        self.s3 = s3
+        self.bucket = bucket
+        self.on_update = on_update
+        self.current = current  # fonction renvoyant le bundle actif
+        self.shared_dir = shared_dir
+        self.interval = interval
+        self.sync_interval = sync_interval
+        self.last_error = None
+        self._lock_fd = None
+        self._failed_version = None
+        self._task = None
+        os.makedirs(shared_dir, exist_ok=True)
+
+    @property
+    def leader(self):
+        return self._lock_fd is not None
+
+    def acquire_leadership(self):
+        """Verrou exclusif non bloquant, gardé jusqu'à l'arrêt du processus"""
+        if self._lock_fd is None:
+            fd = os.open(os.path.join(self.shared_dir, LOCK_FILE), os.O_RDWR | os.O_CREAT)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                os.close(fd)
+                return False
+            self._lock_fd = fd
+            print(f"👑 Worker {os.getpid()} : interrogation de S3 pour tous les workers")
+        return True
+
+    async def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        if self._lock_fd is not None:
+            os.close(self._lock_fd)  # libère le verrou
+            self._lock_fd = None
+
+    async def _run(self):
+        next_poll = 0.0
+        while True:
+            try:
+                if time.monotonic() >= next_poll and self.acquire_leadership():
+                    next_poll = time.monotonic() + self.interval
+                    await run_in_threadpool(self.poll)
+                await run_in_threadpool(self.sync)
+                self.last_error = None
+            except Exception as e:
+                RELOADS.labels("error").inc()
+                self.last_error = str(e)
+                print(f"❌ Rechargement du modèle impossible : {e}")
+            await asyncio.sleep(self.sync_interval)
+
+    def fetch(self, key, path, etag=None):
+        """Télécharge `key` dans `path` et renvoie son ETag, ou None si inchangé"""
+        params = {"Bucket": self.bucket, "Key": key}
+        if etag:
+            params["IfNoneMatch"] = etag
+        try:
+            response = self.s3.get_object(**params)
+        except self.s3.exceptions.ClientError as e:
+            if e.response["Error"]["Code"] in ("304", "NotModified"):
+                return None
+            raise
+
+        md5 = hashlib.md5()
+        with open(path, "wb") as f:
+            for block in response["Body"].iter_chunks(1 << 20):
+                md5.update(block)
+                f.write(block)
+        new_etag = response["ETag"].strip('"')
+        # Les uploads multipart ont un ETag « md5-des-parties-N »
+        if "-" not in new_etag and md5.hexdigest() != new_etag:
+            raise ValueError(f"{key} corrompu : MD5 {md5.hexdigest()} != ETag {new_etag}")
+        return new_etag
+
+    def poll(self):
+        """Leader : compile et publie la version du manifeste si elle a changé"""
+        state = read_state(self.shared_dir) or {}
+        updates = {"last_poll": time.time(), "last_error": None}
+        try:
+            with tempfile.TemporaryDirectory() as staging:
+                manifest_path = os.path.join(staging, self.MANIFEST_KEY)
+                etag = self.fetch(self.MANIFEST_KEY, manifest_path, state.get("manifest_etag"))
+                if etag is None:
+                    return False
+                with open(manifest_path) as f:
+                    manifest = json.load(f)
+                model, preprocessor = (
+                    manifest["artifacts"][name] for name in ("model.pkl", "preprocessor.joblib")
+                )
+
+                # Version publiée, sinon celle avec laquelle le worker a démarré
+                current = self.current()
+                published = (
+                    state.get("model_sha256", current.model_sha256),
+                    state.get("preprocessor_sha256", current.preprocessor_sha256),
+                )
+                if (model["sha256"], preprocessor["sha256"]) != published:
+                    paths = []
+                    for entry in (model, preprocessor):
+                        path = os.path.join(staging, os.path.basename(entry["key"]))
+                        self.fetch(entry["key"], path)
+                        if os.path.getsize(path) != entry["size"] or file_sha256(path) != entry["sha256"]:
+                            raise ValueError(f"{entry['key']} ne correspond pas au manifeste")
+                        paths.append(path)
+
+                    source = f"s3://{self.bucket}/{model['key']}"
+                    version, bundle = publish_bundle(*paths, self.shared_dir, source)
+                    bundle.warm_up()
+                    updates.update(
+                        version=version, source=source, published_at=time.time(),
+                        model_sha256=bundle.model_sha256, preprocessor_sha256=bundle.preprocessor_sha256,
+                    )
+                    _prune_versions(self.shared_dir, keep={version, state.get("version")})
+                    print(f"📤 Version {version} publiée pour tous les workers")
+
+                updates.update(manifest_etag=etag, manifest_version=manifest.get("version"))
+                return True
+        except Exception as e:
+            updates["last_error"] = str(e)
+            raise
+        finally:
+            write_state(self.shared_dir, {**state, **updates})
+
+    def sync(self):
+        """Tous les workers : bascule sur la version publiée par le leader"""
+        state = read_state(self.shared_dir)
+        if state is None or "version" not in state:
+            return False
+        current = self.current()
+        if (state["model_sha256"], state["preprocessor_sha256"]) == (
+            current.model_sha256, current.preprocessor_sha256
+        ) or state["version"] == self._failed_version:
+            return False
+
+        try:
+            bundle = attach_bundle(os.path.join(self.shared_dir, state["version"]), state["source"])
+            bundle.warm_up()
+        except Exception:
+            self._failed_version = state["version"]  # pas de nouvel essai à chaque seconde
+            raise
+        self.on_update(bundle)
+        RELOADS.labels("success").inc()
+        print(f"🔄 Modèle rechargé depuis S3 : version {bundle.version}")
+        return True
+
+    def info(self):
+        # Version publiée et dernier appel à S3 : même réponse quel que soit le worker
+        state = read_state(self.shared_dir) or {}
+        return {
+            "bucket": self.bucket,
+            "interval_seconds": self.interval,
+            "sync_interval_seconds": self.sync_interval,
+            "published_version": state.get("version"),
+            "manifest_etag": state.get("manifest_etag"),
+            "manifest_version": state.get("manifest_version"),
+            "last_poll": state.get("last_poll"),
+            "last_error": self.last_error or state.get("last_error"),
+        }
@@ -1,17 +1,123 @@
-from fastapi import FastAPI
-from pydantic import BaseModel
-import joblib
-import pandas as pd
+import time
+
+_STARTED = time.perf_counter()
+
+from contextlib import asynccontextmanager, contextmanager
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Gauge, Histogram, generate_latest, multiprocess
+from pydantic import BaseModel, TypeAdapter
+from typing import List
+import io
+import json
+import os
 import pickle
-from prepare_data import preprocess_data
+from batcher import MicroBatcher
+from crash_preprocessing import FEATURE_SPEC
+from crash_preprocessing.tracing import add_sink, span
+from fast_features import CompiledPreprocessor
+from live_stats import load_live_stats
+from compiled_forest import CompiledForest, file_sha256, is_current
+from model_watcher import ModelBundle, S3ModelWatcher
+
+# Taille maximale d'un lot pour /predict/batch
+MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", "10000"))
+# Micro-lots de /predict : fenêtre d'attente (ms) et nombre max de lignes
+BATCH_WINDOW_MS = float(os.getenv("BATCH_WINDOW_MS", "5"))
+BATCH_MAX_ROWS = int(os.getenv("BATCH_MAX_ROWS", "64"))
+# Rechargement à chaud depuis S3 (désactivé si MODEL_POLL_SECONDS=0)
+S3_ENDPOINT = os.getenv("S3_ENDPOINT", "http://localstack:4566")
+MODEL_BUCKET = os.getenv("MODEL_BUCKET", "mlops-models")
+MODEL_POLL_SECONDS = float(os.getenv("MODEL_POLL_SECONDS", "0"))
+# Versions compilées par le worker leader, relues par tous les workers
+MODEL_RELOAD_DIR = os.getenv("MODEL_RELOAD_DIR", "/dev/shm/mlops-model/reloads")
+MODEL_SYNC_SECONDS = float(os.getenv("MODEL_SYNC_SECONDS", "1"))
+
+MODEL_DIR = os.getenv("MODEL_DIR", "/app/model")
+MODEL_PATH = os.path.join(MODEL_DIR, "model.pkl")
+PREPROCESSOR_PATH = os.path.join(MODEL_DIR, "preprocessor.joblib")
+# Artefacts compilés : à côté des sources, ou ailleurs (ex. /dev/shm) via serve.py
+COMPILED_MODEL_PATH = os.getenv("COMPILED_MODEL_PATH", os.path.join(MODEL_DIR, "model_compiled.joblib"))
+COMPILED_PREPROCESSOR_PATH = os.getenv(
+    "COMPILED_PREPROCESSOR_PATH", os.path.join(MODEL_DIR, "preprocessor_compiled.joblib")
+)
+# Mode multi-processus de prometheus_client (défini par serve.py) : les
+# métriques de chaque worker y sont écrites et fusionnées à la lecture
+METRICS_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+
+# Durée de chaque phase du démarrage (secondes), exposée sur /ready et /metrics
+STARTUP_PHASES = {"imports": time.perf_counter() - _STARTED}
+STARTUP_SECONDS = Gauge("startup_phase_seconds", "Durée des phases de démarrage", ["phase"], multiprocess_mode="max")
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "Latence des requêtes", ["method", "path", "status"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+)
+# Spans de crash_preprocessing.tracing (predict, predict/features, predict/model)
+STAGE_SECONDS = Histogram(
+    "stage_duration_seconds", "Durée des étapes tracées", ["stage", "clock"],
+    buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25),
+)
+ready = False
+
+@contextmanager
+def startup_phase(name):
+    start = time.perf_counter()
+    yield
+    STARTUP_PHASES[name] = time.perf_counter() - start
+    print(f"⏱️ {name} : {STARTUP_PHASES[name] * 1000:.1f} ms")
+
+def load_model():
+    # Forêt compilée (python compiled_forest.py) si elle correspond à model.pkl ;
+    # tableaux en mmap, partagés par les workers via le cache de pages
+    if os.path.exists(COMPILED_MODEL_PATH):
+        compiled = CompiledForest.load(COMPILED_MODEL_PATH, mmap_mode="r")
+        if is_current(compiled, MODEL_PATH):
+            return compiled
+        print("⚠️ Forêt compilée obsolète, chargement de model.pkl")
+    with open(MODEL_PATH, "rb") as f:
+        return pickle.load(f)
+
+def load_preprocessor():
+    # Préprocesseur compilé (python fast_features.py) : ni sklearn ni pandas à
+    # importer ; sinon preprocessor.joblib est chargé puis compilé
+    if os.path.exists(COMPILED_PREPROCESSOR_PATH):
+        compiled = CompiledPreprocessor.load(COMPILED_PREPROCESSOR_PATH)
+        if is_current(compiled, PREPROCESSOR_PATH):
+            return compiled
+        print("⚠️ Préprocesseur compilé obsolète, chargement de preprocessor.joblib")
+    import joblib
+    return CompiledPreprocessor(joblib.load(PREPROCESSOR_PATH), source_sha256=file_sha256(PREPROCESSOR_PATH))
 
-app = FastAPI()
+def source_sha256(artifact, path):
+    # Empreinte du fichier source (version du modèle)
+    if getattr(artifact, "source_sha256", None):
+        return artifact.source_sha256
+    return file_sha256(path) if os.path.exists(path) else None
 
 # Load model and preprocessor
-with open("/app/model/model.pkl", "rb") as f:
-    model = pickle.load(f)
+with startup_phase("model"):
+    model = load_model()
+with startup_phase("preprocessor"):
+    # Paramètres du préprocesseur extraits une fois (chemin rapide sans pandas)
+    compiled_preprocessor = load_preprocessor()
 
-preprocessor = joblib.load("/app/model/preprocessor.joblib")
+# Modèle servi ; remplacé d'un bloc par le rechargement à chaud
+active = ModelBundle(
+    model, compiled_preprocessor,
+    source_sha256(model, MODEL_PATH), compiled_preprocessor.source_sha256,
+    source=MODEL_DIR,
+)
+
+# Histogrammes des entrées et des prédictions servies, comparables au profil
+# de référence (reference_profile.json) ; un fichier de comptages par thread
+# dans METRICS_DIR, additionnés sur /metrics
+live_stats = load_live_stats(MODEL_DIR, compiled_preprocessor, METRICS_DIR)
+if not METRICS_DIR:
+    REGISTRY.register(live_stats)
+
+def swap_model(bundle):
+    global active
+    active = bundle
 
 class CrashInput(BaseModel):
     posted_speed_limit: int
@@ -24,9 +130,153 @@ class CrashInput(BaseModel):
     crash_hour: int
     delay_police_minutes: float
 
+# Champs de l'API = features de la spécification partagée avec l'entraînement
+if set(CrashInput.model_fields) != set(FEATURE_SPEC.features):
+    raise RuntimeError(f"CrashInput diffère de FEATURE_SPEC : {sorted(set(CrashInput.model_fields) ^ set(FEATURE_SPEC.features))}")
+
+crash_inputs = TypeAdapter(List[CrashInput])
+
+def parse_batch(body: bytes, content_type: str) -> List[dict]:
+    """Lit un lot JSON (liste de CrashInput), NDJSON ou CSV en liste de lignes"""
+    if "csv" in content_type:
+        import pandas as pd  # seulement pour les lots CSV
+        # Modalités lues en chaînes (une valeur "1" reste une modalité)
+        text = {name: str for name, field in CrashInput.model_fields.items() if field.annotation is str}
+        df = pd.read_csv(io.BytesIO(body), dtype=text)
+        missing = set(CrashInput.model_fields) - set(df.columns)
+        if missing:
+            raise HTTPException(status_code=422, detail=f"Colonnes manquantes : {sorted(missing)}")
+        records = df[list(CrashInput.model_fields)].to_dict("records")
+    elif "ndjson" in content_type:
+        records = [json.loads(line) for line in body.splitlines() if line.strip()]
+    else:
+        records = json.loads(body)
+    # Même validation pour tous les formats : une cellule invalide donne une 422
+    return [row.dict() for row in crash_inputs.validate_python(records)]
+
+def observe_span(s):
+    # Durée et temps CPU (pic RSS non mesuré : chemin chaud)
+    STAGE_SECONDS.labels(s.path, "wall").observe(s.wall_s)
+    STAGE_SECONDS.labels(s.path, "cpu").observe(s.cpu_s)
+
+add_sink(observe_span)
+
+def predict_batch_rows(rows):
+    # Features construites sans pandas ni ColumnTransformer ; le bundle est lu
+    # une fois, une bascule pendant le calcul n'affecte pas ce lot
+    bundle = active
+    with span("predict", rows=len(rows), memory=False):
+        pred, proba = bundle.predict(rows)
+    live_stats.observe(rows, pred, proba)
+    return {
+        "predictions": pred.astype(int).tolist(),
+        "probabilities": proba.tolist(),
+        "model_version": bundle.version,
+    }
+
+def predict_rows(rows):
+    # Micro-lots de /predict : (prédiction, probabilité, version) par ligne
+    result = predict_batch_rows(rows)
+    version = result["model_version"]
+    return [(p, proba, version) for p, proba in zip(result["predictions"], result["probabilities"])]
+
+batcher = MicroBatcher(predict_rows, max_batch_size=BATCH_MAX_ROWS, max_wait_ms=BATCH_WINDOW_MS)
+
+def make_watcher():
+    if MODEL_POLL_SECONDS <= 0:
+        return None
+    import boto3  # seulement si le rechargement à chaud est activé
+    s3 = boto3.client(
+        "s3",
+        endpoint_url=S3_ENDPOINT,
+        aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID", "test"),  # LocalStack
+        aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY", "test"),
+        region_name=os.getenv("AWS_DEFAULT_REGION", "us-east-1"),
+    )
+    return S3ModelWatcher(
+        s3, MODEL_BUCKET, swap_model, lambda: active, MODEL_RELOAD_DIR,
+        interval=MODEL_POLL_SECONDS, sync_interval=MODEL_SYNC_SECONDS,
+    )
+
+watcher = make_watcher()
+
+@asynccontextmanager
+async def lifespan(app):
+    global ready
+    await batcher.start()
+    # Warm-up : une première inférence avant d'accepter du trafic
+    with startup_phase("warmup"):
+        await run_in_threadpool(active.warm_up)
+    STARTUP_PHASES["total"] = time.perf_counter() - _STARTED
+    for phase, seconds in STARTUP_PHASES.items():
+        STARTUP_SECONDS.labels(phase).set(seconds)
+    ready = True
+    if watcher is not None:
+        await watcher.start()
+    yield
+    ready = False
+    if watcher is not None:
+        await watcher.stop()
+    await batcher.stop()
+
+app = FastAPI(lifespan=lifespan)
+
+@app.middleware("http")
+async def record_latency(request: Request, call_next):
+    start = time.perf_counter()
+    response = await call_next(request)
+    # Chemin de la route (et non l'URL) : nombre de séries borné
+    route = request.scope.get("route")
+    REQUEST_LATENCY.labels(request.method, route.path if route else "other", response.status_code).observe(
+        time.perf_counter() - start
+    )
+    return response
+
 @app.post("/predict")
-def predict(input_data: CrashInput):
-    df = pd.DataFrame([input_data.dict()])
-    X = preprocessor.transform(df)
-    pred = model.predict(X)
-    return {"prediction": int(pred[0])}
+async def predict(input_data: CrashInput):
+    # Regroupée avec les requêtes concurrentes dans un micro-lot
+    prediction, _, version = await batcher.submit(input_data.dict())
+    return {"prediction": prediction, "model_version": version}
+
+@app.post("/predict/batch")
+async def predict_batch(request: Request):
+    body = await request.body()
+    try:
+        rows = parse_batch(body, request.headers.get("content-type", ""))
+    except ValueError as e:  # JSON/CSV illisible ou ValidationError pydantic
+        raise HTTPException(status_code=422, detail=str(e))
+
+    if len(rows) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=413, detail=f"Lot trop grand : {len(rows)} > {MAX_BATCH_SIZE} lignes")
+    if not rows:
+        return {"predictions": [], "probabilities": [], "model_version": active.version}
+
+    # Une seule transformation + prédiction vectorisée pour tout le lot
+    return await run_in_threadpool(predict_batch_rows, rows)
+
+@app.get("/health")
+def health():
+    # Liveness : le processus répond
+    return {"status": "ok"}
+
+@app.get("/ready")
+def readiness():
+    # Readiness : artefacts chargés et warm-up terminé
+    if not ready:
+        raise HTTPException(status_code=503, detail="Démarrage en cours")
+    return {"status": "ready", "startup_seconds": STARTUP_PHASES}
+
+@app.get("/model")
+def model_info():
+    # Version active et état du rechargement à chaud
+    return {**active.info(), "watcher": watcher.info() if watcher is not None else None}
+
+@app.get("/metrics")
+def metrics():
+    if not METRICS_DIR:
+        return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+    # Plusieurs workers : somme des fichiers de tous les processus
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    registry.register(live_stats)
+    return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,87 @@
+import glob
+import os
+import pickle
+import shutil
+
+import joblib
+import uvicorn
+
+from compiled_forest import CompiledForest, file_sha256, is_current
+from fast_features import CompiledPreprocessor
+
+# Nombre de processus uvicorn (1 par cœur pour contourner le GIL)
+WORKERS = int(os.getenv("WORKERS", "1"))
+MODEL_DIR = os.getenv("MODEL_DIR", "/app/model")
+# Repli si le dossier du modèle est en lecture seule : mémoire partagée
+SHARED_DIR = os.getenv("SHARED_DIR", "/dev/shm/mlops-model")
+# Versions rechargées depuis S3 : compilées une fois par le worker leader
+RELOAD_DIR = os.getenv("MODEL_RELOAD_DIR", os.path.join(SHARED_DIR, "reloads"))
+# Métriques des workers (prometheus_client multi-processus + live_stats)
+METRICS_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR", "/dev/shm/mlops-metrics")
+
+
+def load_pickle(path):
+    with open(path, "rb") as f:
+        return pickle.load(f)
+
+
+ARTIFACTS = [
+    # (source, artefact compilé, variable lue par predict.py, classe,
+    #  chargement de la source, compilation, options de CompiledX.load)
+    ("model.pkl", "model_compiled.joblib", "COMPILED_MODEL_PATH",
+     CompiledForest, load_pickle, CompiledForest.from_sklearn, {"mmap_mode": "r"}),
+    ("preprocessor.joblib", "preprocessor_compiled.joblib", "COMPILED_PREPROCESSOR_PATH",
+     CompiledPreprocessor, joblib.load, CompiledPreprocessor, {}),
+]
+
+
+def prepare_shared_artifacts():
+    """Compile une seule fois, avant le fork des workers, les artefacts
+    absents ou obsolètes. Chaque worker les ouvre ensuite en lecture seule
+    (mmap) : les tableaux de la forêt sont partagés via le cache de pages
+    au lieu d'être désérialisés N fois."""
+    for source, name, env_var, cls, load_source, compile_fn, load_kwargs in ARTIFACTS:
+        source_path = os.path.join(MODEL_DIR, source)
+        path = os.getenv(env_var, os.path.join(MODEL_DIR, name))
+        if os.path.exists(path) and is_current(cls.load(path, **load_kwargs), source_path):
+            print(f"📦 {name} à jour")
+            continue
+
+        compiled = compile_fn(load_source(source_path), source_sha256=file_sha256(source_path))
+        try:
+            compiled.save(path)
+        except OSError:
+            os.makedirs(SHARED_DIR, exist_ok=True)
+            path = os.path.join(SHARED_DIR, name)
+            compiled.save(path)
+        # Hérité par les workers
+        os.environ[env_var] = path
+        print(f"✅ {name} compilé -> {path}")
+
+
+def prepare_metrics_dir():
+    """Vide le dossier des métriques (fichiers d'un démarrage précédent) et
+    le transmet aux workers : /metrics y additionne les compteurs de tous
+    les processus."""
+    os.makedirs(METRICS_DIR, exist_ok=True)
+    for path in glob.glob(os.path.join(METRICS_DIR, "*.db")) + glob.glob(os.path.join(METRICS_DIR, "live-*.npy")):
+        os.remove(path)
+    # Lue à l'import de prometheus_client par chaque worker
+    os.environ["PROMETHEUS_MULTIPROC_DIR"] = METRICS_DIR
+
+
+def prepare_reload_dir():
+    """Vide le dossier des versions rechargées (une version publiée lors
+    d'un démarrage précédent ne doit pas remplacer celle de MODEL_DIR) et le
+    transmet aux workers."""
+    shutil.rmtree(RELOAD_DIR, ignore_errors=True)
+    os.makedirs(RELOAD_DIR, exist_ok=True)
+    os.environ["MODEL_RELOAD_DIR"] = RELOAD_DIR
+
+
+if __name__ == "__main__":
+    prepare_shared_artifacts()
+    prepare_metrics_dir()
+    prepare_reload_dir()
+    print(f"🚀 Démarrage de l'API avec {WORKERS} worker(s)")
+    uvicorn.run("predict:app", host="0.0.0.0", port=8000, workers=WORKERS)
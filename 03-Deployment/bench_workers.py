@@ -0,0 +1,41 @@
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+# Même requête que test.py
+data = {
+    "posted_speed_limit": 30,
+    "weather_condition": "CLEAR",
+    "lighting_condition": "DAYLIGHT",
+    "first_crash_type": "REAR END",
+    "trafficway_type": "ONE-WAY",
+    "roadway_surface_cond": "DRY",
+    "prim_contributory_cause": "FOLLOWING TOO CLOSELY",
+    "crash_hour": 14,
+    "delay_police_minutes": 5.0
+}
+
+def main():
+    parser = argparse.ArgumentParser(description="Débit de /predict (requêtes concurrentes)")
+    parser.add_argument("--url", default="http://localhost:8000/predict")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    args = parser.parse_args()
+
+    session = requests.Session()
+    session.mount("http://", requests.adapters.HTTPAdapter(pool_maxsize=args.concurrency))
+
+    def call(_):
+        response = session.post(args.url, json=data, timeout=30)
+        response.raise_for_status()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(args.concurrency) as pool:
+        list(pool.map(call, range(args.requests)))
+    elapsed = time.perf_counter() - start
+    print(f"📈 {args.requests} requêtes en {elapsed:.2f} s : {args.requests / elapsed:.0f} req/s")
+
+if __name__ == "__main__":
+    main()
@@ -29,6 +29,15 @@ try:
         print(f"❌ Erreur {response.status_code}:")
         print(response.text)
 
+    # Prédiction par lots
+    response = requests.post(f"{url}/batch", json=[data, data], timeout=10)
+    if response.status_code == 200:
+        print("✅ Lot traité:")
+        print(json.dumps(response.json(), indent=2))
+    else:
+        print(f"❌ Erreur {response.status_code}:")
+        print(response.text)
+
 except requests.exceptions.RequestException as e:
     print(f"🔌 Erreur de connexion: {str(e)}")
     print("Vérifiez que l'API est bien démarrée sur http://localhost:8000")
\ No newline at end of file
@@ -0,0 +1,99 @@
+# tests/conftest.py
+
+import hashlib
+import importlib
+import io
+import os
+import pickle
+import shutil
+import sys
+
+import numpy as np
+import pytest
+from botocore.exceptions import ClientError
+from botocore.response import StreamingBody
+
+# Les modules de l'API (predict.py, prepare_data.py...) sont dans app/
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "app"))
+
+MODEL_DIR = os.path.join(os.path.dirname(__file__), "..", "app", "model")
+
+
+class StubS3:
+    """Client S3 en mémoire : objets {clé: (contenu, ETag)}, ETag = MD5 du
+    contenu et GET conditionnel (ClientError 304 si l'ETag correspond)"""
+
+    class exceptions:
+        ClientError = ClientError
+
+        class NoSuchKey(ClientError):
+            pass
+
+    def __init__(self):
+        self.objects = {}
+        self.metadata = {}
+        self.calls = []
+
+    def put(self, key, body, etag=None, metadata=None):
+        self.objects[key] = (body, etag or hashlib.md5(body).hexdigest())
+        self.metadata[key] = metadata or {}
+
+    def head_object(self, Bucket, Key):
+        self.calls.append(("head_object", Key))
+        if Key not in self.objects:
+            raise ClientError({"Error": {"Code": "404"}}, "HeadObject")
+        return {"Metadata": self.metadata[Key]}
+
+    def get_object(self, Bucket, Key, IfNoneMatch=None):
+        self.calls.append(("get_object", Key))
+        if Key not in self.objects:
+            raise self.exceptions.NoSuchKey(
+                {"Error": {"Code": "NoSuchKey"}}, "GetObject"
+            )
+        body, etag = self.objects[Key]
+        if IfNoneMatch == etag:
+            raise ClientError({"Error": {"Code": "304"}}, "GetObject")
+        return {
+            "Body": StreamingBody(io.BytesIO(body), len(body)),
+            "ETag": f'"{etag}"',
+        }
+
+    def put_object(self, Bucket, Key, Body, **kwargs):
+        self.calls.append(("put_object", Key))
+        self.put(Key, Body)
+
+    def upload_file(self, Filename, Bucket, Key, ExtraArgs=None, Config=None):
+        self.calls.append(("upload_file", Key))
+        with open(Filename, "rb") as f:
+            self.put(Key, f.read(), metadata=(ExtraArgs or {}).get("Metadata"))
+
+
+@pytest.fixture
+def s3():
+    return StubS3()
+
+
+@pytest.fixture(scope="session")
+def predict_app(tmp_path_factory):
+    """Module predict importé une seule fois (métriques Prometheus globales)
+    avec une petite forêt compatible avec le préprocesseur du dépôt"""
+    from sklearn.ensemble import RandomForestClassifier
+
+    model_dir = tmp_path_factory.mktemp("model")
+    shutil.copy(os.path.join(MODEL_DIR, "preprocessor.joblib"), model_dir)
+    rng = np.random.default_rng(0)
+    forest = RandomForestClassifier(n_estimators=3, random_state=0)
+    forest.fit(rng.normal(size=(50, 25)), rng.integers(0, 2, 50))
+    with open(model_dir / "model.pkl", "wb") as f:
+        pickle.dump(forest, f)
+
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setenv("MODEL_DIR", str(model_dir))
+        mp.setenv("MODEL_POLL_SECONDS", "0")
+        for name in (
+            "COMPILED_MODEL_PATH",
+            "COMPILED_PREPROCESSOR_PATH",
+            "PROMETHEUS_MULTIPROC_DIR",
+        ):
+            mp.delenv(name, raising=False)
+        yield importlib.import_module("predict")
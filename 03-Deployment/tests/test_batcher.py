@@ -0,0 +1,87 @@
+# tests/test_batcher.py
+
+import asyncio
+
+from batcher import MicroBatcher
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_concurrent_submits_coalesced():
+    """Test que des requêtes concurrentes partent en un seul appel, dans la
+    limite de max_batch_size, et que chacune reçoit son résultat"""
+    calls = []
+
+    def predict_fn(rows):
+        calls.append(list(rows))
+        return [row * 10 for row in rows]
+
+    async def scenario():
+        batcher = MicroBatcher(predict_fn, max_batch_size=4, max_wait_ms=50)
+        await batcher.start()
+        try:
+            results = await asyncio.gather(
+                *(batcher.submit(i) for i in range(6))
+            )
+        finally:
+            await batcher.stop()
+        return results
+
+    results = run(scenario())
+
+    assert results == [i * 10 for i in range(6)]
+    assert [len(rows) for rows in calls] == [4, 2]
+    assert sorted(sum(calls, [])) == list(range(6))
+
+
+def test_predict_error_reaches_every_caller():
+    """Test qu'une exception de predict_fn est transmise à tous les appelants
+    du lot et que les lots suivants sont encore traités"""
+    calls = []
+
+    def predict_fn(rows):
+        calls.append(rows)
+        if len(calls) == 1:
+            raise ValueError("modèle indisponible")
+        return rows
+
+    async def scenario():
+        batcher = MicroBatcher(predict_fn, max_batch_size=8, max_wait_ms=20)
+        await batcher.start()
+        try:
+            first = await asyncio.gather(
+                *(batcher.submit(i) for i in range(3)), return_exceptions=True
+            )
+            second = await asyncio.wait_for(batcher.submit(42), timeout=1)
+        finally:
+            await batcher.stop()
+        return first, second
+
+    first, second = run(scenario())
+
+    assert len(calls[0]) == 3  # un seul lot pour les trois appelants
+    assert all(isinstance(e, ValueError) for e in first)
+    assert second == 42
+
+
+def test_single_submit_waits_at_most_max_wait():
+    """Test qu'une requête isolée n'attend pas plus que la fenêtre"""
+    max_wait_ms = 20
+
+    async def scenario():
+        batcher = MicroBatcher(lambda rows: rows, max_wait_ms=max_wait_ms)
+        await batcher.start()
+        try:
+            loop = asyncio.get_running_loop()
+            start = loop.time()
+            result = await batcher.submit("x")
+            return result, loop.time() - start
+        finally:
+            await batcher.stop()
+
+    result, elapsed = run(scenario())
+
+    assert result == "x"
+    assert elapsed < max_wait_ms / 1000 + 0.5
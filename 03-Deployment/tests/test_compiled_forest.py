@@ -0,0 +1,68 @@
+# tests/test_compiled_forest.py
+
+import joblib
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+from compiled_forest import CompiledForest
+
+
+def make_forest(**params):
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(400, 6))
+    y = (X[:, 0] + X[:, 1] ** 2 + rng.normal(size=400) > 0.5).astype(int)
+    forest = RandomForestClassifier(
+        n_estimators=12, max_depth=8, random_state=42, **params
+    ).fit(X, y)
+    return forest, rng.normal(size=(300, 6))
+
+
+def test_compiled_forest_identical_predictions():
+    """Test que la forêt compilée reproduit exactement sklearn"""
+    forest, X = make_forest()
+    compiled = CompiledForest.from_sklearn(forest)
+
+    assert compiled.value.dtype == np.int32
+    assert np.array_equal(compiled.predict_proba(X), forest.predict_proba(X))
+    assert np.array_equal(compiled.predict(X), forest.predict(X))
+
+
+def test_compiled_forest_weighted_classes():
+    """Test avec class_weight : fractions float64 au lieu d'effectifs"""
+    forest, X = make_forest(class_weight="balanced")
+    compiled = CompiledForest.from_sklearn(forest)
+
+    assert np.array_equal(compiled.predict_proba(X), forest.predict_proba(X))
+
+
+def test_compiled_forest_save_load_mmap(tmp_path):
+    """Test que l'export se recharge en mmap avec les mêmes prédictions"""
+    forest, X = make_forest()
+    CompiledForest.from_sklearn(forest, "abc").save(tmp_path / "forest.joblib")
+    loaded = CompiledForest.load(tmp_path / "forest.joblib", mmap_mode="r")
+
+    assert isinstance(loaded.threshold, np.memmap)
+    assert loaded.source_sha256 == "abc"
+    assert np.array_equal(loaded.predict(X), forest.predict(X))
+
+
+def test_compiled_forest_leaf_values_only(tmp_path):
+    """Test que `value` ne stocke que les feuilles (ancien export relu)"""
+    forest, X = make_forest()
+    compiled = CompiledForest.from_sklearn(forest)
+    n_leaves = sum(e.tree_.n_leaves for e in forest.estimators_)
+
+    assert len(compiled.value) == n_leaves < len(compiled.feature)
+    assert (compiled.leaf[compiled.apply(X)] >= 0).all()
+
+    # Ancien format : une ligne de `value` par nœud, pas de `leaf`
+    state = {name: getattr(compiled, name) for name in CompiledForest.ARRAYS}
+    is_leaf = compiled.leaf >= 0
+    full = np.zeros((len(is_leaf), compiled.value.shape[1]), dtype=np.int32)
+    full[is_leaf] = compiled.value
+    state.update(value=full, max_depth=compiled.max_depth,
+                 n_features_in_=compiled.n_features_in_, source_sha256=None)
+    del state["leaf"]
+    joblib.dump(state, tmp_path / "old.joblib")
+    loaded = CompiledForest.load(tmp_path / "old.joblib", mmap_mode="r")
+
+    assert np.array_equal(loaded.predict_proba(X), forest.predict_proba(X))
@@ -0,0 +1,65 @@
+# tests/test_fast_features.py
+
+import os
+
+import joblib
+import numpy as np
+import pandas as pd
+from fast_features import CompiledPreprocessor
+
+MODEL_DIR = os.path.join(os.path.dirname(__file__), "..", "app", "model")
+
+
+def test_compiled_matches_preprocessor():
+    """Test que le chemin compilé reproduit preprocessor.transform"""
+    preprocessor = joblib.load(os.path.join(MODEL_DIR, "preprocessor.joblib"))
+    compiled = CompiledPreprocessor(preprocessor)
+
+    rng = np.random.default_rng(0)
+    categories = {}
+    for _, pipeline, columns in preprocessor.transformers_:
+        if "ohe" in pipeline.named_steps:
+            values = pipeline.named_steps["ohe"].categories_
+        elif "freq" in pipeline.named_steps:
+            values = [list(m) for m in pipeline.named_steps["freq"].freq_maps]
+        else:
+            continue
+        for col, col_values in zip(columns, values):
+            # Inclut une catégorie inconnue
+            categories[col] = list(col_values) + ["INCONNUE"]
+
+    rows = [
+        {
+            **{col: rng.choice(values) for col, values in categories.items()},
+            "posted_speed_limit": int(rng.choice([15, 30, 45, 55])),
+            "crash_hour": int(rng.integers(0, 24)),
+            "delay_police_minutes": float(rng.exponential(60)),
+        }
+        for _ in range(500)
+    ]
+    # Valeurs manquantes (NaN imputé, None traité comme catégorie inconnue)
+    rows[0]["weather_condition"] = float("nan")
+    rows[1]["delay_police_minutes"] = float("nan")
+    rows[2]["first_crash_type"] = None
+
+    df = pd.DataFrame(rows, columns=preprocessor.feature_names_in_)
+    expected = preprocessor.transform(df)
+
+    assert compiled.n_features_out == expected.shape[1]
+    # Grand lot : chemin colonne par colonne ; petits lots : boucle par ligne
+    assert np.array_equal(compiled.transform_rows(rows), expected)
+    small = [compiled.transform_rows(rows[i : i + 10]) for i in range(0, 500, 10)]
+    assert np.array_equal(np.vstack(small), expected)
+
+
+def test_compiled_save_load(tmp_path):
+    """Test que le préprocesseur exporté se recharge à l'identique"""
+    preprocessor = joblib.load(os.path.join(MODEL_DIR, "preprocessor.joblib"))
+    compiled = CompiledPreprocessor(preprocessor, source_sha256="abc")
+    compiled.save(tmp_path / "compiled.joblib")
+    loaded = CompiledPreprocessor.load(tmp_path / "compiled.joblib")
+
+    row = compiled.default_row()
+    df = pd.DataFrame([row], columns=preprocessor.feature_names_in_)
+    assert loaded.source_sha256 == "abc"
+    assert np.array_equal(loaded.transform_rows([row]), preprocessor.transform(df))
@@ -0,0 +1,81 @@
+# tests/test_live_stats.py
+
+import threading
+
+import numpy as np
+from live_stats import LiveStats, StatsLayout, load_live_stats
+
+ALPHA = 0.01
+GAMMA = (1 + ALPHA) / (1 - ALPHA)
+
+
+def representative(value):
+    # Valeur du compartiment de sketch, comme les bornes du profil
+    return StatsLayout({}, {}, gamma=GAMMA).sketch_value(value)
+
+
+def make_profile():
+    sketch = {"alpha": ALPHA, "positive": {}, "negative": {}, "zero": 0, "count": 3}
+    return {
+        "numeric": {
+            "posted_speed_limit": {
+                "edges": [representative(20), representative(30)],
+                "hist": [1, 1, 1, 1],
+                "sketch": sketch,
+            }
+        },
+        "categorical": {
+            "weather_condition": {"counts": {"CLEAR": 2, "<NA>": 1, "<AUTRE>": 1}}
+        },
+    }
+
+
+def make_rows():
+    return [
+        {"posted_speed_limit": 20, "weather_condition": "CLEAR"},
+        {"posted_speed_limit": 30, "weather_condition": "CLEAR"},
+        {"posted_speed_limit": 50, "weather_condition": None},
+        {"posted_speed_limit": None, "weather_condition": "FOG"},
+    ]
+
+
+def test_live_counts_match_reference_profile():
+    """Test que les comptages en ligne suivent les compartiments du profil"""
+    layout = StatsLayout.from_profile(make_profile(), {"first_crash_type": ["ANGLE"]})
+    stats = LiveStats(layout)
+    stats.observe(make_rows(), np.array([0, 1, 1, 0]), np.array([0.05, 0.95, 0.5, 0.3]))
+    counts = dict(zip(layout.labels, stats.snapshot().tolist()))
+
+    assert [counts[("posted_speed_limit", b)] for b in ("gt_last", "missing")] == [1, 1]
+    assert counts[("weather_condition", "<NA>")] == 1
+    assert counts[("weather_condition", "<AUTRE>")] == 1
+    # Colonne absente du profil : catégories du préprocesseur
+    assert counts[("first_crash_type", "<AUTRE>")] == 4
+    assert counts[("prediction", "1")] == 2
+    assert counts[("probability", "le_0.1")] == 1
+
+    families = {family.name: family for family in stats.collect()}
+    psi = {s.labels["feature"]: s.value for s in families["live_feature_psi"].samples}
+    assert psi["posted_speed_limit"] == 0.0
+    assert psi["weather_condition"] == 0.0
+
+
+def test_counts_merged_across_threads_and_workers(tmp_path):
+    """Test que les fichiers par thread et par worker sont additionnés"""
+    preprocessor = type("Compiled", (), {"onehot": [], "frequency": []})()
+    workers = [load_live_stats(str(tmp_path), preprocessor, str(tmp_path)) for _ in range(2)]
+    rows = make_rows()
+
+    threads = [
+        threading.Thread(target=stats.observe, args=(rows, np.zeros(4), np.zeros(4)))
+        for stats in workers for _ in range(3)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(list(tmp_path.glob("live-*.npy"))) == 6
+    counts = dict(zip(workers[0].layout.labels, workers[0].snapshot().tolist()))
+    assert counts[("prediction", "0")] == 24
+    assert counts[("posted_speed_limit", "missing")] == 6
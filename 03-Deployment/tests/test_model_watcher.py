@@ -0,0 +1,165 @@
+# tests/test_model_watcher.py
+
+import json
+import os
+import pickle
+import shutil
+
+import numpy as np
+import pytest
+from compiled_forest import file_sha256
+from model_watcher import S3ModelWatcher, publish_bundle, read_state, write_state
+from sklearn.ensemble import RandomForestClassifier
+
+MODEL_DIR = os.path.join(os.path.dirname(__file__), "..", "app", "model")
+
+
+def make_artifacts(tmp_path, n_features, seed=0):
+    rng = np.random.default_rng(seed)
+    forest = RandomForestClassifier(n_estimators=3, random_state=seed)
+    forest.fit(rng.normal(size=(50, n_features)), rng.integers(0, 2, 50))
+    with open(tmp_path / "model.pkl", "wb") as f:
+        pickle.dump(forest, f)
+    shutil.copy(os.path.join(MODEL_DIR, "preprocessor.joblib"), tmp_path)
+
+
+def make_bundle(tmp_path, n_features):
+    make_artifacts(tmp_path, n_features)
+    return publish_bundle(
+        tmp_path / "model.pkl",
+        tmp_path / "preprocessor.joblib",
+        tmp_path / "shared",
+        source="test",
+    )
+
+
+def make_workers(s3, shared_dir, active, n=2):
+    initial = type("Bundle", (), {"model_sha256": "a", "preprocessor_sha256": "b"})
+    return [
+        S3ModelWatcher(
+            s3,
+            "bucket",
+            lambda bundle, i=i: active.__setitem__(i, bundle),
+            lambda i=i: active.get(i, initial),
+            shared_dir,
+        )
+        for i in range(n)
+    ]
+
+
+def test_bundle_warm_up_and_version(tmp_path):
+    """Test qu'un bundle cohérent passe le warm-up et expose sa version"""
+    version, bundle = make_bundle(tmp_path, n_features=25)
+    bundle.warm_up()
+
+    assert bundle.version == bundle.model_sha256[:12]
+    assert version.startswith(bundle.version)
+    # Version compilée une fois, rouverte en mmap (partagée entre workers)
+    assert isinstance(bundle.model.value, np.memmap)
+    pred, proba = bundle.predict([bundle.preprocessor.default_row()] * 2)
+    assert len(pred) == len(proba) == 2
+
+
+def test_bundle_warm_up_rejects_mismatch(tmp_path):
+    """Test qu'un modèle incompatible avec le préprocesseur est refusé"""
+    _, bundle = make_bundle(tmp_path, n_features=3)
+
+    with pytest.raises(ValueError):
+        bundle.warm_up()
+
+
+def test_single_leader_and_workers_sync(tmp_path):
+    """Test qu'un seul worker interroge S3 et que tous basculent sur la
+    version qu'il publie"""
+    version, published = make_bundle(tmp_path, n_features=25)
+    active = {}
+    workers = make_workers(None, tmp_path / "shared", active)
+
+    assert [w.acquire_leadership() for w in workers] == [True, False]
+    assert not any(w.sync() for w in workers)  # rien de publié
+    write_state(
+        tmp_path / "shared",
+        {
+            "version": version,
+            "source": "s3://bucket/model.pkl",
+            "model_sha256": published.model_sha256,
+            "preprocessor_sha256": published.preprocessor_sha256,
+        },
+    )
+    assert all(w.sync() for w in workers)
+    assert {b.version for b in active.values()} == {published.version}
+    assert not any(w.sync() for w in workers)  # déjà à jour
+    assert workers[1].info()["published_version"] == version
+
+
+def upload(s3, tmp_path, seed=0):
+    """Publie dans le client S3 factice les artefacts puis le manifeste,
+    comme upload_to_s3.py"""
+    make_artifacts(tmp_path, n_features=25, seed=seed)
+    artifacts = {}
+    for name in ("model.pkl", "preprocessor.joblib"):
+        sha256 = file_sha256(tmp_path / name)
+        key = f"artifacts/{sha256}/{name}"
+        s3.put(key, (tmp_path / name).read_bytes())
+        size = (tmp_path / name).stat().st_size
+        artifacts[name] = {"key": key, "sha256": sha256, "size": size}
+    manifest = {"version": artifacts["model.pkl"]["sha256"][:12], "artifacts": artifacts}
+    s3.put("manifest.json", json.dumps(manifest).encode())
+    return manifest
+
+
+def test_poll_publishes_changed_manifest(tmp_path, s3):
+    """Test que le leader publie la version d'un nouveau manifeste, que les
+    autres workers suivent, et qu'un manifeste inchangé (304) est ignoré"""
+    manifest = upload(s3, tmp_path)
+    active = {}
+    leader, follower = make_workers(s3, tmp_path / "shared", active)
+    assert leader.acquire_leadership()
+
+    assert leader.poll()
+    state = read_state(tmp_path / "shared")
+    assert state["manifest_version"] == manifest["version"]
+    assert state["model_sha256"] == manifest["artifacts"]["model.pkl"]["sha256"]
+    assert state["last_error"] is None
+    assert [w.sync() for w in (leader, follower)] == [True, True]
+    assert {b.version for b in active.values()} == {manifest["version"]}
+
+    # Manifeste inchangé : GET conditionnel, 304, rien n'est téléchargé
+    s3.calls.clear()
+    assert not leader.poll()
+    assert s3.calls == [("get_object", "manifest.json")]
+    assert read_state(tmp_path / "shared")["version"] == state["version"]
+    assert not follower.sync()
+
+    # Nouveau modèle : nouvelle version publiée, l'ancienne est conservée
+    manifest = upload(s3, tmp_path, seed=1)
+    assert leader.poll()
+    assert follower.sync()
+    assert active[1].version == manifest["version"]
+    assert os.path.isdir(tmp_path / "shared" / state["version"])
+
+
+@pytest.mark.parametrize("corruption", ["etag", "sha256", "size"])
+def test_poll_rejects_corrupt_artifacts(tmp_path, s3, corruption):
+    """Test qu'un téléchargement corrompu ou différent du manifeste n'est
+    jamais publié et que l'erreur est visible par tous les workers"""
+    manifest = upload(s3, tmp_path)
+    entry = manifest["artifacts"]["model.pkl"]
+    body, etag = s3.objects[entry["key"]]
+    if corruption == "etag":  # contenu altéré en transit
+        s3.put(entry["key"], body[:-1] + b"!", etag=etag)
+    elif corruption == "sha256":  # objet valide mais pas celui du manifeste
+        s3.put(entry["key"], body[:-1] + b"!")
+    else:
+        entry["size"] += 1
+        s3.put("manifest.json", json.dumps(manifest).encode())
+    active = {}
+    leader, follower = make_workers(s3, tmp_path / "shared", active)
+
+    with pytest.raises(ValueError, match="corrompu|manifeste"):
+        leader.poll()
+    state = read_state(tmp_path / "shared")
+    assert "version" not in state and "manifest_etag" not in state
+    assert state["last_error"]
+    assert follower.info()["last_error"] == state["last_error"]
+    assert not follower.sync() and not active
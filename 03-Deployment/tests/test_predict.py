@@ -0,0 +1,89 @@
+# tests/test_predict.py
+
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+ROW = {
+    "posted_speed_limit": 30,
+    "weather_condition": "CLEAR",
+    "lighting_condition": "DAYLIGHT",
+    "first_crash_type": "REAR END",
+    "trafficway_type": "ONE-WAY",
+    "roadway_surface_cond": "DRY",
+    "prim_contributory_cause": "FOLLOWING TOO CLOSELY",
+    "crash_hour": 14,
+    "delay_police_minutes": 5.0,
+}
+
+
+@pytest.fixture
+def client(predict_app):
+    with TestClient(predict_app.app) as client:
+        yield client
+
+
+def as_csv(rows):
+    lines = [",".join(ROW)]
+    lines += [",".join(str(row[col]) for col in ROW) for row in rows]
+    return "\n".join(lines) + "\n"
+
+
+@pytest.mark.parametrize(
+    "content_type, encode",
+    [
+        ("application/json", json.dumps),
+        ("application/x-ndjson", lambda rows: "\n".join(map(json.dumps, rows))),
+        ("text/csv", as_csv),
+    ],
+)
+def test_predict_batch_formats(client, content_type, encode):
+    """Test que JSON, NDJSON et CSV donnent les mêmes prédictions"""
+    rows = [ROW, {**ROW, "crash_hour": 2, "trafficway_type": "1"}]
+    response = client.post(
+        "/predict/batch",
+        content=encode(rows),
+        headers={"content-type": content_type},
+    )
+
+    assert response.status_code == 200
+    expected = client.post("/predict/batch", json=rows).json()
+    assert response.json() == expected
+    assert len(expected["predictions"]) == len(expected["probabilities"]) == 2
+
+
+@pytest.mark.parametrize("content_type", ["application/json", "text/csv"])
+def test_predict_batch_invalid_row(client, content_type):
+    """Test qu'une ligne invalide donne une 422, quel que soit le format"""
+    rows = [ROW, {**ROW, "delay_police_minutes": "abc"}]
+    body = as_csv(rows) if content_type == "text/csv" else json.dumps(rows)
+    response = client.post(
+        "/predict/batch", content=body, headers={"content-type": content_type}
+    )
+
+    assert response.status_code == 422
+    assert "delay_police_minutes" in response.text
+
+
+def test_predict_batch_too_large(client, predict_app, monkeypatch):
+    """Test qu'un lot au-delà de MAX_BATCH_SIZE est refusé (413)"""
+    monkeypatch.setattr(predict_app, "MAX_BATCH_SIZE", 2)
+
+    response = client.post("/predict/batch", json=[ROW] * 3)
+
+    assert response.status_code == 413
+
+
+def test_ready_after_warm_up(predict_app):
+    """Test que /ready répond 503 avant le warm-up et 200 après"""
+    # Sans `with` : le lifespan (warm-up) n'est pas exécuté
+    cold = TestClient(predict_app.app)
+    assert cold.get("/health").status_code == 200
+    assert cold.get("/ready").status_code == 503
+
+    with TestClient(predict_app.app) as client:
+        response = client.get("/ready")
+        assert response.status_code == 200
+        assert "warmup" in response.json()["startup_seconds"]
+    assert cold.get("/ready").status_code == 503
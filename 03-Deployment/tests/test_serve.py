@@ -0,0 +1,36 @@
+# tests/test_serve.py
+
+import os
+import pickle
+import shutil
+
+import numpy as np
+import serve
+from compiled_forest import CompiledForest
+from sklearn.ensemble import RandomForestClassifier
+
+MODEL_DIR = os.path.join(os.path.dirname(__file__), "..", "app", "model")
+
+
+def test_prepare_shared_artifacts(tmp_path, monkeypatch):
+    """Test que les artefacts sont compilés une fois puis réutilisés en mmap"""
+    rng = np.random.default_rng(0)
+    forest = RandomForestClassifier(n_estimators=3, random_state=0)
+    forest.fit(rng.normal(size=(50, 4)), rng.integers(0, 2, 50))
+    with open(tmp_path / "model.pkl", "wb") as f:
+        pickle.dump(forest, f)
+    shutil.copy(os.path.join(MODEL_DIR, "preprocessor.joblib"), tmp_path)
+
+    monkeypatch.setattr(serve, "MODEL_DIR", str(tmp_path))
+    for env_var in ("COMPILED_MODEL_PATH", "COMPILED_PREPROCESSOR_PATH"):
+        monkeypatch.delenv(env_var, raising=False)
+    serve.prepare_shared_artifacts()
+
+    path = os.environ["COMPILED_MODEL_PATH"]
+    assert path == str(tmp_path / "model_compiled.joblib")
+    assert os.path.exists(os.environ["COMPILED_PREPROCESSOR_PATH"])
+    mtime = os.path.getmtime(path)
+
+    serve.prepare_shared_artifacts()  # déjà à jour : pas de recompilation
+    assert os.path.getmtime(path) == mtime
+    assert isinstance(CompiledForest.load(path, mmap_mode="r").value, np.memmap)
@@ -0,0 +1,57 @@
+# tests/test_upload_to_s3.py
+
+import json
+
+import pytest
+import upload_to_s3
+
+
+@pytest.fixture
+def uploader(tmp_path, monkeypatch, s3):
+    for name, content in (("model.pkl", b"forest"), ("preprocessor.joblib", b"prep")):
+        (tmp_path / name).write_bytes(content)
+    monkeypatch.setattr(upload_to_s3, "s3", s3)
+    monkeypatch.setattr(upload_to_s3, "MODEL_DIR", str(tmp_path))
+    return upload_to_s3
+
+
+def test_upload_content_addressed_manifest_last(uploader, s3, tmp_path):
+    """Test que les artefacts sont stockés sous artifacts/{sha}/{fichier} et
+    que le manifeste est écrit en dernier"""
+    manifest = uploader.upload_files()
+
+    for name in uploader.FILES:
+        sha256 = uploader.file_sha256(tmp_path / name)
+        entry = manifest["artifacts"][name]
+        assert entry == {
+            "key": f"artifacts/{sha256}/{name}",
+            "sha256": sha256,
+            "size": (tmp_path / name).stat().st_size,
+        }
+        assert s3.objects[entry["key"]][0] == (tmp_path / name).read_bytes()
+    writes = [call for call in s3.calls if call[0] in ("upload_file", "put_object")]
+    assert len(writes) == 3
+    assert writes[-1] == ("put_object", "manifest.json")
+    assert json.loads(s3.objects["manifest.json"][0]) == manifest
+
+
+def test_upload_skips_unchanged_files(uploader, s3, tmp_path):
+    """Test qu'un artefact déjà présent n'est pas renvoyé et qu'un manifeste
+    identique n'est pas réécrit"""
+    first = uploader.upload_files()
+    s3.calls.clear()
+
+    assert uploader.upload_files() == first
+    assert not [call for call in s3.calls if call[0] in ("upload_file", "put_object")]
+
+    # Seul le modèle a changé : un upload, puis le nouveau manifeste
+    (tmp_path / "model.pkl").write_bytes(b"forest v2")
+    s3.calls.clear()
+    manifest = uploader.upload_files()
+    writes = [call for call in s3.calls if call[0] in ("upload_file", "put_object")]
+    assert writes == [
+        ("upload_file", manifest["artifacts"]["model.pkl"]["key"]),
+        ("put_object", "manifest.json"),
+    ]
+    prep = "preprocessor.joblib"
+    assert manifest["artifacts"][prep] == first["artifacts"][prep]
@@ -1,10 +1,27 @@
 import boto3
+import hashlib
+import json
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from boto3.s3.transfer import TransferConfig
 
 BUCKET_NAME = "mlops-models"
 ENDPOINT = "http://localhost:4566"  # LocalStack
 MODEL_DIR = "app/model"
+FILES = ["model.pkl", "preprocessor.joblib"]
+# Manifeste : dernière écriture, elle publie la nouvelle version
+MANIFEST_KEY = "manifest.json"
+
+# Multipart : parts de 16 Mo envoyées en parallèle (fichiers et parts)
+MAX_WORKERS = int(os.getenv("UPLOAD_WORKERS", "8"))
+TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=16 * 1024 * 1024,
+    multipart_chunksize=16 * 1024 * 1024,
+    max_concurrency=MAX_WORKERS,
+    use_threads=True,
+)
 
 # Configuration S3
 s3 = boto3.client(
@@ -28,23 +45,86 @@ def check_and_create_bucket():
         print(f"❌ Erreur avec le bucket: {str(e)}")
         raise
 
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def artifact_key(file, sha256):
+    """Clé adressée par le contenu : un contenu identique a toujours la même clé"""
+    return f"artifacts/{sha256}/{file}"
+
+def remote_sha256(key):
+    """Empreinte stockée dans les métadonnées de l'objet, None s'il n'existe pas"""
+    try:
+        head = s3.head_object(Bucket=BUCKET_NAME, Key=key)
+    except s3.exceptions.ClientError as e:
+        if e.response["Error"]["Code"] in ("404", "NoSuchKey", "NotFound"):
+            return None
+        raise
+    return head["Metadata"].get("sha256")
+
+def upload_file(file):
+    """Upload un artefact sous sa clé adressée par le contenu, sauf s'il y est déjà"""
+    file_path = Path(MODEL_DIR) / file
+    if not file_path.exists():
+        raise FileNotFoundError(f"Fichier {file_path} introuvable")
+
+    sha256 = file_sha256(file_path)
+    key = artifact_key(file, sha256)
+    entry = {"key": key, "sha256": sha256, "size": file_path.stat().st_size}
+    if remote_sha256(key) == sha256:
+        print(f"⏭️ {file} inchangé ({sha256[:12]}), upload ignoré")
+        return file, entry
+
+    start = time.perf_counter()
+    s3.upload_file(
+        str(file_path), BUCKET_NAME, key,
+        ExtraArgs={"Metadata": {"sha256": sha256}},
+        Config=TRANSFER_CONFIG,
+    )
+    print(f"📤 {file} uploadé avec succès ({entry['size'] / 1e6:.1f} Mo en {time.perf_counter() - start:.1f} s)")
+    return file, entry
+
+def remote_manifest():
+    """Manifeste actuellement publié, None s'il n'existe pas"""
+    try:
+        body = s3.get_object(Bucket=BUCKET_NAME, Key=MANIFEST_KEY)["Body"].read()
+    except s3.exceptions.NoSuchKey:
+        return None
+    return json.loads(body)
+
 def upload_files():
-    """Upload les fichiers vers S3"""
-    files = ["model.pkl", "preprocessor.joblib"]
-    for file in files:
-        file_path = Path(MODEL_DIR) / file
-        try:
-            if not file_path.exists():
-                raise FileNotFoundError(f"Fichier {file_path} introuvable")
-            
-            s3.upload_file(str(file_path), BUCKET_NAME, file)
-            print(f"📤 {file} uploadé avec succès")
-        except Exception as e:
-            print(f"❌ Erreur lors de l'upload de {file}: {str(e)}")
-            raise
+    """Upload les fichiers vers S3 en parallèle puis publie le manifeste"""
+    try:
+        with ThreadPoolExecutor(MAX_WORKERS) as pool:
+            artifacts = dict(pool.map(upload_file, FILES))
+    except Exception as e:
+        print(f"❌ Erreur lors de l'upload: {str(e)}")
+        raise
+
+    manifest = {
+        # Même version que celle renvoyée par l'API (model_version)
+        "version": artifacts["model.pkl"]["sha256"][:12],
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "artifacts": artifacts,
+    }
+    published = remote_manifest()
+    if published is not None and published["artifacts"] == artifacts:
+        print(f"⏭️ Manifeste déjà à jour : version {published['version']}")
+        return published
+    s3.put_object(
+        Bucket=BUCKET_NAME, Key=MANIFEST_KEY,
+        Body=json.dumps(manifest, indent=2).encode(),
+        ContentType="application/json",
+    )
+    print(f"🧾 Manifeste publié : version {manifest['version']}")
+    return manifest
 
 if __name__ == "__main__":
     print("🚀 Début de l'upload vers LocalStack S3")
     check_and_create_bucket()
     upload_files()
-    print("✅ Téléversement terminé")
\ No newline at end of file
+    print("✅ Téléversement terminé")
@@ -0,0 +1,288 @@
+# drift_monitor.py
+
+import argparse
+import json
+import math
+import os
+import time
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+from crash_preprocessing import parse_dates
+
+NUMERIC_COLS = ['delay_police_minutes', 'posted_speed_limit', 'crash_hour']
+CATEGORICAL_COLS = ['weather_condition', 'lighting_condition', 'prim_contributory_cause']
+RAW_COLS = ['crash_date', 'date_police_notified', 'posted_speed_limit', 'crash_hour'] + CATEGORICAL_COLS
+
+PROFILE_FILE = "reference_profile.json"
+MISSING = "<NA>"
+OTHER = "<AUTRE>"
+# Catégories conservées par colonne (les suivantes sont regroupées)
+MAX_CATEGORIES = 200
+# Compartiments de l'histogramme de référence (déciles)
+N_BINS = 10
+# Seuils : PSI >= 0.2 dérive notable ; p-value des tests KS / chi²
+PSI_THRESHOLD = 0.2
+P_VALUE_THRESHOLD = 0.05
+# Dérive du jeu de données : part des colonnes en dérive
+DRIFT_SHARE = 0.5
+
+# 1. Sketch de quantiles (erreur relative bornée, fusionnable)
+class QuantileSketch:
+    """Sketch de type DDSketch : chaque valeur tombe dans un compartiment
+    logarithmique ]γ^(k-1), γ^k] (γ = (1+α)/(1-α)) ; seuls les comptages par
+    compartiment sont gardés. Les quantiles sont exacts à α près en relatif et
+    la mémoire ne dépend que de l'étendue des valeurs, pas de leur nombre."""
+
+    def __init__(self, alpha=0.01):
+        self.alpha = alpha
+        self.gamma = (1 + alpha) / (1 - alpha)
+        self.positive = {}
+        self.negative = {}
+        self.zero = 0
+        self.count = 0
+
+    def _add(self, store, values):
+        keys, counts = np.unique(np.ceil(np.log(values) / np.log(self.gamma)).astype(int), return_counts=True)
+        for key, count in zip(keys.tolist(), counts.tolist()):
+            store[key] = store.get(key, 0) + count
+
+    def update(self, values):
+        values = np.asarray(values, dtype=float)
+        values = values[~np.isnan(values)]
+        self.count += len(values)
+        self.zero += int((values == 0).sum())
+        self._add(self.positive, values[values > 0])
+        self._add(self.negative, -values[values < 0])
+        return self
+
+    def _representative(self, key):
+        # Milieu (en erreur relative) du compartiment ]γ^(k-1), γ^k]
+        return 2 * self.gamma ** key / (self.gamma + 1)
+
+    def buckets(self):
+        """(valeurs représentatives croissantes, comptages)"""
+        items = [(-self._representative(k), c) for k, c in sorted(self.negative.items(), reverse=True)]
+        items += [(0.0, self.zero)] if self.zero else []
+        items += [(self._representative(k), c) for k, c in sorted(self.positive.items())]
+        if not items:
+            return np.empty(0), np.empty(0, dtype=int)
+        values, counts = zip(*items)
+        return np.array(values), np.array(counts)
+
+    def quantile(self, q):
+        values, counts = self.buckets()
+        if not self.count:
+            return math.nan
+        return float(values[np.searchsorted(np.cumsum(counts), q * (self.count - 1), side="right")])
+
+    def to_dict(self):
+        return {"alpha": self.alpha, "positive": self.positive, "negative": self.negative,
+                "zero": self.zero, "count": self.count}
+
+    @classmethod
+    def from_dict(cls, state):
+        sketch = cls(state["alpha"])
+        # Clés JSON en texte
+        sketch.positive = {int(k): v for k, v in state["positive"].items()}
+        sketch.negative = {int(k): v for k, v in state["negative"].items()}
+        sketch.zero, sketch.count = state["zero"], state["count"]
+        return sketch
+
+# 2. Lecture en flux
+def feature_chunks(paths, chunksize=100_000):
+    """Colonnes surveillées, bloc par bloc (seules les colonnes utiles sont lues)"""
+    if isinstance(paths, (str, os.PathLike)):
+        paths = [paths]
+    for path in paths:
+        # L'historique est en majuscules, l'API du portail en minuscules
+        reader = pd.read_csv(path, chunksize=chunksize, usecols=lambda c: c.lower() in RAW_COLS)
+        for chunk in reader:
+            chunk.columns = chunk.columns.str.lower()
+            yield to_features(chunk)
+
+def to_features(df):
+    # parse_dates de crash_preprocessing : format de l'export CSV, sinon ISO
+    # 8601 (API du portail), comme pour l'entraînement
+    crash_date = parse_dates(df['crash_date'])
+    notified = parse_dates(df['date_police_notified'])
+    features = pd.DataFrame({
+        'delay_police_minutes': (notified - crash_date).dt.total_seconds() / 60,
+        'posted_speed_limit': pd.to_numeric(df['posted_speed_limit'], errors='coerce'),
+        'crash_hour': pd.to_numeric(df['crash_hour'], errors='coerce'),
+    })
+    for col in CATEGORICAL_COLS:
+        features[col] = df[col].astype(object).where(df[col].notna(), MISSING)
+    return features
+
+class ProfileAccumulator:
+    """Statistiques de distribution mises à jour bloc par bloc : un sketch par
+    colonne numérique, des comptages par catégorie (mémoire bornée)"""
+
+    def __init__(self, alpha=0.01):
+        self.n_rows = 0
+        self.sketches = {col: QuantileSketch(alpha) for col in NUMERIC_COLS}
+        self.n_missing = dict.fromkeys(NUMERIC_COLS, 0)
+        self.counts = {col: {} for col in CATEGORICAL_COLS}
+
+    def update(self, features):
+        self.n_rows += len(features)
+        for col in NUMERIC_COLS:
+            self.sketches[col].update(features[col].to_numpy(dtype=float))
+            self.n_missing[col] += int(features[col].isna().sum())
+        for col in CATEGORICAL_COLS:
+            counts = self.counts[col]
+            for value, count in features[col].value_counts().items():
+                key = str(value)
+                if key not in counts and len(counts) >= MAX_CATEGORIES:
+                    key = OTHER
+                counts[key] = counts.get(key, 0) + int(count)
+        return self
+
+# 3. Profil de référence
+def _histogram(sketch, edges, n_missing):
+    """Comptages par intervalle ]edges[i-1], edges[i]] + un compartiment « manquant »"""
+    values, counts = sketch.buckets()
+    hist = np.bincount(np.searchsorted(edges, values, side="left"), weights=counts, minlength=len(edges) + 1)
+    return [int(c) for c in hist] + [int(n_missing)]
+
+def build_reference_profile(chunks, alpha=0.01, n_bins=N_BINS):
+    """Profil calculé une seule fois sur les données de référence"""
+    accumulator = ProfileAccumulator(alpha)
+    for features in chunks:
+        accumulator.update(features)
+
+    profile = {"created_at": time.strftime("%Y-%m-%dT%H:%M:%S"), "n_rows": accumulator.n_rows,
+               "numeric": {}, "categorical": {}}
+    for col, sketch in accumulator.sketches.items():
+        # Bornes aux déciles de référence (valeurs des compartiments du sketch)
+        edges = sorted({sketch.quantile(q) for q in np.arange(1, n_bins) / n_bins} if sketch.count else set())
+        profile["numeric"][col] = {
+            "edges": edges,
+            "hist": _histogram(sketch, edges, accumulator.n_missing[col]),
+            "n_missing": accumulator.n_missing[col],
+            "quantiles": {str(q): sketch.quantile(q) for q in (0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99)},
+            "sketch": sketch.to_dict(),
+        }
+    for col, counts in accumulator.counts.items():
+        profile["categorical"][col] = {"counts": dict(sorted(counts.items(), key=lambda kv: -kv[1]))}
+    return profile
+
+def save_json(content, path):
+    # Écriture atomique : le profil précédent reste lisible en cas d'échec
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path + ".tmp", "w") as f:
+        json.dump(content, f)
+    os.replace(path + ".tmp", path)
+
+def load_profile(path):
+    with open(path) as f:
+        return json.load(f)
+
+# 4. Dérive
+def psi(expected, actual, eps=1e-4):
+    """Population Stability Index entre deux vecteurs de comptages"""
+    p = np.maximum(np.asarray(expected, float) / max(sum(expected), 1), eps)
+    q = np.maximum(np.asarray(actual, float) / max(sum(actual), 1), eps)
+    return float(np.sum((q - p) * np.log(q / p)))
+
+def ks_sketches(reference, current):
+    """Statistique et p-value de Kolmogorov-Smirnov à deux échantillons,
+    calculées sur les compartiments communs des deux sketches"""
+    if not reference.count or not current.count:
+        return math.nan, math.nan
+    ref_values, ref_counts = reference.buckets()
+    cur_values, cur_counts = current.buckets()
+    # Mêmes α : les compartiments des deux sketches tombent sur la même grille
+    grid = np.union1d(ref_values, cur_values)
+    ref_cdf = np.cumsum(np.bincount(np.searchsorted(grid, ref_values), ref_counts, len(grid))) / reference.count
+    cur_cdf = np.cumsum(np.bincount(np.searchsorted(grid, cur_values), cur_counts, len(grid))) / current.count
+    statistic = float(np.max(np.abs(ref_cdf - cur_cdf)))
+    n = reference.count * current.count / (reference.count + current.count)
+    return statistic, float(stats.kstwo.sf(statistic, max(1, round(n))))
+
+def chi2_counts(reference, current):
+    """Test du chi² d'homogénéité sur la table référence / courant"""
+    categories = sorted(set(reference) | set(current))
+    table = np.array([[reference.get(c, 0) for c in categories], [current.get(c, 0) for c in categories]])
+    table = table[:, table.sum(axis=0) > 0]
+    if table.shape[1] < 2 or table[1].sum() == 0:
+        return 0.0, 1.0
+    statistic, p_value, _, _ = stats.chi2_contingency(table, correction=False)
+    return float(statistic), float(p_value)
+
+def compute_drift(profile, chunks):
+    """Compare les données courantes (lues bloc par bloc) au profil de
+    référence : PSI pour toutes les colonnes, KS (numériques) ou chi²
+    (catégorielles) ; une colonne dérive si PSI >= PSI_THRESHOLD."""
+    alpha = next(iter(profile["numeric"].values()))["sketch"]["alpha"]
+    current = ProfileAccumulator(alpha)
+    for features in chunks:
+        current.update(features)
+
+    columns = {}
+    for col, ref in profile["numeric"].items():
+        sketch = current.sketches[col]
+        hist = _histogram(sketch, ref["edges"], current.n_missing[col])
+        statistic, p_value = ks_sketches(QuantileSketch.from_dict(ref["sketch"]), sketch)
+        columns[col] = {"type": "numeric", "psi": psi(ref["hist"], hist), "test": "ks",
+                        "statistic": statistic, "p_value": p_value,
+                        "median_reference": ref["quantiles"]["0.5"], "median_current": sketch.quantile(0.5)}
+    for col, ref in profile["categorical"].items():
+        # Catégories absentes de la référence : regroupées pour le PSI
+        counts = {}
+        for key, count in current.counts[col].items():
+            key = key if key in ref["counts"] else OTHER
+            counts[key] = counts.get(key, 0) + count
+        categories = sorted(set(ref["counts"]) | set(counts))
+        statistic, p_value = chi2_counts(ref["counts"], counts)
+        columns[col] = {"type": "categorical",
+                        "psi": psi([ref["counts"].get(c, 0) for c in categories], [counts.get(c, 0) for c in categories]),
+                        "test": "chi2", "statistic": statistic, "p_value": p_value,
+                        "new_categories": sorted(set(current.counts[col]) - set(ref["counts"]))}
+    for result in columns.values():
+        result["drift"] = result["psi"] >= PSI_THRESHOLD
+        # Sur de gros volumes, le test devient significatif pour d'infimes écarts :
+        # indicatif seulement, la décision repose sur le PSI
+        result["test_drift"] = result["p_value"] < P_VALUE_THRESHOLD
+
+    share = sum(r["drift"] for r in columns.values()) / len(columns)
+    return {"n_reference": profile["n_rows"], "n_current": current.n_rows,
+            "drift_share": share, "dataset_drift": share >= DRIFT_SHARE, "columns": columns}
+
+def print_report(report):
+    print(f"📊 Référence : {report['n_reference']} lignes, courant : {report['n_current']} lignes")
+    for col, r in report["columns"].items():
+        flag = "⚠️ dérive" if r["drift"] else "✅ stable"
+        print(f"  - {col:<24} PSI {r['psi']:.3f}  {r['test']} {r['statistic']:.3f} (p={r['p_value']:.3g})  {flag}")
+    status = "⚠️ Dérive du jeu de données" if report["dataset_drift"] else "✅ Pas de dérive du jeu de données"
+    print(f"{status} ({report['drift_share']:.0%} des colonnes)")
+
+# 5. Main
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Profil de référence et dérive des données, en flux")
+    sub = parser.add_subparsers(dest="command", required=True)
+    ref = sub.add_parser("reference", help="Calculer le profil de référence (une seule fois)")
+    ref.add_argument("--data", nargs="+", default=["data/Traffic_Crashes.csv"])
+    ref.add_argument("--output", default=f"processed_data/{PROFILE_FILE}",
+                     help="À côté de preprocessor.joblib")
+    drift = sub.add_parser("drift", help="Mesurer la dérive des nouvelles données")
+    drift.add_argument("--data", nargs="+", default=["data/new_data.csv"])
+    drift.add_argument("--profile", default=f"processed_data/{PROFILE_FILE}")
+    drift.add_argument("--report", default="report/drift_report.json")
+    for p in (ref, drift):
+        p.add_argument("--chunksize", type=int, default=100_000)
+    args = parser.parse_args()
+
+    if args.command == "reference":
+        profile = build_reference_profile(feature_chunks(args.data, args.chunksize))
+        save_json(profile, args.output)
+        print(f"💾 Profil de référence ({profile['n_rows']} lignes) : {args.output} "
+              f"({os.path.getsize(args.output) / 1e3:.0f} Ko)")
+    else:
+        report = compute_drift(load_profile(args.profile), feature_chunks(args.data, args.chunksize))
+        print_report(report)
+        save_json(report, args.report)
+        print(f"💾 Rapport : {args.report}")
@@ -0,0 +1,58 @@
+# tests/test_drift_monitor.py
+
+import numpy as np
+import pandas as pd
+
+from drift_monitor import (
+    QuantileSketch, build_reference_profile, compute_drift, feature_chunks, load_profile, save_json,
+)
+
+
+def _crashes(n, seed, speeds=(20, 30, 45), weather=("CLEAR", "RAIN", "SNOW")):
+    rng = np.random.default_rng(seed)
+    crash_date = pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 10**7, n), unit="s")
+    notified = crash_date + pd.to_timedelta(rng.exponential(60, n), unit="min")
+    return pd.DataFrame({
+        "CRASH_DATE": crash_date.strftime("%m/%d/%Y %I:%M:%S %p"),
+        "DATE_POLICE_NOTIFIED": notified.strftime("%m/%d/%Y %I:%M:%S %p"),
+        "POSTED_SPEED_LIMIT": rng.choice(speeds, n),
+        "CRASH_HOUR": crash_date.hour,
+        "WEATHER_CONDITION": rng.choice(weather, n),
+        "LIGHTING_CONDITION": rng.choice(["DAYLIGHT", "DARKNESS"], n),
+        "PRIM_CONTRIBUTORY_CAUSE": rng.choice(["UNABLE TO DETERMINE", "SPEEDING"], n),
+    })
+
+
+def test_sketch_quantiles_are_chunk_independent():
+    """Test que le sketch donne les mêmes quantiles bloc par bloc, à 1 % près"""
+    values = np.random.default_rng(0).lognormal(3, 1, 50_000)
+    whole = QuantileSketch().update(values)
+    chunked = QuantileSketch()
+    for block in np.array_split(values, 7):
+        chunked.update(block)
+
+    for q in (0.05, 0.5, 0.95):
+        assert chunked.quantile(q) == whole.quantile(q)
+        assert abs(whole.quantile(q) / np.quantile(values, q) - 1) < 0.02
+
+
+def test_drift_detected_only_on_shifted_columns(tmp_path):
+    """Test que seules les colonnes déplacées sont signalées, profil relu depuis le disque"""
+    _crashes(20_000, 0).to_csv(tmp_path / "ref.csv", index=False)
+    same = _crashes(5_000, 1)
+    same.columns = same.columns.str.lower()  # format de l'API du portail
+    same.to_csv(tmp_path / "same.csv", index=False)
+    _crashes(5_000, 2, speeds=(45, 55), weather=("RAIN", "FOG")).to_csv(tmp_path / "shifted.csv", index=False)
+
+    save_json(build_reference_profile(feature_chunks(tmp_path / "ref.csv", chunksize=3_000)),
+              str(tmp_path / "reference_profile.json"))
+    profile = load_profile(tmp_path / "reference_profile.json")
+
+    report = compute_drift(profile, feature_chunks(tmp_path / "same.csv", chunksize=1_000))
+    assert report["n_current"] == 5_000
+    assert not any(r["drift"] for r in report["columns"].values())
+
+    report = compute_drift(profile, feature_chunks(tmp_path / "shifted.csv", chunksize=1_000))
+    drifted = {col for col, r in report["columns"].items() if r["drift"]}
+    assert drifted == {"posted_speed_limit", "weather_condition"}
+    assert report["columns"]["weather_condition"]["new_categories"] == ["FOG"]
@@ -0,0 +1,85 @@
+# benchmarks/compare_benchmarks.py
+# Compare des résultats de run_benchmarks.py à une référence : code de
+# sortie 1 si une mesure se dégrade au-delà de la tolérance. Les mesures qui
+# dépendent du nombre de cœurs sont ignorées si celui-ci diffère.
+#
+#   python benchmarks/compare_benchmarks.py baseline.json results.json
+
+import argparse
+import json
+import sys
+
+# Mesures parallèles : forêt (n_jobs=-1) et requêtes concurrentes
+PARALLEL = ("random_forest_fit", "predict_throughput")
+
+
+def load(path):
+    """(métadonnées du run, mesures par (nom, lignes))"""
+    with open(path) as f:
+        report = json.load(f)
+    benchmarks = {(b["name"], b["rows"]): b for b in report["benchmarks"]}
+    return report["meta"], benchmarks
+
+
+def skipped(baseline_meta, current_meta):
+    """Mesures non comparables : parallèles, si le nombre de cœurs diffère"""
+    if baseline_meta.get("cpu_count") == current_meta.get("cpu_count"):
+        return set()
+    return set(PARALLEL)
+
+
+def slowdown(baseline, current):
+    """Facteur de ralentissement (> 1 : plus lent) ; temps ou débit"""
+    if "seconds" in baseline:
+        return current["seconds"] / baseline["seconds"]
+    return baseline["per_second"] / current["per_second"]
+
+
+def compare(baseline, current, tolerance=0.25, skip=()):
+    """Lignes (nom, lignes, facteur, régression) des mesures communes, sauf
+    celles de `skip`"""
+    rows = []
+    for key in sorted(baseline.keys() & current.keys()):
+        if key[0] in skip:
+            continue
+        factor = slowdown(baseline[key], current[key])
+        rows.append((*key, factor, factor > 1 + tolerance))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("baseline")
+    parser.add_argument("current")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.25,
+        help="ralentissement toléré (0.25 = 25 %%)",
+    )
+    args = parser.parse_args()
+
+    baseline_meta, baseline = load(args.baseline)
+    current_meta, current = load(args.current)
+    skip = skipped(baseline_meta, current_meta)
+    if skip:
+        print(
+            f"⏭️ {baseline_meta.get('cpu_count')} cœur(s) pour la référence, "
+            f"{current_meta.get('cpu_count')} ici : {', '.join(sorted(skip))} "
+            "ignorés"
+        )
+    rows = compare(baseline, current, args.tolerance, skip)
+    if not rows:
+        sys.exit("❌ Aucune mesure commune avec la référence")
+    for name, n, factor, regressed in rows:
+        status = "❌" if regressed else "✅"
+        print(f"{status} {name:<32}{n:>10}  x{factor:.2f}")
+
+    regressions = [row for row in rows if row[3]]
+    if regressions:
+        sys.exit(f"❌ {len(regressions)} régression(s) de performance")
+    print("✅ Pas de régression de performance")
+
+
+if __name__ == "__main__":
+    main()
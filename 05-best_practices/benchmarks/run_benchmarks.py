@@ -0,0 +1,226 @@
+# benchmarks/run_benchmarks.py
+# Benchmarks des chemins critiques sur des données synthétiques au schéma du
+# portail (sans réseau) : lecture, prétraitement, FrequencyEncoder,
+# entraînement de la forêt et /predict (client ASGI dans le processus).
+# Résultats en JSON, comparés à une référence par compare_benchmarks.py.
+#
+#   python benchmarks/run_benchmarks.py --sizes 10000 1000000
+
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import pickle
+import platform
+import sys
+import tempfile
+import time
+
+import joblib
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+
+from crash_preprocessing import (
+    FEATURE_SPEC,
+    FrequencyEncoder,
+    load_data,
+    prepare_features,
+    preprocess_data,
+)
+from crash_preprocessing.synthetic import make_crashes, write_crashes_csv
+from crash_preprocessing.training import BEST_PARAMS
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+APP_DIR = os.path.join(HERE, "..", "..", "03-Deployment", "app")
+SIZES = (10_000, 1_000_000)
+
+
+# 1. Mesures
+def timed(fn, repeat=1):
+    """Meilleur temps (s) sur `repeat` exécutions, et le dernier résultat"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def percentile(values, q):
+    return float(np.percentile(values, q))
+
+
+# 2. Prétraitement et entraînement
+def bench_size(n, data_dir, repeat, rf_max_rows):
+    """Lecture, prétraitement, FrequencyEncoder et forêt sur `n` lignes"""
+    path = os.path.join(data_dir, f"crashes-{n}.csv")
+    if not os.path.exists(path):
+        print(f"⏳ Génération de {n} lignes synthétiques...")
+        write_crashes_csv(path, n)
+
+    results = []
+
+    def record(name, seconds, rows=n):
+        results.append({"name": name, "rows": rows, "seconds": seconds})
+        print(f"⏱️ {name} [{rows}] : {seconds:.3f} s")
+
+    seconds, df = timed(lambda: load_data(path), repeat)
+    record("load_data", seconds)
+    seconds, (X, y, preprocessor) = timed(lambda: preprocess_data(df), repeat)
+    record("preprocess_data", seconds)
+
+    # Colonnes fréquentielles telles que les reçoit l'encodeur (imputées)
+    raw, _ = prepare_features(df)
+    frequency = raw[list(FEATURE_SPEC.frequency)]
+    values = frequency.astype(object).fillna("UNKNOWN").to_numpy()
+    encoder = FrequencyEncoder()
+    seconds, _ = timed(lambda: encoder.fit(values), repeat)
+    record("frequency_encoder_fit", seconds)
+    seconds, _ = timed(lambda: encoder.transform(values), repeat)
+    record("frequency_encoder_transform", seconds)
+
+    # Forêt de production (BEST_PARAMS), entraînée une fois
+    rows = min(n, rf_max_rows)
+    model = RandomForestClassifier(**BEST_PARAMS, n_jobs=-1)
+    seconds, _ = timed(lambda: model.fit(X[:rows], np.asarray(y)[:rows]))
+    record("random_forest_fit", seconds, rows)
+    return results, model, preprocessor
+
+
+# 3. API : /predict dans le processus (httpx.ASGITransport)
+async def _serve_requests(client, payloads, concurrency):
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def call(payload):
+        async with semaphore:
+            start = time.perf_counter()
+            response = await client.post("/predict", json=payload)
+            latencies.append(time.perf_counter() - start)
+            response.raise_for_status()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(call(payload) for payload in payloads))
+    return latencies, time.perf_counter() - start
+
+
+async def _bench_api(predict, payloads, concurrency, batch_size):
+    import httpx
+
+    transport = httpx.ASGITransport(app=predict.app)
+    # ASGITransport n'exécute pas le lifespan (micro-lots, warm-up)
+    async with predict.lifespan(predict.app):
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://bench"
+        ) as client:
+            await _serve_requests(client, payloads[:50], 1)  # préchauffage
+            sequential, _ = await _serve_requests(client, payloads, 1)
+            _, elapsed = await _serve_requests(client, payloads, concurrency)
+
+            batch = payloads[:batch_size]
+            batch_seconds = []
+            for _ in range(5):
+                start = time.perf_counter()
+                response = await client.post("/predict/batch", json=batch)
+                response.raise_for_status()
+                batch_seconds.append(time.perf_counter() - start)
+    return sequential, elapsed, min(batch_seconds)
+
+
+def bench_predict(model, preprocessor, train_rows, n_requests, concurrency):
+    """Latence (requêtes successives), débit (requêtes concurrentes regroupées
+    en micro-lots) et débit de /predict/batch, avec les artefacts compilés
+    comme au démarrage de serve.py"""
+    model_dir = tempfile.mkdtemp(prefix="bench-model-")
+    with open(os.path.join(model_dir, "model.pkl"), "wb") as f:
+        pickle.dump(model, f)
+    joblib.dump(preprocessor, os.path.join(model_dir, "preprocessor.joblib"))
+    os.environ["MODEL_DIR"] = model_dir
+    for env_var in ("COMPILED_MODEL_PATH", "COMPILED_PREPROCESSOR_PATH"):
+        os.environ.pop(env_var, None)
+    sys.path.insert(0, APP_DIR)
+    import serve
+
+    serve.prepare_shared_artifacts()
+    import predict
+
+    X, _ = prepare_features(make_crashes(n_requests, seed=1, case="lower"))
+    payloads = X.astype(object).where(X.notna(), "UNKNOWN")
+    payloads = payloads.to_dict("records")
+    batch_size = min(1000, n_requests)
+
+    sequential, elapsed, batch_seconds = asyncio.run(
+        _bench_api(predict, payloads, concurrency, batch_size)
+    )
+    results = [
+        {
+            "name": f"predict_latency_p{q}",
+            "rows": train_rows,
+            "seconds": percentile(sequential, q),
+        }
+        for q in (50, 95, 99)
+    ]
+    results.append(
+        {
+            "name": "predict_throughput",
+            "rows": train_rows,
+            "per_second": n_requests / elapsed,
+        }
+    )
+    results.append(
+        {
+            "name": f"predict_batch_{batch_size}_throughput",
+            "rows": train_rows,
+            "per_second": batch_size / batch_seconds,
+        }
+    )
+    for r in results:
+        value = r.get("seconds", r.get("per_second"))
+        print(f"⏱️ {r['name']} : {value:.4f}")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES)
+    parser.add_argument("--output", default=os.path.join(HERE, "results.json"))
+    parser.add_argument("--data-dir", default=tempfile.gettempdir())
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--rf-max-rows", type=int, default=200_000)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    args = parser.parse_args()
+
+    benchmarks, served = [], None
+    for n in sorted(args.sizes):
+        results, model, preprocessor = bench_size(
+            n, args.data_dir, args.repeat, args.rf_max_rows
+        )
+        benchmarks += results
+        # L'API sert la forêt de la plus petite taille (comparable d'un run
+        # à l'autre tant que cette taille ne change pas)
+        if served is None:
+            served = (model, preprocessor, min(n, args.rf_max_rows))
+
+    benchmarks += bench_predict(*served, args.requests, args.concurrency)
+
+    report = {
+        "meta": {
+            "created": datetime.datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "sizes": list(args.sizes),
+            "repeat": args.repeat,
+        },
+        "benchmarks": benchmarks,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"💾 Résultats : {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+# tests/test_benchmarks.py
+
+import os
+import subprocess
+import sys
+
+from benchmarks.compare_benchmarks import PARALLEL, compare, load, skipped
+
+RUNNER = os.path.join(
+    os.path.dirname(__file__), "..", "benchmarks", "run_benchmarks.py"
+)
+
+
+def test_compare_flags_regressions():
+    """Test qu'un temps plus long ou un débit plus faible au-delà de la
+    tolérance est une régression ; seules les mesures communes comptent"""
+    baseline = {
+        ("load_data", 10): {"seconds": 1.0},
+        ("predict_throughput", 10): {"per_second": 100.0},
+        ("preprocess_data", 10): {"seconds": 1.0},
+    }
+    current = {
+        ("load_data", 10): {"seconds": 1.2},
+        ("predict_throughput", 10): {"per_second": 50.0},
+        ("random_forest_fit", 10): {"seconds": 9.0},
+    }
+
+    rows = compare(baseline, current, tolerance=0.25)
+
+    assert [(name, regressed) for name, _, _, regressed in rows] == [
+        ("load_data", False),
+        ("predict_throughput", True),
+    ]
+    assert rows[1][2] == 2.0
+
+
+def test_compare_skips_parallel_when_cpu_count_differs():
+    """Test que les mesures parallèles ne sont comparées qu'à nombre de
+    cœurs égal"""
+    baseline = {
+        ("random_forest_fit", 10): {"seconds": 1.0},
+        ("load_data", 10): {"seconds": 1.0},
+    }
+    current = {
+        ("random_forest_fit", 10): {"seconds": 4.0},
+        ("load_data", 10): {"seconds": 1.0},
+    }
+
+    assert skipped({"cpu_count": 4}, {"cpu_count": 4}) == set()
+    skip = skipped({"cpu_count": 1}, {"cpu_count": 8})
+    assert skip == set(PARALLEL)
+    rows = compare(baseline, current, skip=skip)
+    assert [(name, regressed) for name, _, _, regressed in rows] == [
+        ("load_data", False)
+    ]
+
+
+def test_run_benchmarks_smoke(tmp_path):
+    """Test que le runner produit un results.json au schéma attendu sur un
+    petit jeu synthétique"""
+    output = tmp_path / "results.json"
+    subprocess.run(
+        [
+            sys.executable,
+            RUNNER,
+            "--sizes",
+            "200",
+            "--repeat",
+            "1",
+            "--requests",
+            "20",
+            "--concurrency",
+            "4",
+            "--output",
+            str(output),
+            "--data-dir",
+            str(tmp_path),
+        ],
+        check=True,
+        capture_output=True,
+    )
+
+    meta, benchmarks = load(output)
+    assert meta["sizes"] == [200] and meta["cpu_count"] == os.cpu_count()
+    assert {"created", "python", "platform", "repeat"} <= set(meta)
+    names = {name for name, _ in benchmarks}
+    assert {
+        "load_data",
+        "preprocess_data",
+        "frequency_encoder_fit",
+        "frequency_encoder_transform",
+        "random_forest_fit",
+        "predict_latency_p50",
+        "predict_throughput",
+        "predict_batch_20_throughput",
+    } <= names
+    for (name, rows), result in benchmarks.items():
+        assert rows == 200
+        (metric,) = set(result) - {"name", "rows"}
+        assert metric in ("seconds", "per_second") and result[metric] > 0
+    # Un run comparé à lui-même : aucune régression
+    assert not any(row[3] for row in compare(benchmarks, benchmarks))
@@ -1,7 +1,14 @@
 # tests/test_prepare_data.py
 
+import json
+import numpy as np
 import pandas as pd
-from prepare_data import preprocess_data
+from prepare_data import (
+    FrequencyEncoder,
+    preprocess_data,
+    preprocess_data_streaming,
+    save_data,
+)
 
 
 def test_preprocess_shape():
@@ -22,3 +29,114 @@ def test_target_binary():
 
     assert set(y) == {0, 1}, \
         f"ERREUR: Target non binaire. Valeurs trouvées: {set(y)}"
+
+
+def test_frequency_encoder_matches_dict_lookup():
+    """Test que l'encodage vectorisé reproduit l'ancien dict.get"""
+    X_fit = np.array([["A", "x"], ["B", "x"], ["A", "y"], ["C", "x"]],
+                     dtype=object)
+    X_new = np.array([["A", "y"], ["Z", "x"], ["C", "z"]], dtype=object)
+    encoder = FrequencyEncoder().fit(X_fit)
+
+    expected = np.zeros(X_new.shape)
+    for i, map_i in enumerate(encoder.freq_maps):
+        expected[:, i] = [map_i.get(val, 0) for val in X_new[:, i]]
+
+    assert np.array_equal(encoder.transform(X_new), expected)
+
+
+def test_frequency_encoder_legacy_pickle():
+    """Test qu'un encodeur picklé avec seulement freq_maps reste utilisable"""
+    X = np.array([["A"], ["B"], ["A"]], dtype=object)
+    encoder = FrequencyEncoder().fit(X)
+    state = dict(encoder.__getstate__())
+    for key in ("categories_", "frequencies_"):
+        state.pop(key)
+
+    legacy = FrequencyEncoder.__new__(FrequencyEncoder)
+    legacy.__setstate__(state)
+
+    assert np.array_equal(legacy.transform(X), encoder.transform(X))
+
+
+def test_frequency_encoder_legacy_mixed_keys():
+    """Test qu'un ancien encodeur dont les clés mélangent chaînes et NaN
+    se recharge (tables dans l'ordre d'insertion, sans tri)"""
+    legacy = FrequencyEncoder.__new__(FrequencyEncoder)
+    legacy.__setstate__({"freq_maps": [{"B": 0.5, np.nan: 0.3, "A": 0.2}]})
+
+    X = np.array([["A"], ["B"], ["Z"]], dtype=object)
+    assert np.array_equal(legacy.transform(X)[:, 0], [0.2, 0.5, 0])
+
+
+def test_streaming_matches_in_memory(tmp_path):
+    """Test que le mode flux reproduit le prétraitement en mémoire"""
+    rng = np.random.default_rng(0)
+    n = 500
+    crash_date = pd.Timestamp("2024-01-01") + pd.to_timedelta(
+        rng.integers(0, 10**7, n), unit="s"
+    )
+    notified = crash_date + pd.to_timedelta(rng.integers(0, 600, n), "min")
+
+    def categories(values):
+        col = rng.choice(values, n).astype(object)
+        col[rng.random(n) < 0.05] = np.nan
+        return col
+
+    df = pd.DataFrame(
+        {
+            "CRASH_DATE": crash_date.strftime("%m/%d/%Y %I:%M:%S %p"),
+            "DATE_POLICE_NOTIFIED": notified.strftime("%m/%d/%Y %I:%M:%S %p"),
+            "POSTED_SPEED_LIMIT": rng.choice([20, 30, 35, 45], n),
+            "WEATHER_CONDITION": categories(["CLEAR", "RAIN", "SNOW"]),
+            "LIGHTING_CONDITION": categories(["DAYLIGHT", "DARKNESS"]),
+            "FIRST_CRASH_TYPE": categories(["REAR END", "ANGLE", "TURNING"]),
+            "TRAFFICWAY_TYPE": categories(["ONE-WAY", "NOT DIVIDED"]),
+            "ROADWAY_SURFACE_COND": categories(["DRY", "WET"]),
+            "PRIM_CONTRIBUTORY_CAUSE": categories(["UNABLE TO DETERMINE"]),
+            "CRASH_HOUR": crash_date.hour,
+            "CRASH_TYPE": rng.choice(
+                ["NO INJURY / DRIVE AWAY", "INJURY AND / OR TOW DUE TO CRASH"],
+                n,
+            ),
+        }
+    )
+    df.to_csv(tmp_path / "crashes.csv", index=False)
+
+    X, y, _ = preprocess_data(pd.read_csv(tmp_path / "crashes.csv"))
+    n_rows, _ = preprocess_data_streaming(
+        tmp_path / "crashes.csv", tmp_path / "out", chunksize=120
+    )
+
+    X_stream = pd.read_parquet(tmp_path / "out" / "X.parquet").to_numpy()
+    y_stream = pd.read_parquet(tmp_path / "out" / "y.parquet")["target"]
+    assert n_rows == len(y)
+    assert np.allclose(X_stream, X)
+    assert (y_stream.to_numpy() == y.to_numpy()).all()
+
+
+def test_save_data_parquet_roundtrip(tmp_path):
+    """Test que l'artefact Parquet float32 se relit sans perte"""
+    X = np.random.default_rng(0).normal(size=(50, 4))
+    y = pd.Series(np.arange(50) % 2, name="target")
+    save_data(X, y, None, output_dir=tmp_path)
+
+    X_read = pd.read_parquet(tmp_path / "X.parquet")
+    y_read = pd.read_parquet(tmp_path / "y.parquet")["target"]
+    assert (X_read.dtypes == "float32").all()
+    assert np.array_equal(X_read.to_numpy(), X.astype("float32"))
+    assert (y_read.to_numpy() == y.to_numpy()).all()
+
+
+def test_save_data_npy_mmap(tmp_path):
+    """Test que l'artefact .npy s'ouvre en mmap avec son fichier annexe"""
+    X = np.random.default_rng(0).normal(size=(50, 4))
+    y = pd.Series(np.arange(50) % 2, name="target")
+    save_data(X, y, None, output_dir=tmp_path, fmt="npy")
+
+    X_read = np.load(tmp_path / "X.npy", mmap_mode="r")
+    metadata = json.loads((tmp_path / "X.json").read_text())
+    assert isinstance(X_read, np.memmap)
+    assert metadata["shape"] == [50, 4]
+    assert np.array_equal(X_read, X.astype("float32"))
+    assert np.array_equal(np.load(tmp_path / "y.npy")[:, 0], y.to_numpy())
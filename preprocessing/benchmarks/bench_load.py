@@ -0,0 +1,89 @@
+# benchmarks/bench_load.py
+# Chargement + prétraitement : lecture complète (ancien load_data) contre
+# lecture des seules colonnes utiles à types imposés (moteurs C et pyarrow).
+# Chaque variante tourne dans son propre processus (pic RSS non pollué).
+#
+#   python preprocessing/benchmarks/bench_load.py --rows 1000000
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+VARIANTS = ("complet", "c", "pyarrow")
+
+
+def run_variant(path, variant):
+    import pandas as pd
+
+    from crash_preprocessing import load_data, preprocess_data
+    from crash_preprocessing.features import normalize_columns
+
+    start = time.perf_counter()
+    if variant == "complet":
+        df = normalize_columns(pd.read_csv(path))
+    else:
+        df = load_data(path, engine=None if variant == "c" else variant)
+    loaded = time.perf_counter()
+    preprocess_data(df)
+    done = time.perf_counter()
+    return {
+        "variant": variant,
+        "rows": len(df),
+        "load_s": round(loaded - start, 3),
+        "preprocess_s": round(done - loaded, 3),
+        "frame_mb": round(df.memory_usage(deep=True).sum() / 2**20, 1),
+        # ru_maxrss en kio sous Linux
+        "peak_rss_mb": round(
+            resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1
+        ),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=500_000)
+    parser.add_argument("--csv", help="CSV existant (sinon données générées)")
+    parser.add_argument("--variant", choices=VARIANTS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.variant:
+        print(json.dumps(run_variant(args.csv, args.variant)))
+        return
+
+    path = args.csv
+    if path is None:
+        from crash_preprocessing.synthetic import write_crashes_csv
+
+        path = os.path.join(tempfile.gettempdir(), f"crashes-{args.rows}.csv")
+        if not os.path.exists(path):
+            print(f"⏳ Génération de {args.rows} lignes synthétiques...")
+            write_crashes_csv(path, args.rows)
+
+    results = []
+    for variant in VARIANTS:
+        out = subprocess.run(
+            [sys.executable, __file__, "--csv", path, "--variant", variant],
+            check=True,
+            capture_output=True,
+            text=True,
+            # ru_maxrss sur toute la variante : pas de remise à zéro du pic
+            # par les spans de load_data et preprocess_data
+            env={**os.environ, "TRACE_RESET_PEAK": "0"},
+        ).stdout
+        results.append(json.loads(out.splitlines()[-1]))
+
+    print(f"{'variante':<10}{'lecture':>10}{'prétrait.':>11}{'pic RSS':>10}")
+    for r in results:
+        print(
+            f"{r['variant']:<10}{r['load_s']:>9}s{r['preprocess_s']:>10}s"
+            f"{r['peak_rss_mb']:>7} Mo"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+"""Prétraitement des données d'accidents de Chicago : implémentation unique,
+décrite par FEATURE_SPEC, partagée par l'entraînement, l'orchestration et
+l'API.
+
+La spécification s'importe sans dépendance ; le reste (pandas, sklearn,
+pyarrow) n'est importé qu'au premier accès."""
+
+import importlib
+
+from .spec import CSV_DATE_FORMAT, FEATURE_SPEC, FeatureSpec
+
+_LAZY = {
+    "FrequencyEncoder": "encoders",
+    "normalize_columns": "features",
+    "load_data": "features",
+    "load_data_chunks": "features",
+    "parse_dates": "features",
+    "prepare_features": "features",
+    "build_preprocessor": "features",
+    "build_native_preprocessor": "features",
+    "preprocess_data": "features",
+    "ARTIFACT_FORMATS": "artifacts",
+    "to_frame": "artifacts",
+    "save_data": "artifacts",
+    "init_counts": "streaming",
+    "update_counts": "streaming",
+    "fit_preprocessor_streaming": "streaming",
+    "preprocessor_from_counts": "streaming",
+    "preprocess_data_streaming": "streaming",
+}
+
+__all__ = ["CSV_DATE_FORMAT", "FEATURE_SPEC", "FeatureSpec", *_LAZY]
+
+
+def __getattr__(name):
+    if name not in _LAZY:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    module = importlib.import_module(f".{_LAZY[name]}", __name__)
+    return getattr(module, name)
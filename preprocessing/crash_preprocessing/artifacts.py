@@ -0,0 +1,117 @@
+# crash_preprocessing/artifacts.py
+
+import json
+import os
+
+import joblib
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from .tracing import span
+
+ARTIFACT_FORMATS = ("parquet", "npy", "csv")
+
+
+def to_frame(X, dtype):
+    X = pd.DataFrame(np.asarray(X, dtype=dtype))
+    X.columns = X.columns.astype(str)
+    return X
+
+
+def check_format(fmt):
+    if fmt not in ARTIFACT_FORMATS:
+        raise ValueError(
+            f"Format inconnu : {fmt} (attendu : {ARTIFACT_FORMATS})"
+        )
+
+
+def append_frame(df, path, fmt, writers, compression, n_rows=None):
+    """Écrit `df` à la suite du fichier `path` (CSV, Parquet ou .npy ;
+    `n_rows` fixe la taille totale de la matrice .npy)"""
+    if fmt == "csv":
+        df.to_csv(
+            path,
+            index=False,
+            header=path not in writers,
+            mode="a" if path in writers else "w",
+        )
+        writers[path] = None
+    elif fmt == "npy":
+        if path not in writers:
+            array = np.lib.format.open_memmap(
+                path,
+                mode="w+",
+                dtype=df.dtypes.iloc[0],
+                shape=(n_rows, df.shape[1]),
+            )
+            writers[path] = [array, 0]
+        array, start = writers[path]
+        end = start + len(df)
+        array[start:end] = df.to_numpy()
+        writers[path][1] = end
+    else:
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        if path not in writers:
+            writers[path] = pq.ParquetWriter(
+                path, table.schema, compression=compression
+            )
+        writers[path].write_table(table)
+
+
+def close_writers(writers):
+    for writer in writers.values():
+        if isinstance(writer, list):
+            writer[0].flush()
+        elif writer is not None:
+            writer.close()
+
+
+def write_metadata(path, X_frame, n_rows):
+    # Fichier annexe décrivant la matrice .npy (ouverte ensuite en mmap)
+    metadata = {
+        "format": "npy",
+        "shape": [n_rows, X_frame.shape[1]],
+        "dtype": str(X_frame.dtypes.iloc[0]),
+        "columns": list(X_frame.columns),
+    }
+    with open(path, "w") as f:
+        json.dump(metadata, f, indent=2)
+
+
+def save_data(
+    X,
+    y,
+    preprocessor,
+    output_dir="processed",
+    fmt="parquet",
+    dtype="float32",
+    compression="snappy",
+    names=("X", "y"),
+):
+    """Sauvegarde le préprocesseur et X/y, par défaut en Parquet (colonnes
+    binaires float32 compressées) ; `fmt='npy'` écrit une matrice brute à
+    ouvrir avec np.load(mmap_mode='r') ; `fmt='csv'` sert d'export de
+    débogage. `names` : noms des fichiers X et y (sans extension)."""
+    check_format(fmt)
+    os.makedirs(output_dir, exist_ok=True)
+
+    with span("save_data", rows=len(X), fmt=fmt):
+        # Sauvegarde en .joblib
+        joblib.dump(preprocessor, f"{output_dir}/preprocessor.joblib")
+
+        x_name, y_name = names
+        X_frame = to_frame(X, dtype)
+        y_frame = pd.DataFrame({"target": np.asarray(y)})
+        writers = {}
+        for frame, name in ((X_frame, x_name), (y_frame, y_name)):
+            path = f"{output_dir}/{name}.{fmt}"
+            append_frame(frame, path, fmt, writers, compression, len(X_frame))
+        close_writers(writers)
+        if fmt == "npy":
+            write_metadata(
+                f"{output_dir}/{x_name}.json", X_frame, len(X_frame)
+            )
+
+    print("💾 Données et préprocesseur sauvegardés.")
@@ -0,0 +1,49 @@
+# crash_preprocessing/encoders.py
+
+import numpy as np
+import pandas as pd
+from sklearn.base import BaseEstimator, TransformerMixin
+
+
+class FrequencyEncoder(BaseEstimator, TransformerMixin):
+    def __init__(self):
+        self.freq_maps = []
+
+    def fit(self, X, y=None):
+        self.freq_maps = []
+        self.categories_ = []
+        self.frequencies_ = []
+        for i in range(X.shape[1]):
+            values, counts = np.unique(X[:, i], return_counts=True)
+            freqs = counts / counts.sum()
+            self.categories_.append(values)
+            self.frequencies_.append(freqs)
+            self.freq_maps.append(dict(zip(values, freqs)))
+        return self
+
+    def transform(self, X):
+        # Recherche vectorisée dans les tables (valeur inconnue -> 0)
+        X_encoded = np.zeros(X.shape, dtype=float)
+        for i in range(X.shape[1]):
+            idx = pd.Index(self.categories_[i]).get_indexer(X[:, i])
+            found = idx >= 0
+            X_encoded[found, i] = self.frequencies_[i][idx[found]]
+        return X_encoded
+
+    def _build_lookup_tables(self):
+        self.categories_ = []
+        self.frequencies_ = []
+        for map_i in self.freq_maps:
+            # Ordre d'insertion : get_indexer n'a pas besoin de clés triées
+            # (et un tri échoue sur des clés de types mélangés, str et NaN)
+            values = list(map_i)
+            self.categories_.append(np.array(values, dtype=object))
+            self.frequencies_.append(
+                np.array([map_i[v] for v in values], dtype=float)
+            )
+
+    def __setstate__(self, state):
+        # Les anciens préprocesseurs picklés ne contiennent que freq_maps
+        super().__setstate__(state)
+        if "categories_" not in self.__dict__:
+            self._build_lookup_tables()
@@ -0,0 +1,207 @@
+# crash_preprocessing/features.py
+
+import os
+
+import numpy as np
+import pandas as pd
+from sklearn.compose import ColumnTransformer
+from sklearn.impute import SimpleImputer
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import OneHotEncoder, OrdinalEncoder, StandardScaler
+
+from .encoders import FrequencyEncoder
+from .spec import CSV_DATE_FORMAT, FEATURE_SPEC
+from .tracing import span
+
+
+# 1. Chargement
+def normalize_columns(df, spec=FEATURE_SPEC):
+    """Noms de colonnes dans la casse de la spécification (en place)"""
+    df.columns = [spec.normalize(col) for col in df.columns]
+    return df
+
+
+def read_options(path, spec=FEATURE_SPEC, extra=(), categories=True):
+    """Arguments de pd.read_csv pour ne lire que les colonnes de la
+    spécification (+ `extra`), avec des types imposés. Les noms sont pris
+    dans l'en-tête du fichier, quelle que soit leur casse (le moteur pyarrow
+    n'accepte pas de usecols appelable)."""
+    dtypes = spec.raw_dtypes(categories)
+    dtypes.update(dict.fromkeys(map(spec.normalize, extra), "object"))
+    header = pd.read_csv(path, nrows=0).columns
+    usecols = [col for col in header if spec.normalize(col) in dtypes]
+    return {
+        "usecols": usecols,
+        "dtype": {col: dtypes[spec.normalize(col)] for col in usecols},
+    }
+
+
+def load_data(path, spec=FEATURE_SPEC, engine=None, extra=()):
+    """Colonnes utiles seulement, types imposés (modalités en catégories) ;
+    `engine="pyarrow"` pour une lecture multi-thread"""
+    with span("load_data", path=str(path)) as s:
+        options = read_options(path, spec, extra)
+        df = pd.read_csv(path, engine=engine, **options)
+        s.rows = len(df)
+    return normalize_columns(df, spec)
+
+
+def load_data_chunks(paths, chunksize=100_000, spec=FEATURE_SPEC, extra=()):
+    """Lit un ou plusieurs CSV par blocs de `chunksize` lignes. Modalités en
+    chaînes : des catégories propres à chaque bloc ne se cumulent pas."""
+    if isinstance(paths, (str, os.PathLike)):
+        paths = [paths]
+    for path in paths:
+        options = read_options(path, spec, extra, categories=False)
+        for chunk in pd.read_csv(path, chunksize=chunksize, **options):
+            yield normalize_columns(chunk, spec)
+
+
+# 2. Dates
+# Gabarit de CSV_DATE_FORMAT : MM/DD/YYYY HH:MM:SS AM (22 octets)
+_SEPARATORS = {2: "/", 5: "/", 10: " ", 13: ":", 16: ":", 19: " ", 21: "M"}
+_FIELDS = {
+    "month": (0, 2),
+    "day": (3, 5),
+    "year": (6, 10),
+    "hour": (11, 13),
+    "minute": (14, 16),
+    "second": (17, 19),
+}
+
+
+def _decode_csv_dates(values):
+    """Dates au format CSV du portail décodées par arithmétique sur les
+    octets (strptime coûte ~7 µs par valeur avec %I/%p) ; NaT pour toute
+    valeur hors gabarit ou invalide"""
+    try:
+        raw = np.asarray(values, dtype="S23")
+    except UnicodeEncodeError:
+        return pd.Series(pd.NaT, index=values.index, dtype="datetime64[ns]")
+    # Vue sur les octets (sans copie) ; conversion en entiers champ par champ
+    b = raw.view(np.uint8).reshape(len(raw), 23)
+    ok = b[:, 22] == 0
+    for i, sep in _SEPARATORS.items():
+        ok &= b[:, i] == ord(sep)
+    ok &= (b[:, 20] == ord("A")) | (b[:, 20] == ord("P"))
+    fields = {}
+    for name, (start, stop) in _FIELDS.items():
+        digits = b[:, start:stop].astype(np.int64) - ord("0")
+        ok &= ((digits >= 0) & (digits <= 9)).all(axis=1)
+        fields[name] = digits @ 10 ** np.arange(stop - start - 1, -1, -1)
+    ok &= (fields["month"] >= 1) & (fields["month"] <= 12)
+    ok &= (fields["hour"] >= 1) & (fields["hour"] <= 12)
+    ok &= (fields["minute"] < 60) & (fields["second"] < 60)
+    ok &= (fields["day"] >= 1) & (fields["day"] <= 31)
+
+    months = np.where(
+        ok, (fields["year"] - 1970) * 12 + fields["month"] - 1, 0
+    )
+    months = months.astype("datetime64[M]")
+    days = months.astype("datetime64[D]") + np.where(ok, fields["day"] - 1, 0)
+    # 31/04 etc. : le jour déborde sur le mois suivant
+    ok &= days.astype("datetime64[M]") == months
+    hour = fields["hour"] % 12 + 12 * (b[:, 20] == ord("P"))
+    seconds = (hour * 60 + fields["minute"]) * 60 + fields["second"]
+    dates = days.astype("datetime64[ns]") + seconds.astype("timedelta64[s]")
+    dates[~ok] = np.datetime64("NaT")
+    return pd.Series(dates, index=values.index)
+
+
+def parse_dates(values, date_format=FEATURE_SPEC.date_format):
+    """Format explicite (export CSV), sinon ISO 8601 (API du portail) :
+    jamais d'inférence valeur par valeur"""
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values
+    if date_format == CSV_DATE_FORMAT:
+        dates = _decode_csv_dates(values)
+    else:
+        dates = pd.to_datetime(values, format=date_format, errors="coerce")
+    for fmt in ("ISO8601", date_format):
+        pending = dates.isna() & values.notna()
+        if not pending.any():
+            break
+        dates[pending] = pd.to_datetime(
+            values[pending], format=fmt, errors="coerce"
+        )
+    return dates
+
+
+# 3. Features
+def prepare_features(df, spec=FEATURE_SPEC):
+    """(X, y) à partir des données brutes, quelle que soit la casse des
+    colonnes ; `df` n'est pas modifié"""
+    columns = {col: spec.normalize(col) for col in df.columns}
+    raw = df[[col for col in df.columns if columns[col] in spec.raw_columns]]
+    raw = raw.set_axis([columns[col] for col in raw.columns], axis=1)
+
+    start, end = (
+        parse_dates(raw[col], spec.date_format) for col in spec.dates
+    )
+    X = raw[[col for col in spec.features if col != spec.delay]].copy()
+    X[spec.delay] = (end - start).dt.total_seconds() / 60
+    # Cible : comparaison vectorisée
+    y = (raw[spec.target] == spec.positive_class).astype(int).rename("target")
+    return X, y
+
+
+# 4. Préprocesseurs
+def build_preprocessor(spec=FEATURE_SPEC):
+    cat_ohe_pipeline = Pipeline(
+        steps=[
+            ("imputer", SimpleImputer(strategy="most_frequent")),
+            (
+                "ohe",
+                OneHotEncoder(handle_unknown="ignore", sparse_output=False),
+            ),
+        ]
+    )
+    cat_freq_pipeline = Pipeline(
+        steps=[
+            ("imputer", SimpleImputer(strategy="most_frequent")),
+            ("freq", FrequencyEncoder()),
+        ]
+    )
+    num_pipeline = Pipeline(
+        steps=[
+            ("imputer", SimpleImputer(strategy="median")),
+            ("scaler", StandardScaler()),
+        ]
+    )
+    return ColumnTransformer(
+        transformers=[
+            ("cat_ohe", cat_ohe_pipeline, list(spec.onehot)),
+            ("cat_freq", cat_freq_pipeline, list(spec.frequency)),
+            ("num", num_pipeline, list(spec.numeric)),
+        ]
+    )
+
+
+def build_native_preprocessor(spec=FEATURE_SPEC):
+    """Variante pour les modèles à catégories natives (HistGradientBoosting) :
+    catégories en codes ordinaux (inconnue ou manquante -> NaN), ni one-hot
+    ni encodage par fréquence ; colonnes catégorielles en premier"""
+    encoder = OrdinalEncoder(
+        handle_unknown="use_encoded_value",
+        unknown_value=np.nan,
+        encoded_missing_value=np.nan,
+    )
+    return ColumnTransformer(
+        transformers=[
+            ("cat", encoder, list(spec.categorical)),
+            ("num", "passthrough", list(spec.numeric)),
+        ]
+    )
+
+
+def preprocess_data(df, spec=FEATURE_SPEC):
+    with span("preprocess_data", rows=len(df)):
+        # Dates et cible, puis encodage : mesurés séparément
+        with span("prepare_features"):
+            X, y = prepare_features(df, spec)
+        preprocessor = build_preprocessor(spec)
+        with span("fit_transform"):
+            X_transformed = preprocessor.fit_transform(X)
+
+    print(f"✅ Données transformées : {X_transformed.shape}")
+    return X_transformed, y, preprocessor
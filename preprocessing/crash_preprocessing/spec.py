@@ -0,0 +1,76 @@
+# crash_preprocessing/spec.py
+
+from dataclasses import dataclass
+
+# Format des dates de l'export CSV du portail (ex. 09/05/2023 02:45:00 PM)
+CSV_DATE_FORMAT = "%m/%d/%Y %I:%M:%S %p"
+
+
+@dataclass(frozen=True)
+class FeatureSpec:
+    """Description déclarative des features : colonnes brutes, encodeur de
+    chaque colonne, cible et dates. Sans dépendance (importable par l'API
+    sans pandas ni sklearn)."""
+
+    onehot: tuple
+    frequency: tuple
+    numeric: tuple
+    target: str
+    positive_class: str
+    # (accident, notification police) : le délai est une feature dérivée
+    dates: tuple
+    delay: str
+    date_format: str = CSV_DATE_FORMAT
+    # Casse des noms de colonnes après lecture (« lower » ou « upper ») :
+    # l'historique CSV est en majuscules, l'API du portail en minuscules
+    case: str = "lower"
+
+    @property
+    def categorical(self):
+        return self.onehot + self.frequency
+
+    @property
+    def features(self):
+        return self.categorical + self.numeric
+
+    @property
+    def raw_numeric(self):
+        return tuple(col for col in self.numeric if col != self.delay)
+
+    @property
+    def raw_columns(self):
+        """Colonnes à lire dans les données brutes"""
+        return (
+            self.dates + self.raw_numeric + self.categorical + (self.target,)
+        )
+
+    def raw_dtypes(self, categories=True):
+        """Types imposés à la lecture des colonnes brutes (aucune inférence) :
+        flottants pour les numériques (valeurs manquantes possibles),
+        catégories pour les modalités et la cible (ou chaînes, pour une
+        lecture par blocs), chaînes pour les dates (décodées ensuite)"""
+        text = "category" if categories else "object"
+        return {
+            **dict.fromkeys(self.dates, "object"),
+            **dict.fromkeys(self.raw_numeric, "float64"),
+            **dict.fromkeys(self.categorical + (self.target,), text),
+        }
+
+    def normalize(self, name):
+        return name.lower() if self.case == "lower" else name.upper()
+
+
+FEATURE_SPEC = FeatureSpec(
+    onehot=("weather_condition", "lighting_condition"),
+    frequency=(
+        "first_crash_type",
+        "trafficway_type",
+        "roadway_surface_cond",
+        "prim_contributory_cause",
+    ),
+    numeric=("posted_speed_limit", "crash_hour", "delay_police_minutes"),
+    target="crash_type",
+    positive_class="INJURY AND / OR TOW DUE TO CRASH",
+    dates=("crash_date", "date_police_notified"),
+    delay="delay_police_minutes",
+)
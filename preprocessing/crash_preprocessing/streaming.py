@@ -0,0 +1,276 @@
+# crash_preprocessing/streaming.py
+# Prétraitement en flux (jeux de données plus grands que la RAM)
+
+import os
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from .artifacts import (
+    append_frame,
+    check_format,
+    close_writers,
+    to_frame,
+    write_metadata,
+)
+from .features import build_preprocessor, load_data_chunks, prepare_features
+from .spec import FEATURE_SPEC
+from .tracing import span
+
+# Nombre maximal d'intervalles de l'histogramme d'une colonne numérique
+MEDIAN_BINS = 4096
+
+
+def _most_frequent(counts):
+    # Même règle que SimpleImputer : la plus petite valeur parmi les ex aequo
+    return min(counts.index[counts == counts.max()])
+
+
+def _median(counts):
+    counts = counts.sort_index()
+    cumulative = counts.to_numpy().cumsum()
+    n = cumulative[-1]
+    low = counts.index[np.searchsorted(cumulative, (n - 1) // 2, side="right")]
+    high = counts.index[np.searchsorted(cumulative, n // 2, side="right")]
+    return (low + high) / 2
+
+
+def _bin(values, width):
+    # Centre de l'intervalle de largeur `width` ; les intervalles de largeur
+    # 2 * width regroupent exactement deux intervalles de largeur `width`
+    return (np.floor(values / width) + 0.5) * width
+
+
+def _update_histogram(hist, counts):
+    """Ajoute des comptages par valeur : exacts tant qu'il y a au plus
+    MEDIAN_BINS valeurs distinctes (médiane exacte), puis par intervalles dont
+    la largeur double jusqu'à repasser sous le seuil (médiane à une
+    demi-largeur près)"""
+    if hist["width"]:
+        counts = counts.groupby(_bin(counts.index, hist["width"])).sum()
+    counts = hist["counts"].add(counts, fill_value=0)
+    while len(counts) > MEDIAN_BINS:
+        if hist["width"]:
+            hist["width"] *= 2
+        else:
+            hist["width"] = (
+                counts.index.max() - counts.index.min()
+            ) / MEDIAN_BINS
+        counts = counts.groupby(_bin(counts.index, hist["width"])).sum()
+    hist["counts"] = counts.astype("int64")
+
+
+def _merge_moments(a, b):
+    """Combine deux triplets (effectif, moyenne, somme des carrés des écarts)
+    (formule de Chan et al., stable contrairement à la somme des carrés)"""
+    n_a, mean_a, m2_a = a
+    n_b, mean_b, m2_b = b
+    n = n_a + n_b
+    if n == 0:
+        return a
+    delta = mean_b - mean_a
+    mean = mean_a + delta * n_b / n
+    return n, mean, m2_a + m2_b + delta**2 * n_a * n_b / n
+
+
+def _moments(values):
+    if len(values) == 0:
+        return 0, 0.0, 0.0
+    mean = float(values.mean())
+    return len(values), mean, float(((values - mean) ** 2).sum())
+
+
+def init_counts(spec=FEATURE_SPEC):
+    """Statistiques d'ajustement vides, de taille bornée : comptages exacts
+    par modalité des colonnes catégorielles, moments et histogramme (pour
+    la médiane) des colonnes numériques, valeurs manquantes, lignes"""
+    counts = {col: pd.Series(dtype="int64") for col in spec.categorical}
+    moments = {col: (0, 0.0, 0.0) for col in spec.numeric}
+    histograms = {
+        col: {"counts": pd.Series(dtype="int64"), "width": 0.0}
+        for col in spec.numeric
+    }
+    n_missing = dict.fromkeys(spec.features, 0)
+    return {
+        "counts": counts,
+        "moments": moments,
+        "histograms": histograms,
+        "n_missing": n_missing,
+        "n_rows": 0,
+    }
+
+
+def _upgrade_counts(stats, spec=FEATURE_SPEC):
+    # Statistiques d'une version antérieure (comptages par valeur de toutes
+    # les colonnes) : converties en moments et histogrammes
+    if "moments" in stats:
+        return stats
+    stats["moments"], stats["histograms"] = {}, {}
+    for col in spec.numeric:
+        counts = stats["counts"].pop(col)
+        values = counts.index.to_numpy(dtype=float)
+        weights = counts.to_numpy()
+        n = int(weights.sum())
+        mean = float(np.average(values, weights=weights)) if n else 0.0
+        m2 = float((weights * (values - mean) ** 2).sum())
+        stats["moments"][col] = (n, mean, m2)
+        stats["histograms"][col] = {"counts": counts, "width": 0.0}
+    return stats
+
+
+def update_counts(stats, X, spec=FEATURE_SPEC):
+    """Ajoute les lignes de X (sortie de prepare_features) aux statistiques"""
+    _upgrade_counts(stats, spec)
+    stats["n_rows"] += len(X)
+    for col in spec.categorical:
+        stats["counts"][col] = (
+            stats["counts"][col]
+            .add(X[col].value_counts(), fill_value=0)
+            .astype("int64")
+        )
+        stats["n_missing"][col] += int(X[col].isna().sum())
+    for col in spec.numeric:
+        values = X[col].astype(float).dropna()
+        stats["moments"][col] = _merge_moments(
+            stats["moments"][col], _moments(values)
+        )
+        _update_histogram(stats["histograms"][col], values.value_counts())
+        stats["n_missing"][col] += len(X) - len(values)
+    return stats
+
+
+def fit_preprocessor_streaming(paths, chunksize=100_000, spec=FEATURE_SPEC):
+    """1er passage : accumule les statistiques de chaque colonne (taille
+    bornée), puis en déduit modes, médianes, catégories, fréquences et
+    moyenne/variance."""
+    stats = init_counts(spec)
+    for chunk in load_data_chunks(paths, chunksize, spec):
+        X, _ = prepare_features(chunk, spec)
+        update_counts(stats, X, spec)
+    return preprocessor_from_counts(stats, spec), stats["n_rows"]
+
+
+def preprocessor_from_counts(stats, spec=FEATURE_SPEC):
+    """Préprocesseur identique à build_preprocessor().fit sur toutes les
+    lignes comptées dans `stats` (médiane approchée seulement au-delà de
+    MEDIAN_BINS valeurs numériques distinctes)"""
+    stats = _upgrade_counts(stats, spec)
+    n_rows, n_missing = stats["n_rows"], stats["n_missing"]
+
+    # Valeurs d'imputation, puis comptages (ou histogrammes) après imputation
+    counts, fill_values = {}, {}
+    for col in spec.features:
+        if col in spec.numeric:
+            counts[col] = stats["histograms"][col]["counts"].astype("int64")
+            fill_values[col] = _median(counts[col])
+        else:
+            counts[col] = stats["counts"][col].astype("int64")
+            fill_values[col] = _most_frequent(counts[col])
+        if n_missing[col]:
+            counts[col] = (
+                counts[col]
+                .add(
+                    pd.Series({fill_values[col]: n_missing[col]}), fill_value=0
+                )
+                .astype("int64")
+            )
+
+    # Ajustement sur un échantillon réduit contenant chaque valeur distincte,
+    # pour obtenir la structure du ColumnTransformer et les catégories du
+    # OneHotEncoder ; les statistiques sont ensuite remplacées par les exactes.
+    length = max(len(counts[col]) for col in spec.features)
+    support = pd.DataFrame(
+        {
+            col: np.resize(counts[col].index.to_numpy(), length)
+            for col in spec.features
+        }
+    )
+    preprocessor = build_preprocessor(spec).fit(support)
+
+    cat_ohe = preprocessor.named_transformers_["cat_ohe"]
+    cat_ohe.named_steps["imputer"].statistics_ = np.array(
+        [fill_values[col] for col in spec.onehot], dtype=object
+    )
+
+    cat_freq = preprocessor.named_transformers_["cat_freq"]
+    cat_freq.named_steps["imputer"].statistics_ = np.array(
+        [fill_values[col] for col in spec.frequency], dtype=object
+    )
+    encoder = cat_freq.named_steps["freq"]
+    encoder.freq_maps, encoder.categories_, encoder.frequencies_ = [], [], []
+    for col in spec.frequency:
+        col_counts = counts[col].sort_index()
+        values = col_counts.index.to_numpy(dtype=object)
+        freqs = col_counts.to_numpy() / col_counts.to_numpy().sum()
+        encoder.categories_.append(values)
+        encoder.frequencies_.append(freqs)
+        encoder.freq_maps.append(dict(zip(values, freqs)))
+
+    num = preprocessor.named_transformers_["num"]
+    num.named_steps["imputer"].statistics_ = np.array(
+        [fill_values[col] for col in spec.numeric], dtype=float
+    )
+    scaler = num.named_steps["scaler"]
+    means, variances = [], []
+    for col in spec.numeric:
+        # Valeurs imputées : n_missing fois la médiane, d'écart nul
+        imputed = (n_missing[col], float(fill_values[col]), 0.0)
+        n, mean, m2 = _merge_moments(stats["moments"][col], imputed)
+        means.append(mean)
+        variances.append(m2 / n)
+    scaler.mean_ = np.array(means)
+    scaler.var_ = np.array(variances)
+    scale = np.sqrt(scaler.var_)
+    scaler.scale_ = np.where(scale < 10 * np.finfo(float).eps, 1.0, scale)
+    scaler.n_samples_seen_ = n_rows
+
+    return preprocessor
+
+
+def preprocess_data_streaming(
+    paths,
+    output_dir="processed",
+    chunksize=100_000,
+    fmt="parquet",
+    dtype="float32",
+    compression="snappy",
+    names=("X", "y"),
+    spec=FEATURE_SPEC,
+):
+    """Variante à mémoire bornée de preprocess_data + save_data.
+    2e passage : transforme et écrit X/y bloc par bloc."""
+    check_format(fmt)
+    with span("preprocess_data_streaming", fmt=fmt) as s:
+        with span("fit"):
+            preprocessor, n_rows = fit_preprocessor_streaming(
+                paths, chunksize, spec
+            )
+        s.rows = n_rows
+
+        os.makedirs(output_dir, exist_ok=True)
+        joblib.dump(preprocessor, f"{output_dir}/preprocessor.joblib")
+
+        x_path, y_path = (f"{output_dir}/{name}.{fmt}" for name in names)
+        categorical = list(spec.categorical)
+        writers = {}
+        with span("transform", rows=n_rows):
+            try:
+                for chunk in load_data_chunks(paths, chunksize, spec):
+                    X, y = prepare_features(chunk, spec)
+                    X[categorical] = X[categorical].astype(object)
+                    X_frame = to_frame(preprocessor.transform(X), dtype)
+                    append_frame(
+                        X_frame, x_path, fmt, writers, compression, n_rows
+                    )
+                    append_frame(
+                        y.to_frame(), y_path, fmt, writers, compression, n_rows
+                    )
+            finally:
+                close_writers(writers)
+        if fmt == "npy":
+            write_metadata(f"{output_dir}/{names[0]}.json", X_frame, n_rows)
+
+    print(f"✅ Données transformées en flux : {n_rows} lignes")
+    print("💾 Données et préprocesseur sauvegardés.")
+    return n_rows, preprocessor
@@ -0,0 +1,218 @@
+# crash_preprocessing/synthetic.py
+# Données d'accidents synthétiques au schéma de l'export du portail (48
+# colonnes), pour les benchmarks et les tests sans réseau
+
+import os
+
+import numpy as np
+import pandas as pd
+
+from .spec import CSV_DATE_FORMAT, FEATURE_SPEC
+
+CATEGORIES = {
+    "weather_condition": [
+        "CLEAR",
+        "RAIN",
+        "CLOUDY/OVERCAST",
+        "SNOW",
+        "UNKNOWN",
+        "FOG/SMOKE/HAZE",
+        "SLEET/HAIL",
+        "FREEZING RAIN/DRIZZLE",
+        "OTHER",
+    ],
+    "lighting_condition": [
+        "DAYLIGHT",
+        "DARKNESS, LIGHTED ROAD",
+        "DARKNESS",
+        "DUSK",
+        "DAWN",
+        "UNKNOWN",
+    ],
+    "first_crash_type": [
+        "PARKED MOTOR VEHICLE",
+        "REAR END",
+        "SIDESWIPE SAME DIRECTION",
+        "TURNING",
+        "ANGLE",
+        "FIXED OBJECT",
+        "PEDESTRIAN",
+        "PEDALCYCLIST",
+        "SIDESWIPE OPPOSITE DIRECTION",
+        "HEAD ON",
+        "OTHER OBJECT",
+        "ANIMAL",
+    ],
+    "trafficway_type": [
+        "NOT DIVIDED",
+        "DIVIDED - W/MEDIAN (NOT RAISED)",
+        "ONE-WAY",
+        "FOUR WAY",
+        "PARKING LOT",
+        "DIVIDED - W/MEDIAN BARRIER",
+        "OTHER",
+        "ALLEY",
+        "T-INTERSECTION",
+        "UNKNOWN",
+    ],
+    "roadway_surface_cond": [
+        "DRY",
+        "WET",
+        "UNKNOWN",
+        "SNOW OR SLUSH",
+        "ICE",
+        "OTHER",
+        "SAND, MUD, DIRT",
+    ],
+    "prim_contributory_cause": [
+        "UNABLE TO DETERMINE",
+        "FAILING TO YIELD RIGHT-OF-WAY",
+        "FOLLOWING TOO CLOSELY",
+        "NOT APPLICABLE",
+        "IMPROPER OVERTAKING/PASSING",
+        "FAILING TO REDUCE SPEED TO AVOID CRASH",
+        "IMPROPER BACKING",
+        "IMPROPER LANE USAGE",
+        "DRIVING SKILLS/KNOWLEDGE/EXPERIENCE",
+        "IMPROPER TURNING/NO SIGNAL",
+        "DISREGARDING TRAFFIC SIGNALS",
+        "WEATHER",
+        "OPERATING VEHICLE IN ERRATIC, RECKLESS, CARELESS, NEGLIGENT OR "
+        "AGGRESSIVE MANNER",
+    ],
+}
+SPEED_LIMITS = [30, 35, 25, 20, 15, 40, 45, 10, 55, 5]
+# Colonnes de l'export non utilisées par le modèle : (nom, valeurs possibles)
+UNUSED_TEXT = {
+    "crash_date_est_i": ["Y", "N", None],
+    "traffic_control_device": [
+        "NO CONTROLS",
+        "TRAFFIC SIGNAL",
+        "STOP SIGN/FLASHER",
+        "UNKNOWN",
+    ],
+    "device_condition": ["NO CONTROLS", "FUNCTIONING PROPERLY", "UNKNOWN"],
+    "alignment": ["STRAIGHT AND LEVEL", "STRAIGHT ON GRADE", "CURVE, LEVEL"],
+    "road_defect": ["NO DEFECTS", "UNKNOWN", "RUT, HOLES", "OTHER"],
+    "report_type": ["NOT ON SCENE (DESK REPORT)", "ON SCENE", None],
+    "intersection_related_i": ["Y", "N", None],
+    "not_right_of_way_i": ["Y", "N", None],
+    "hit_and_run_i": ["Y", "N", None],
+    "damage": ["OVER $1,500", "$501 - $1,500", "$500 OR LESS"],
+    "sec_contributory_cause": [
+        "NOT APPLICABLE",
+        "UNABLE TO DETERMINE",
+        "FOLLOWING TOO CLOSELY",
+    ],
+    "street_direction": ["N", "S", "E", "W"],
+    "street_name": [
+        "WESTERN AVE",
+        "PULASKI RD",
+        "CICERO AVE",
+        "ASHLAND AVE",
+        "HALSTED ST",
+        "KEDZIE AVE",
+    ],
+    "photos_taken_i": ["Y", None],
+    "statements_taken_i": ["Y", None],
+    "dooring_i": ["Y", "N", None],
+    "work_zone_i": ["Y", "N", None],
+    "work_zone_type": ["CONSTRUCTION", "MAINTENANCE", None],
+    "workers_present_i": ["Y", None],
+    "most_severe_injury": [
+        "NO INDICATION OF INJURY",
+        "NONINCAPACITATING INJURY",
+        "REPORTED, NOT EVIDENT",
+    ],
+}
+UNUSED_COUNTS = [
+    "lane_cnt",
+    "street_no",
+    "beat_of_occurrence",
+    "num_units",
+    "injuries_total",
+    "injuries_fatal",
+    "injuries_incapacitating",
+    "injuries_non_incapacitating",
+    "injuries_reported_not_evident",
+    "injuries_no_indication",
+    "injuries_unknown",
+]
+
+
+def _choice(rng, values, n, missing=0.0):
+    # Fréquences décroissantes (loi de Zipf tronquée), comme dans l'export
+    p = 1 / np.arange(1, len(values) + 1)
+    out = np.asarray(values, dtype=object)[
+        rng.choice(len(values), n, p=p / p.sum())
+    ]
+    if missing:
+        out[rng.random(n) < missing] = None
+    return out
+
+
+def make_crashes(n, seed=0, case="upper"):
+    """`n` accidents au schéma du CSV du portail (casse « upper » comme
+    l'historique, « lower » comme l'API) ; la cible dépend des features"""
+    rng = np.random.default_rng(seed)
+    crash_date = pd.Timestamp("2018-01-01") + pd.to_timedelta(
+        rng.integers(0, 7 * 365 * 86400, n), unit="s"
+    )
+    delay = pd.to_timedelta(rng.exponential(60, n).astype(int), unit="min")
+    df = {
+        "crash_record_id": [f"{seed:04x}{i:012x}" for i in range(n)],
+        "crash_date": crash_date.strftime(CSV_DATE_FORMAT),
+        "date_police_notified": (crash_date + delay).strftime(CSV_DATE_FORMAT),
+        "posted_speed_limit": _choice(rng, SPEED_LIMITS, n).astype(int),
+        "crash_hour": crash_date.hour,
+    }
+    for col, values in CATEGORIES.items():
+        df[col] = _choice(rng, values, n, missing=0.01)
+    for col, values in UNUSED_TEXT.items():
+        df[col] = _choice(rng, values, n)
+    for col in UNUSED_COUNTS:
+        df[col] = rng.poisson(2, n)
+    # Jour de la semaine du portail : 1 = dimanche
+    df["crash_day_of_week"] = (crash_date.dayofweek + 1) % 7 + 1
+    df["crash_month"] = crash_date.month
+    df["latitude"] = rng.normal(41.85, 0.08, n).round(9)
+    df["longitude"] = rng.normal(-87.67, 0.06, n).round(9)
+    df["location"] = [
+        f"POINT ({x} {y})" for x, y in zip(df["longitude"], df["latitude"])
+    ]
+
+    # Cible : blessure / remorquage plus probable à vitesse élevée, de nuit,
+    # pour les piétons, cyclistes et collisions frontales
+    severe = np.isin(
+        df["first_crash_type"],
+        ["PEDESTRIAN", "PEDALCYCLIST", "HEAD ON", "ANGLE"],
+    )
+    night = (crash_date.hour < 6) | (crash_date.hour >= 21)
+    logit = (
+        -1.3
+        + 0.04 * (df["posted_speed_limit"] - 30)
+        + 1.5 * severe
+        + 0.4 * night
+    )
+    injury = rng.random(n) < 1 / (1 + np.exp(-logit))
+    df[FEATURE_SPEC.target] = np.where(
+        injury, FEATURE_SPEC.positive_class, "NO INJURY / DRIVE AWAY"
+    )
+
+    df = pd.DataFrame(df)
+    df.columns = df.columns.str.upper() if case == "upper" else df.columns
+    return df
+
+
+def write_crashes_csv(path, n, seed=0, case="upper", chunksize=500_000):
+    """Écrit `n` lignes par blocs (mémoire bornée, même pour 10 M lignes)"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    for start in range(0, n, chunksize):
+        chunk = make_crashes(min(chunksize, n - start), seed + start, case)
+        chunk.to_csv(
+            path,
+            index=False,
+            header=start == 0,
+            mode="w" if start == 0 else "a",
+        )
+    return path
@@ -0,0 +1,256 @@
+# crash_preprocessing/tracing.py
+# Traçage des étapes du pipeline : durée, temps CPU, pic RSS et nombre de
+# lignes par span, transmis aux sinks enregistrés (liste, Prometheus...) puis
+# journalisés dans MLflow. Sans dépendance : importable par l'API.
+
+import contextvars
+import cProfile
+import functools
+import io
+import os
+import pstats
+import resource
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from typing import Optional
+
+# Profilage à la demande : TRACE_PROFILE=<nom du span> (1re occurrence)
+PROFILE_STAGE = os.getenv("TRACE_PROFILE")
+PROFILE_DIR = os.getenv("TRACE_PROFILE_DIR", "profiles")
+
+# Remise à zéro du pic RSS du processus à l'entrée d'un span de 1er niveau
+# (TRACE_RESET_PEAK=0 pour les mesures qui lisent elles-mêmes VmHWM ou
+# ru_maxrss, comme benchmarks/bench_load.py)
+RESET_PEAK = os.getenv("TRACE_RESET_PEAK", "1") != "0"
+
+_current = contextvars.ContextVar("span", default=None)
+_sinks = []
+# Mesure mémoire du span courant, propre à chaque thread/tâche : les tâches
+# Prefect s'exécutent dans des threads de travail
+_memory = contextvars.ContextVar("memory", default=None)
+# Spans mesurant la mémoire ouverts dans tout le processus
+_open_memory_spans = 0
+_memory_lock = threading.Lock()
+_profiled = set()
+
+
+@dataclass
+class Span:
+    name: str
+    path: str
+    wall_s: float = 0.0
+    cpu_s: float = 0.0
+    peak_rss_mb: Optional[float] = None
+    rows: Optional[int] = None
+    attributes: dict = field(default_factory=dict)
+
+    def to_dict(self):
+        return asdict(self)
+
+    def summary(self):
+        parts = [f"CPU {self.cpu_s:.2f} s"]
+        if self.peak_rss_mb is not None:
+            parts.append(f"pic RSS {self.peak_rss_mb:.0f} Mo")
+        if self.rows is not None:
+            parts.append(f"{self.rows} lignes")
+        return f"⏱️ {self.path} : {self.wall_s:.2f} s ({', '.join(parts)})"
+
+
+# 1. Sinks
+def add_sink(sink):
+    """`sink(span)` est appelé à la fin de chaque span"""
+    _sinks.append(sink)
+
+
+def remove_sink(sink):
+    _sinks.remove(sink)
+
+
+@contextmanager
+def recording():
+    """Liste des spans terminés pendant le bloc"""
+    spans = []
+    add_sink(spans.append)
+    try:
+        yield spans
+    finally:
+        remove_sink(spans.append)
+
+
+# 2. Mémoire : pic RSS de chaque span
+def _memory_mb():
+    """(RSS courant, pic RSS) en Mo ; pic depuis le démarrage ou la dernière
+    remise à zéro (VmHWM, Linux)"""
+    try:
+        with open("/proc/self/status") as f:
+            values = {}
+            for line in f:
+                if line.startswith(("VmRSS:", "VmHWM:")):
+                    values[line[:5]] = int(line.split()[1]) / 1024
+            return values["VmRSS"], values["VmHWM"]
+    except (OSError, KeyError):
+        pass
+    # Ailleurs : pic du processus entier (ko sous Linux, octets sous macOS)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    peak = peak / 2**20 if sys.platform == "darwin" else peak / 1024
+    return 0.0, peak
+
+
+def _reset_peak_rss():
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def _enter_memory():
+    # Le pic du processus n'est remis à zéro que pour un span de 1er niveau
+    # quand aucun autre span n'est ouvert (un autre thread pourrait mesurer)
+    global _open_memory_spans
+    parent = _memory.get()
+    with _memory_lock:
+        reset = RESET_PEAK and parent is None and _open_memory_spans == 0
+        if reset:
+            _reset_peak_rss()
+        _open_memory_spans += 1
+    rss, peak = _memory_mb()
+    frame = {
+        "parent": parent,
+        "reset": reset,
+        "rss": rss,
+        "peak": peak,
+        "children": 0.0,
+    }
+    return frame, _memory.set(frame)
+
+
+def _exit_memory(frame, token):
+    """Pic exact si le span a été remis à zéro ou a atteint un nouveau pic
+    du processus ; sinon borne inférieure (RSS à l'entrée et à la sortie,
+    pics des spans enfants)"""
+    global _open_memory_spans
+    _memory.reset(token)
+    rss, peak = _memory_mb()
+    if not frame["reset"] and peak <= frame["peak"]:
+        peak = max(frame["rss"], rss, frame["children"])
+    with _memory_lock:
+        _open_memory_spans -= 1
+        if frame["parent"] is not None:
+            parent = frame["parent"]
+            parent["children"] = max(parent["children"], peak)
+    return peak
+
+
+# 3. Profilage
+def set_profile_stage(name):
+    """Profile (cProfile) la prochaine occurrence du span `name` ; équivaut
+    à TRACE_PROFILE=<name>"""
+    global PROFILE_STAGE
+    PROFILE_STAGE = name
+    _profiled.discard(name)
+
+
+@contextmanager
+def _profile(span):
+    if span.name in _profiled:
+        yield
+        return
+    _profiled.add(span.name)
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        path = os.path.join(PROFILE_DIR, f"{span.name}-{os.getpid()}.prof")
+        profiler.dump_stats(path)
+        text = io.StringIO()
+        stats = pstats.Stats(profiler, stream=text)
+        stats.sort_stats("cumulative").print_stats(30)
+        with open(path.removesuffix(".prof") + ".txt", "w") as f:
+            f.write(text.getvalue())
+        span.attributes["profile"] = path
+
+
+# 4. Spans
+@contextmanager
+def span(name, rows=None, memory=True, **attributes):
+    """Mesure le bloc : `rows` peut aussi être renseigné dans le bloc
+    (`s.rows = len(df)`). `memory=False` pour les chemins chauds (la lecture
+    du pic RSS coûte ~60 µs)."""
+    parent = _current.get()
+    s = Span(
+        name,
+        f"{parent.path}/{name}" if parent else name,
+        rows=rows,
+        attributes=attributes,
+    )
+    token = _current.set(s)
+    if memory:
+        frame, memory_token = _enter_memory()
+    wall, cpu = time.perf_counter(), time.process_time()
+    try:
+        if name == PROFILE_STAGE:
+            with _profile(s):
+                yield s
+        else:
+            yield s
+    finally:
+        s.wall_s = time.perf_counter() - wall
+        s.cpu_s = time.process_time() - cpu
+        if memory:
+            s.peak_rss_mb = _exit_memory(frame, memory_token)
+        _current.reset(token)
+        for sink in list(_sinks):
+            sink(s)
+
+
+def traced(name=None, memory=True):
+    """Décorateur : la fonction entière dans un span (nom de la fonction
+    par défaut)"""
+
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name or fn.__name__, memory=memory):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorate
+
+
+# 5. MLflow
+def log_spans(spans):
+    """Spans dans le run MLflow actif : une métrique par mesure et par étape
+    (`stage/<chemin>/<mesure>`, step = occurrence de l'étape), la liste en
+    JSON, le résumé texte et les profils"""
+    import mlflow
+
+    steps, occurrences = {}, Counter()
+    for s in spans:
+        step = occurrences[s.path]
+        occurrences[s.path] += 1
+        for key in ("wall_s", "cpu_s", "peak_rss_mb", "rows"):
+            value = getattr(s, key)
+            if value is not None:
+                steps.setdefault(step, {})[f"stage/{s.path}/{key}"] = value
+    for step, metrics in steps.items():
+        mlflow.log_metrics(metrics, step=step)
+    mlflow.log_dict(
+        {"spans": [s.to_dict() for s in spans]}, "trace/spans.json"
+    )
+    mlflow.log_text("\n".join(s.summary() for s in spans), "trace/spans.log")
+    for s in spans:
+        if "profile" in s.attributes:
+            path = s.attributes["profile"]
+            mlflow.log_artifact(path, "trace/profiles")
+            mlflow.log_artifact(
+                path.removesuffix(".prof") + ".txt", "trace/profiles"
+            )
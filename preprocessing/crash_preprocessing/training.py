@@ -0,0 +1,478 @@
+# crash_preprocessing/training.py
+# Entraînement partagé par l'orchestration et les bonnes pratiques : forêt
+# aléatoire ou HistGradientBoosting, recherche Optuna parallèle, comparaison
+# des backends et suivi MLflow. Les scripts train_rf_optuna.py n'ajoutent que
+# leur ligne de commande et leurs sources de données.
+
+import os
+import pickle
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import mlflow
+import numpy as np
+import optuna
+import pandas as pd
+from sklearn.ensemble import (
+    HistGradientBoostingClassifier,
+    RandomForestClassifier,
+)
+from sklearn.metrics import (
+    accuracy_score,
+    classification_report,
+    f1_score,
+    roc_auc_score,
+)
+from sklearn.model_selection import train_test_split
+from sklearn.pipeline import Pipeline
+
+from .features import (
+    build_native_preprocessor,
+    build_preprocessor,
+    prepare_features,
+)
+from .features import load_data as load_csv
+from .spec import FEATURE_SPEC
+from .tracing import log_spans, recording, span
+
+# 🔧 Paramètres optimisés
+BEST_PARAMS = {
+    "n_estimators": 58,
+    "max_depth": 28,
+    "min_samples_split": 4,
+    "min_samples_leaf": 4,
+    "class_weight": None,
+    "random_state": 42,
+}
+
+# 🧩 Backend alternatif : gradient boosting sur histogrammes (arbres peu
+# profonds : entraînement plus rapide, modèle plus léger)
+HGB_PARAMS = {
+    "max_iter": 300,
+    "learning_rate": 0.1,
+    "max_leaf_nodes": 31,
+    "early_stopping": True,
+    "random_state": 42,
+}
+BACKENDS = {
+    "rf": (RandomForestClassifier, BEST_PARAMS),
+    "hgb": (HistGradientBoostingClassifier, HGB_PARAMS),
+}
+# Variantes comparées : (backend, catégories natives)
+COMPARED_BACKENDS = (("rf", False), ("hgb", False), ("hgb", True))
+
+TRACKING_URI = "sqlite:///mlflow.db"
+EXPERIMENT = "chicago-traffic-rf"
+
+# 🎯 Recherche Optuna : paliers de l'échantillon d'apprentissage (en neuvièmes)
+# évalués successivement par chaque essai (successive halving)
+STUDY_NAME = "chicago-traffic-rf"
+RUNGS = (1, 3, 9)
+
+
+def load_data(data_dir="processed_data"):
+    # Le plus récent des formats (Parquet, .npy mmap ou CSV de débogage)
+    formats = [
+        fmt
+        for fmt in ("parquet", "npy", "csv")
+        if os.path.exists(f"{data_dir}/X_prepared.{fmt}")
+    ]
+    fmt = max(
+        formats,
+        key=lambda f: os.path.getmtime(f"{data_dir}/X_prepared.{f}"),
+        default="csv",
+    )
+    if fmt == "npy":
+        # Matrice projetée en mémoire : partagée via le cache de pages
+        X = np.load(f"{data_dir}/X_prepared.npy", mmap_mode="r")
+        y = np.load(f"{data_dir}/y_prepared.npy")[:, 0]
+    elif fmt == "parquet":
+        X = pd.read_parquet(f"{data_dir}/X_prepared.parquet")
+        y = pd.read_parquet(f"{data_dir}/y_prepared.parquet").squeeze()
+    else:
+        X = pd.read_csv(f"{data_dir}/X_prepared.csv")
+        y = pd.read_csv(f"{data_dir}/y_prepared.csv").squeeze()
+    return X, y
+
+
+def take_rows(X, idx):
+    return X.iloc[idx] if isinstance(X, pd.DataFrame) else X[idx]
+
+
+def predict_proba_in_batches(model, X, idx, batch_size=100_000):
+    """Probabilités sur les lignes `idx` de X, lues par lots"""
+    batches = np.array_split(idx, max(1, -(-len(idx) // batch_size)))
+    return np.concatenate(
+        [model.predict_proba(take_rows(X, b)) for b in batches]
+    )
+
+
+def evaluate_and_log(model, y_test, y_pred, y_proba):
+    acc = accuracy_score(y_test, y_pred)
+    f1 = f1_score(y_test, y_pred)
+    roc = roc_auc_score(y_test, y_proba)
+
+    print("📊 Evaluation :")
+    print(f"  - Accuracy : {acc:.4f}")
+    print(f"  - F1-score : {f1:.4f}")
+    print(f"  - ROC AUC  : {roc:.4f}")
+    print(
+        "\n🧾 Classification Report :\n", classification_report(y_test, y_pred)
+    )
+
+    metrics = {"accuracy": acc, "f1_score": f1, "roc_auc": roc}
+    mlflow.log_metrics(metrics)
+    return metrics
+
+
+def resolve_data(data):
+    """(X, y) depuis un couple en mémoire ou un dossier d'artefacts préparés"""
+    if isinstance(data, (str, os.PathLike)):
+        print("📦 Chargement des données...")
+        X, y = load_data(data)
+    else:
+        X, y = data
+    return X, np.asarray(y)
+
+
+def load_raw(path):
+    """Colonnes brutes (sortie de prepare_features) depuis un CSV du portail"""
+    X, y = prepare_features(load_csv(path))
+    return X, np.asarray(y)
+
+
+def resolve_raw(raw):
+    return (
+        load_raw(raw)
+        if isinstance(raw, (str, os.PathLike))
+        else (raw[0], np.asarray(raw[1]))
+    )
+
+
+def make_model(backend="rf", params=None, native_categorical=False):
+    """Modèle du backend demandé. Avec `native_categorical` (hgb seulement),
+    pipeline qui prend les colonnes brutes : catégories en codes ordinaux
+    traitées nativement par les arbres, sans one-hot ni encodage par fréquence.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(
+            f"Backend inconnu : {backend} (attendu : {list(BACKENDS)})"
+        )
+    model_class, default_params = BACKENDS[backend]
+    params = params or default_params
+    if not native_categorical:
+        return model_class(**params)
+    if backend != "hgb":
+        raise ValueError(
+            "Les catégories natives ne sont gérées que par le backend hgb"
+        )
+    # build_native_preprocessor place les colonnes catégorielles en premier
+    n_categorical = len(FEATURE_SPEC.categorical)
+    return Pipeline(
+        steps=[
+            ("features", build_native_preprocessor()),
+            (
+                "model",
+                model_class(
+                    **params, categorical_features=list(range(n_categorical))
+                ),
+            ),
+        ]
+    )
+
+
+def split_indices(y):
+    # 🔀 Split par indices (X peut être une matrice mmap, sans copies)
+    return train_test_split(
+        np.arange(len(y)), test_size=0.2, stratify=y, random_state=42
+    )
+
+
+def optuna_storage_url(tracking_uri=TRACKING_URI):
+    """Base SQLite de l'étude, dans le dossier de celle de MLflow. MLflow et
+    Optuna versionnent tous deux leur schéma dans la table alembic_version :
+    ils ne peuvent pas partager le même fichier."""
+    path = tracking_uri.removeprefix("sqlite:///")
+    directory = os.path.dirname(path) if path != tracking_uri else ""
+    return f"sqlite:///{os.path.join(directory, 'optuna.db')}"
+
+
+def _storage(url):
+    # Plusieurs processus écrivent dans la même base : attendre le verrou
+    return optuna.storages.RDBStorage(
+        url, engine_kwargs={"connect_args": {"timeout": 60}}
+    )
+
+
+def suggest_params(trial):
+    return {
+        "n_estimators": trial.suggest_int("n_estimators", 20, 200, log=True),
+        "max_depth": trial.suggest_int("max_depth", 4, 40),
+        "min_samples_split": trial.suggest_int("min_samples_split", 2, 20),
+        "min_samples_leaf": trial.suggest_int("min_samples_leaf", 1, 20),
+        "max_features": trial.suggest_categorical(
+            "max_features", ["sqrt", "log2", 0.5]
+        ),
+        "class_weight": trial.suggest_categorical(
+            "class_weight", [None, "balanced"]
+        ),
+        "random_state": 42,
+    }
+
+
+def objective(trial, X, y, fit_idx, valid_idx):
+    """ROC AUC de validation, sur 1/9, 3/9 puis 9/9 de l'échantillon
+    d'apprentissage ; le pruner arrête le mauvais tiers des essais à chaque
+    palier"""
+    params = suggest_params(trial)
+    order = np.random.default_rng(trial.number).permutation(fit_idx)
+    for rung in RUNGS:
+        subset = np.sort(order[: max(1, len(order) * rung // RUNGS[-1])])
+        model = RandomForestClassifier(**params).fit(
+            take_rows(X, subset), y[subset]
+        )
+        score = roc_auc_score(
+            y[valid_idx], predict_proba_in_batches(model, X, valid_idx)[:, 1]
+        )
+        if rung == RUNGS[-1]:
+            return score
+        trial.report(score, rung)
+        if trial.should_prune():
+            raise optuna.TrialPruned()
+
+
+def _pruner():
+    return optuna.pruners.SuccessiveHalvingPruner(
+        min_resource=RUNGS[0], reduction_factor=3
+    )
+
+
+def _tune_worker(study_name, storage_url, data, n_trials, timeout):
+    optuna.logging.set_verbosity(optuna.logging.WARNING)
+    X, y = resolve_data(data)
+    train_idx, _ = split_indices(y)
+    # Validation prise dans l'apprentissage : le jeu de test reste intact
+    fit_idx, valid_idx = train_test_split(
+        train_idx, test_size=0.25, stratify=y[train_idx], random_state=42
+    )
+    study = optuna.load_study(
+        study_name=study_name, storage=_storage(storage_url), pruner=_pruner()
+    )
+    study.optimize(
+        lambda trial: objective(trial, X, y, fit_idx, valid_idx),
+        n_trials=n_trials,
+        timeout=timeout,
+    )
+
+
+def tune(
+    data="processed_data",
+    n_trials=40,
+    n_jobs=None,
+    timeout=None,
+    study_name=STUDY_NAME,
+    tracking_uri=TRACKING_URI,
+    experiment=EXPERIMENT,
+):
+    """Recherche d'hyperparamètres en parallèle sur `n_jobs` processus qui
+    partagent l'étude Optuna (SQLite). Logue les meilleurs paramètres et les
+    temps dans MLflow ; renvoie (meilleurs paramètres, rapport de temps)."""
+    n_jobs = n_jobs or os.cpu_count()
+    storage_url = optuna_storage_url(tracking_uri)
+    study = optuna.create_study(
+        study_name=study_name,
+        storage=_storage(storage_url),
+        direction="maximize",
+        load_if_exists=True,
+    )
+    # Essais de ce run seulement (l'étude garde ceux des anciennes données)
+    first = len(study.trials)
+
+    print(f"🎯 Recherche Optuna : {n_trials} essais sur {n_jobs} processus")
+    start = time.perf_counter()
+    args = [
+        (
+            study_name,
+            storage_url,
+            data,
+            n_trials // n_jobs + (i < n_trials % n_jobs),
+            timeout,
+        )
+        for i in range(n_jobs)
+    ]
+    if n_jobs == 1:
+        _tune_worker(*args[0])
+    else:
+        with ProcessPoolExecutor(n_jobs) as pool:
+            for future in [pool.submit(_tune_worker, *a) for a in args]:
+                future.result()
+    wall = time.perf_counter() - start
+
+    trials = [t for t in study.trials[first:] if t.state.is_finished()]
+    complete = [
+        t for t in trials if t.state == optuna.trial.TrialState.COMPLETE
+    ]
+    if not complete:
+        raise RuntimeError("Aucun essai Optuna terminé")
+    best = max(complete, key=lambda t: t.value)
+    trial_seconds = sum(t.duration.total_seconds() for t in trials)
+    report = {
+        "tuning_wall_seconds": wall,
+        "tuning_core_seconds": wall * n_jobs,
+        "tuning_seconds_per_core": trial_seconds / n_jobs,
+        "tuning_core_seconds_per_trial": trial_seconds / len(trials),
+        "tuning_n_complete": len(complete),
+        "tuning_n_pruned": len(trials) - len(complete),
+        "tuning_best_valid_roc_auc": best.value,
+    }
+    best_params = {**best.params, "random_state": 42}
+
+    print(f"🏆 Essai #{best.number} : ROC AUC {best.value:.4f} (validation)")
+    print(
+        f"⏱️ {wall:.1f} s sur {n_jobs} cœur(s), "
+        f"{report['tuning_seconds_per_core']:.1f} s de calcul par cœur, "
+        f"{report['tuning_core_seconds_per_trial']:.1f} s.cœur par essai "
+        f"({report['tuning_n_pruned']} essai(s) arrêté(s) tôt)"
+    )
+
+    mlflow.set_tracking_uri(tracking_uri)
+    mlflow.set_experiment(experiment)
+    with mlflow.start_run(run_name=f"optuna-{study_name}"):
+        mlflow.set_tag("optuna_study", study_name)
+        mlflow.log_params(
+            {**best_params, "n_trials": n_trials, "n_jobs": n_jobs}
+        )
+        mlflow.log_metrics(report)
+    return best_params, report
+
+
+def train_model(
+    data="processed_data",
+    params=None,
+    tracking_uri=TRACKING_URI,
+    experiment=EXPERIMENT,
+    log_model=True,
+    backend="rf",
+    native_categorical=False,
+):
+    """Entraîne et évalue le modèle dans le processus courant.
+
+    `data` est soit un couple (X, y) déjà en mémoire, soit le dossier des
+    artefacts préparés ; avec `native_categorical`, ce sont les colonnes
+    brutes (couple ou CSV pour load_raw). Renvoie (modèle ajusté,
+    métriques)."""
+    params = params or BACKENDS[backend][1]
+    # ⏱️ Étapes mesurées (durée, CPU, pic RSS), enregistrées dans le run
+    with recording() as spans:
+        with span("load_training_data") as load_span:
+            X, y = (
+                resolve_raw(data) if native_categorical else resolve_data(data)
+            )
+            load_span.rows = len(y)
+        train_idx, test_idx = split_indices(y)
+        y_test = y[test_idx]
+
+        # 🧠 Modèle
+        model = make_model(backend, params, native_categorical)
+        with span("fit", rows=len(train_idx), backend=backend):
+            model.fit(take_rows(X, train_idx), y[train_idx])
+
+        # 🔍 Prédictions
+        with span("predict_test", rows=len(test_idx)):
+            proba = predict_proba_in_batches(model, X, test_idx)
+        y_pred = model.classes_[proba.argmax(axis=1)]
+        y_proba = proba[:, 1]
+
+    # 🚀 MLflow
+    mlflow.set_tracking_uri(tracking_uri)
+    mlflow.set_experiment(experiment)
+
+    with mlflow.start_run():
+        mlflow.log_params(
+            {
+                **params,
+                "backend": backend,
+                "native_categorical": native_categorical,
+            }
+        )
+        metrics = evaluate_and_log(model, y_test, y_pred, y_proba)
+        log_spans(spans)
+        if log_model:
+            mlflow.sklearn.log_model(model, artifact_path="model")
+            print("✅ Modèle sauvegardé dans MLflow.")
+    return model, metrics
+
+
+def single_row_latency_ms(model, X_row, repeats=200):
+    """Latence médiane d'une prédiction sur une ligne (avec préprocesseur)"""
+    model.predict_proba(X_row)
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        model.predict_proba(X_row)
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings)) * 1000
+
+
+def compare_backends(
+    raw,
+    variants=COMPARED_BACKENDS,
+    tracking_uri=TRACKING_URI,
+    experiment=EXPERIMENT,
+):
+    """Forêt actuelle contre HistGradientBoosting (encodage actuel ou
+    catégories natives), sur les mêmes lignes brutes et le même split : temps
+    d'entraînement, taille du modèle picklé, latence sur une ligne et ROC
+    AUC. Un run MLflow imbriqué par variante, le tableau comparatif dans le
+    run parent."""
+    X, y = resolve_raw(raw)
+    train_idx, test_idx = split_indices(y)
+    X_train, X_test = X.iloc[train_idx], X.iloc[test_idx]
+
+    mlflow.set_tracking_uri(tracking_uri)
+    mlflow.set_experiment(experiment)
+    results = []
+    with mlflow.start_run(run_name="backend-comparison"):
+        for backend, native in variants:
+            name = f"{backend}_native" if native else backend
+            model = make_model(backend, native_categorical=native)
+            if not native:
+                # Même chaîne qu'en production : préprocesseur actuel + modèle
+                model = Pipeline(
+                    steps=[
+                        ("features", build_preprocessor()),
+                        ("model", model),
+                    ]
+                )
+
+            start = time.perf_counter()
+            model.fit(X_train, y[train_idx])
+            result = {
+                "backend": name,
+                "fit_seconds": time.perf_counter() - start,
+                "model_mb": len(pickle.dumps(model)) / 1e6,
+                "latency_ms": single_row_latency_ms(model, X_test.iloc[[0]]),
+                "roc_auc": roc_auc_score(
+                    y[test_idx], model.predict_proba(X_test)[:, 1]
+                ),
+            }
+            with mlflow.start_run(run_name=name, nested=True):
+                mlflow.log_params(
+                    {
+                        **BACKENDS[backend][1],
+                        "backend": backend,
+                        "native_categorical": native,
+                    }
+                )
+                mlflow.log_metrics(
+                    {k: v for k, v in result.items() if k != "backend"}
+                )
+            results.append(result)
+
+        table = pd.DataFrame(results)
+        mlflow.log_table(table, artifact_file="backend_comparison.json")
+    print(
+        "⚖️ Comparaison des backends :\n",
+        table.to_string(index=False, float_format="%.4f"),
+    )
+    return table
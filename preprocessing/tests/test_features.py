@@ -0,0 +1,95 @@
+# tests/test_features.py
+
+import numpy as np
+import pandas as pd
+import pytest
+from crash_preprocessing import (
+    FEATURE_SPEC,
+    load_data,
+    load_data_chunks,
+    parse_dates,
+    prepare_features,
+    preprocess_data,
+)
+from crash_preprocessing.synthetic import make_crashes
+
+
+def make_raw(n=200, seed=0):
+    rng = np.random.default_rng(seed)
+    crash_date = pd.Timestamp("2024-01-01") + pd.to_timedelta(
+        rng.integers(0, 10**7, n), unit="s"
+    )
+    notified = crash_date + pd.to_timedelta(rng.integers(0, 600, n), "min")
+    raw = {
+        "CRASH_RECORD_ID": np.arange(n).astype(str),
+        "CRASH_DATE": crash_date.strftime("%m/%d/%Y %I:%M:%S %p"),
+        "DATE_POLICE_NOTIFIED": notified.strftime("%m/%d/%Y %I:%M:%S %p"),
+        "POSTED_SPEED_LIMIT": rng.choice([20, 30, 35], n),
+        "CRASH_HOUR": crash_date.hour,
+        "CRASH_TYPE": rng.choice(
+            ["NO INJURY / DRIVE AWAY", FEATURE_SPEC.positive_class], n
+        ),
+    }
+    for col in FEATURE_SPEC.categorical:
+        raw[col.upper()] = rng.choice(["A", "B", None], n)
+    return pd.DataFrame(raw), (notified - crash_date).total_seconds() / 60
+
+
+def test_prepare_features_any_case():
+    """Test que l'historique (majuscules) et l'API (minuscules) donnent les
+    mêmes features, sans modifier les données d'entrée"""
+    upper, delay = make_raw()
+    lower = upper.rename(columns=str.lower)
+    columns = list(upper.columns)
+
+    X, y = prepare_features(upper)
+    X_lower, y_lower = prepare_features(lower)
+
+    assert list(upper.columns) == columns
+    assert list(X.columns) == list(FEATURE_SPEC.features)
+    pd.testing.assert_frame_equal(X, X_lower)
+    assert np.allclose(X[FEATURE_SPEC.delay], delay)
+    expected = upper["CRASH_TYPE"] == FEATURE_SPEC.positive_class
+    assert (y.to_numpy() == expected.to_numpy()).all()
+
+
+def test_parse_dates_formats():
+    """Test du format CSV explicite, du repli ISO 8601 et des dates lues"""
+    csv = pd.Series(["09/05/2023 02:45:00 PM", None, "invalide"])
+    iso = pd.Series(["2023-09-05T14:45:00.000", None])
+    expected = pd.Timestamp("2023-09-05 14:45:00")
+
+    assert parse_dates(csv)[0] == expected
+    assert parse_dates(csv)[1:].isna().all()
+    assert parse_dates(iso)[0] == expected
+    # 12 AM = minuit ; jour inexistant : NaT comme avec strptime
+    edge = parse_dates(
+        pd.Series(["12/31/1999 12:00:00 AM", "02/30/2023 01:00:00 PM"])
+    )
+    assert edge[0] == pd.Timestamp("1999-12-31 00:00:00")
+    assert pd.isna(edge[1])
+    dates = pd.Series(pd.to_datetime(["2023-09-05 14:45"]))
+    assert parse_dates(dates) is dates
+
+
+@pytest.mark.parametrize("engine", [None, "pyarrow"])
+def test_load_data_pinned_dtypes(tmp_path, engine):
+    """Test de la lecture des seules colonnes utiles, à types imposés : même
+    résultat de prétraitement qu'une lecture complète"""
+    path = tmp_path / "crashes.csv"
+    make_crashes(500).to_csv(path, index=False)
+
+    df = load_data(path, engine=engine)
+    assert sorted(df.columns) == sorted(FEATURE_SPEC.raw_columns)
+    for col in FEATURE_SPEC.categorical:
+        assert isinstance(df[col].dtype, pd.CategoricalDtype)
+
+    X, y, _ = preprocess_data(df)
+    X_full, y_full, _ = preprocess_data(pd.read_csv(path))
+    np.testing.assert_array_equal(X, X_full)
+    assert (y == y_full).all()
+
+    chunks = list(load_data_chunks(path, 200, extra=("CRASH_RECORD_ID",)))
+    assert [len(chunk) for chunk in chunks] == [200, 200, 100]
+    assert "crash_record_id" in chunks[0]
+    assert chunks[0]["weather_condition"].dtype == object
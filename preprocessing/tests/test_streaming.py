@@ -0,0 +1,54 @@
+# tests/test_streaming.py
+
+import numpy as np
+import pandas as pd
+from crash_preprocessing import (
+    FEATURE_SPEC,
+    build_preprocessor,
+    init_counts,
+    preprocessor_from_counts,
+    update_counts,
+)
+from crash_preprocessing import streaming
+
+
+def test_numeric_stats_bounded(monkeypatch):
+    """Test que les statistiques d'une colonne continue restent bornées
+    (histogramme) avec moyenne/variance exactes et médiane approchée"""
+    monkeypatch.setattr(streaming, "MEDIAN_BINS", 64)
+    rng = np.random.default_rng(0)
+    n = 5000
+    X = pd.DataFrame(
+        {
+            col: rng.choice(np.array(["A", "B", np.nan], dtype=object), n)
+            for col in FEATURE_SPEC.categorical
+        }
+    )
+    X["posted_speed_limit"] = rng.choice([20.0, 30.0, np.nan], n)
+    X["crash_hour"] = rng.integers(0, 24, n)
+    X["delay_police_minutes"] = rng.exponential(30, n)
+
+    stats = init_counts()
+    for _, chunk in X.groupby(np.arange(n) // 700):
+        update_counts(stats, chunk)
+    preprocessor = preprocessor_from_counts(stats)
+    expected = build_preprocessor().fit(X)
+
+    hist = stats["histograms"]["delay_police_minutes"]
+    assert len(hist["counts"]) <= 64
+    assert len(stats["histograms"]["crash_hour"]["counts"]) == 24
+
+    def num(p):
+        return p.named_transformers_["num"].named_steps
+
+    medians = num(preprocessor)["imputer"].statistics_
+    expected_medians = num(expected)["imputer"].statistics_
+    assert np.array_equal(medians[:2], expected_medians[:2])
+    assert abs(medians[2] - expected_medians[2]) <= hist["width"]
+    # Lignes imputées de speed_limit comprises : moments exacts
+    scaler, expected_scaler = (
+        num(preprocessor)["scaler"],
+        num(expected)["scaler"],
+    )
+    assert np.allclose(scaler.mean_, expected_scaler.mean_)
+    assert np.allclose(scaler.var_, expected_scaler.var_)
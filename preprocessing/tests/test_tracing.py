@@ -0,0 +1,84 @@
+# tests/test_tracing.py
+
+import threading
+
+import numpy as np
+from crash_preprocessing import tracing
+from crash_preprocessing.tracing import recording, span
+
+
+def test_nested_spans_peak_rss_and_rows():
+    """Test des chemins imbriqués, des lignes et du pic RSS propre à chaque
+    span (un enfant gourmand remonte au parent, pas au span suivant)"""
+    with recording() as spans:
+        with span("pipeline", rows=10):
+            with span("allocate") as s:
+                block = np.ones(50 * 2**20 // 8)  # 50 Mo
+                s.rows = len(block)
+                del block
+            with span("small"):
+                pass
+
+    allocate, small, pipeline = spans
+    assert [s.path for s in spans] == [
+        "pipeline/allocate",
+        "pipeline/small",
+        "pipeline",
+    ]
+    assert allocate.rows == 50 * 2**20 // 8 and pipeline.rows == 10
+    assert allocate.peak_rss_mb - small.peak_rss_mb > 40
+    assert pipeline.peak_rss_mb >= allocate.peak_rss_mb
+    assert pipeline.wall_s >= allocate.wall_s + small.wall_s
+    assert all(s.cpu_s >= 0 for s in spans)
+
+
+def test_peak_reset_only_at_top_level():
+    """Test que le pic du processus n'est remis à zéro ni par un span
+    imbriqué ni pendant qu'un autre thread mesure, et que chaque thread
+    garde sa propre pile de spans"""
+    with recording() as spans:
+        with span("pipeline"):
+            block = np.ones(50 * 2**20 // 8)
+            del block
+            _, peak = tracing._memory_mb()
+
+            def work(name):
+                with span(name):
+                    local = np.ones(20 * 2**20 // 8)
+                    del local
+
+            threads = [
+                threading.Thread(target=work, args=(f"task{i}",))
+                for i in range(2)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            with span("small"):
+                pass
+            assert tracing._memory_mb()[1] >= peak  # pas de remise à zéro
+
+    by_path = {s.path: s for s in spans}
+    # Threads sans contexte hérité : spans de 1er niveau, sans remise à zéro
+    assert {"task0", "task1", "pipeline/small", "pipeline"} == set(by_path)
+    assert by_path["pipeline"].peak_rss_mb >= peak
+    assert tracing._open_memory_spans == 0
+
+
+def test_profile_one_stage(tmp_path, monkeypatch):
+    """Test que seule la 1re occurrence de l'étape demandée est profilée"""
+    monkeypatch.setattr(tracing, "PROFILE_DIR", str(tmp_path))
+    tracing.set_profile_stage("stage")
+    try:
+        with recording() as spans:
+            for name in ("stage", "stage", "other"):
+                with span(name, memory=False):
+                    sum(range(1000))
+    finally:
+        tracing.set_profile_stage(None)
+
+    assert ["profile" in s.attributes for s in spans] == [True, False, False]
+    path = spans[0].attributes["profile"]
+    assert path.startswith(str(tmp_path))
+    assert "cumulative" in open(path.removesuffix(".prof") + ".txt").read()